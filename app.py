@@ -1,6 +1,7 @@
 # app.py
 
 import os
+import signal
 import sys
 from dotenv import load_dotenv
 
@@ -12,7 +13,9 @@ from pathlib import Path
 from utilmonitor import start_webserver
 from flask import Flask, jsonify, render_template
 from discord.ext import commands
-from config import intents, HEALTH_CHECK_INTERVAL, STARTUP_DELAY
+from config import intents, HEALTH_CHECK_INTERVAL, STARTUP_DELAY, SHUTDOWN_TIMEOUT, HISTORY_RESOLUTIONS, WEB_MODE
+from metricsblock import MetricsBlock, REPORT_LAYOUT
+from metricshistory import MetricsHistory
 from errorlogger import error_logger
 from botdb import status_retrieve
 
@@ -39,9 +42,11 @@ validate_environment()
 
 app = Flask(__name__)
 
-def start_bot(reports):
+def start_bot(reports, history=None, serve_web=False):
     bot = commands.Bot(command_prefix='$', intents=intents) # Self Explanatory
     bot.reports = reports
+    bot.history = history
+    bot.web_runner = None
 
     @bot.event
     async def on_ready():
@@ -68,6 +73,15 @@ def start_bot(reports):
         else:
             error_logger(RuntimeError("Could not load cog"), "Critical startup failure")
             raise RuntimeError("Could not load cog")
+
+        # WEB_MODE=bot: the dashboard and API run on this loop instead of their own process
+        if serve_web and bot.web_runner is None:
+            from asyncmonitor import start_async_webserver
+            try:
+                bot.web_runner = await start_async_webserver(reports, history,
+                                                             queue_manager=getattr(bot, 'queue_manager', None))
+            except Exception as e:
+                error_logger(e, "Monitoring web server failed to start; the bot keeps running")
             
         # Just sets the bot's presence or status to a random string in the status.txt file
         await bot.change_presence(activity=discord.Game(status_retrieve()))
@@ -77,14 +91,18 @@ def start_bot(reports):
         await bot.process_commands(message) # This tells the bot to send any commands it detects to processing.
         
     
+    # terminate() from the parent closes the bot like Ctrl-C does: cogs are
+    # unloaded, so workers are stopped and the translation store is flushed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
     return bot.run(TOKEN)
 
 
 
-def start_gui(reports):
+def start_gui(reports, history=None):
     print("starting webserver...")
     try:
-        start_webserver(reports)  # Pass reports here
+        start_webserver(reports, history)  # Pass reports here
     except Exception as e:
         error_logger(e, "Flask server error")
         sys.exit()
@@ -96,27 +114,25 @@ if __name__=='__main__':
     
             Manages the main application lifecycle with health monitoring and 
             graceful shutdown handling. """
-        # Create reports dictionary
-        reports = {
-            'cpu': multiprocessing.Value('d', 0),
-            'ram': multiprocessing.Value('d', 0),
-            'queues': multiprocessing.Value('i', 0),
-            'jobs': multiprocessing.Value('i', 0),
-            'response_time': multiprocessing.Value('d', 0),
-            'connected_servers': multiprocessing.Value('d', 0)
-        }
-
-        # Pass to processes
-        p1 = multiprocessing.Process(target=start_bot, args=(reports,))
-        p2 = multiprocessing.Process(target=start_gui, args=(reports,))
+        # Shared metrics block the bot writes and the web server reads, see metricsblock
+        reports = MetricsBlock(REPORT_LAYOUT)
+
+        # Time series of every scalar report, for /api/history, see metricshistory
+        history = MetricsHistory(reports.scalars(), HISTORY_RESOLUTIONS)
+
+        # Pass to processes. With WEB_MODE=bot the bot serves the dashboard itself and there is no web process
+        serve_web = WEB_MODE == 'bot'
+        processes = [multiprocessing.Process(target=start_bot, args=(reports, history, serve_web))]
+        if not serve_web:
+            processes.append(multiprocessing.Process(target=start_gui, args=(reports, history)))
    
             
-        p1.start()
-        p2.start()
+        for process in processes:
+            process.start()
         
         time.sleep(STARTUP_DELAY)
         try:
-            while p1.is_alive() and p2.is_alive():
+            while all(process.is_alive() for process in processes):
                 time.sleep(HEALTH_CHECK_INTERVAL)
             
             # If we get here, one process died
@@ -124,15 +140,20 @@ if __name__=='__main__':
         
         except KeyboardInterrupt:
             print("Shutting down...")
+            # Ctrl-C reached the children too; let the bot finish closing before terminating anything
+            for process in processes:
+                process.join(timeout=SHUTDOWN_TIMEOUT)
         finally:
             # Clean up any remaining processes
-            if p1.is_alive():
-                p1.terminate()
-            if p2.is_alive():
-                p2.terminate()
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
         
-        p1.join()
-        p2.join()
+        for process in processes:
+            process.join(timeout=SHUTDOWN_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+                process.join()
 
         
 
@@ -1,4 +1,5 @@
 import argostranslate.package
+import argostranslate.settings
 import argostranslate.translate
 
 from errorlogger import error_logger
@@ -65,5 +66,97 @@ def german_to_english(text: str) -> str:  # Changed from spanish_to_english
         raise RuntimeError(f"Translation failed: {str(e)}")
 
 
+def german_to_english_batch(texts: list) -> list:
+    """
+    Translate several German texts with a single batched CTranslate2 call.
+
+    Does what argostranslate's PackageTranslation does for one text (split
+    into paragraphs and sentences, tokenize, translate, decode), but feeds the
+    sentences of every text to translate_batch at once so the engine can
+    batch across requests. This reuses argostranslate internals, so it is
+    written against the version pinned in requirements.txt; check it with
+    benchmarks/batch_equivalence.py before moving the pin.
+    
+    Args:
+        texts (list): German texts to translate
+        
+    Returns:
+        list: English translations, in the same order as texts
+        
+    Raises:
+        RuntimeError: If translation fails
+    """
+    translation = argostranslate.translate.get_translation_from_codes('de', 'en')
+    package_translation = getattr(translation, 'underlying', translation)
+    translator = getattr(package_translation, 'translator', None)
+
+    if translator is None or not hasattr(package_translation, 'sentencizer'):
+        # Model not loaded yet or not a packaged model; this loads it for next time
+        return [german_to_english(text) for text in texts]
+
+    try:
+        pkg = package_translation.pkg
+        sentencizer = package_translation.sentencizer
+
+        # Flatten to one sentence list, remembering sentences per paragraph per text
+        sentences = []
+        layout = []
+        for text in texts:
+            if not text or not text.strip():
+                layout.append(None)
+                continue
+            paragraph_sizes = []
+            for paragraph in text.split("\n"):
+                paragraph_sentences = sentencizer.split_sentences(paragraph)
+                sentences.extend(paragraph_sentences)
+                paragraph_sizes.append(len(paragraph_sentences))
+            layout.append(paragraph_sizes)
+
+        tokenized = [pkg.tokenizer.encode(sentence) for sentence in sentences]
+        target_prefix = [[pkg.target_prefix]] * len(tokenized) if pkg.target_prefix != "" else None
+
+        translated = translator.translate_batch(
+            tokenized,
+            target_prefix=target_prefix,
+            replace_unknowns=True,
+            max_batch_size=argostranslate.settings.batch_size,
+            batch_type="tokens",
+            beam_size=argostranslate.settings.beam_size,
+            num_hypotheses=1,
+            length_penalty=0.2,
+        ) if tokenized else []
+
+        # Stitch sentences back into paragraphs and texts
+        results = []
+        cursor = 0
+        for text, paragraph_sizes in zip(texts, layout):
+            if paragraph_sizes is None:
+                results.append(text)
+                continue
+            paragraphs = []
+            for size in paragraph_sizes:
+                tokens = []
+                for sentence_result in translated[cursor:cursor + size]:
+                    tokens.extend(sentence_result.hypotheses[0])
+                cursor += size
+                paragraphs.append(_decode_tokens(pkg, tokens) if size else "")
+            results.append("\n".join(paragraphs).lstrip("\n"))
+        return results
+        
+    except Exception as e:
+        error_logger(e, f"Batched translation failed for {len(texts)} texts")
+        raise RuntimeError(f"Batched translation failed: {str(e)}")
+
+
+def _decode_tokens(pkg, tokens):
+    """Detokenize one translated paragraph the way argostranslate does."""
+    value = pkg.tokenizer.decode(tokens)
+    if pkg.target_prefix != "" and value.startswith(pkg.target_prefix):
+        value = value[len(pkg.target_prefix):]
+    if value.startswith(" "):
+        value = value[1:]
+    return value
+
+
 # Initialize on import
 setup_german_to_english()  # Changed from setup_spanish_to_english
\ No newline at end of file
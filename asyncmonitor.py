@@ -0,0 +1,219 @@
+import asyncio
+import hmac
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+from errorlogger import error_logger
+from usagemonitor import get_sampler
+from cpuprofiler import run_profile
+from metricsstream import MetricsStream
+from prometheusexport import PrometheusExporter
+from utilmonitor import (build_stats, build_debug, build_workers, build_trace, build_history, build_health,
+                         pick_port)
+from config import STREAM_INTERVAL, STREAM_KEEPALIVE, PROMETHEUS_CACHE_SECONDS, WEB_HOST, WEB_PORT, ADMIN_TOKEN
+
+
+DASHBOARD = Path(__file__).parent / 'templates' / 'dashboard.html'
+
+NO_CACHE = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def error_response(message, status=500):
+    return web.json_response({'error': message, 'timestamp': time.time()}, status=status)
+
+
+def create_async_app(reports, history=None, queue_manager=None):
+    """
+    The monitoring endpoints of utilmonitor.create_app as an aiohttp app.
+
+    For WEB_MODE=bot, where they are served from the bot's own event loop:
+    the same routes and payloads, built by the same functions, but reading
+    the reports block in-process. Handlers only read snapshots, which takes
+    microseconds; the history query, the one that can take longer, runs on
+    the default executor.
+
+    Being in the bot's process, it can also reach into it: /api/memory has
+    the workers' memory reports, and with ADMIN_TOKEN set there is
+    /api/admin/profile, see cpuprofiler.run_profile.
+    """
+    if not reports:
+        raise ValueError("Reports parameter cannot be None or empty")
+
+    app = web.Application()
+    sampler = get_sampler()
+    stream = MetricsStream(lambda: build_stats(reports), STREAM_INTERVAL, STREAM_KEEPALIVE)
+    exporter = PrometheusExporter(reports, PROMETHEUS_CACHE_SECONDS)
+
+    async def dashboard(request):
+        try:
+            return web.FileResponse(DASHBOARD)
+        except Exception as e:
+            error_logger(e, "Error serving dashboard")
+            return error_response('Dashboard unavailable')
+
+    async def stats(request):
+        try:
+            return web.json_response(build_stats(reports), headers=dict(NO_CACHE, Pragma='no-cache', Expires='0'))
+        except Exception as e:
+            error_logger(e, "Critical error in stats endpoint")
+            return error_response('Stats temporarily unavailable')
+
+    async def stats_stream(request):
+        """Server-Sent Events: a 'snapshot' of /api/stats, then 'delta' events with what changed."""
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+            'Access-Control-Allow-Origin': '*'
+        })
+        await response.prepare(request)
+        frames = stream.subscribe_async()
+        try:
+            async for frame in frames:
+                await response.write(frame.encode())
+        except ConnectionResetError:
+            pass  # Client went away
+        except Exception as e:
+            error_logger(e, "Error in stats stream")
+        finally:
+            await frames.aclose()
+        return response
+
+    async def prometheus_metrics(request):
+        """Counters, gauges and latency histograms in the Prometheus text format."""
+        try:
+            return web.Response(body=exporter.render(), headers={'Content-Type': exporter.CONTENT_TYPE})
+        except Exception as e:
+            error_logger(e, "Error rendering Prometheus metrics")
+            return web.Response(text="# metrics unavailable\n", status=500,
+                                headers={'Content-Type': exporter.CONTENT_TYPE})
+
+    async def debug(request):
+        try:
+            return web.json_response(build_debug(reports, sampler, stream), headers=NO_CACHE)
+        except Exception as e:
+            error_logger(e, "Critical error in debug endpoint")
+            return error_response('Debug info unavailable')
+
+    async def workers(request):
+        """Per-worker tasks, busy and CPU time, RSS, uptime and translation latency."""
+        try:
+            return web.json_response(build_workers(reports), headers=NO_CACHE)
+        except Exception as e:
+            error_logger(e, "Error in workers endpoint")
+            return error_response('Worker stats unavailable')
+
+    async def trace_recent(request):
+        """Per-stage breakdowns of the most recent requests, plus rolling per-stage percentiles."""
+        try:
+            try:
+                limit = int(request.query['n'])
+            except (KeyError, ValueError):
+                limit = None
+            payload, status = build_trace(reports, limit)
+            return web.json_response(payload, status=status, headers=NO_CACHE)
+        except Exception as e:
+            error_logger(e, "Error in trace endpoint")
+            return error_response('Trace info unavailable')
+
+    async def metric_history(request):
+        """Downsampled history of one or more metrics, see utilmonitor.build_history."""
+        try:
+            loop = asyncio.get_running_loop()
+            payload, status = await loop.run_in_executor(None, build_history, history, request.query)
+            return web.json_response(payload, status=status, headers=NO_CACHE)
+        except Exception as e:
+            error_logger(e, "Error in history endpoint")
+            return error_response('History unavailable')
+
+    async def health_check(request):
+        """Simple health check endpoint."""
+        try:
+            health_status = build_health(reports)
+            health_status['flask_running'] = True  # Kept so existing health checks don't change
+            return web.json_response(health_status)
+        except Exception as e:
+            error_logger(e, "Health check failed")
+            return web.json_response({
+                'status': 'unhealthy',
+                'timestamp': time.time(),
+                'error': 'Health check failed'
+            }, status=500)
+
+    async def memory(request):
+        """Worker memory growth and top allocation sites, see QueueManager.memory_report."""
+        if queue_manager is None:
+            return error_response('Workers not available', 404)
+        try:
+            return web.json_response(dict(queue_manager.memory_report(), timestamp=time.time()), headers=NO_CACHE)
+        except Exception as e:
+            error_logger(e, "Error in memory endpoint")
+            return error_response('Memory report unavailable')
+
+    async def admin_profile(request):
+        """
+        ?target=bot|<queue id>&seconds=10&mode=sample|cprofile profiles for that long, then
+        returns the output as text, or with &format=dump the cprofile .prof dump.
+        """
+        authorization = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+            return error_response('Unauthorized', 401)
+        try:
+            mode = request.query.get('mode', 'sample')
+            try:
+                seconds = float(request.query.get('seconds', 10))
+            except ValueError:
+                return error_response('seconds must be a number', 400)
+            result = await run_profile(queue_manager, request.query.get('target', 'bot'), seconds, mode)
+            if request.query.get('format') == 'dump' and 'dump' in result:
+                return web.Response(body=result['dump'], content_type='application/octet-stream')
+            return web.Response(text=result['output'], content_type='text/plain')
+        except ValueError as bad_request:
+            return error_response(str(bad_request), 400)
+        except RuntimeError as profile_error:
+            return error_response(str(profile_error), 409)
+        except Exception as e:
+            error_logger(e, "Error in profile endpoint")
+            return error_response('Profiling failed')
+
+    app.router.add_get('/dashboard', dashboard)
+    app.router.add_get('/api/stats', stats)
+    app.router.add_get('/api/stream', stats_stream)
+    app.router.add_get('/metrics', prometheus_metrics)
+    app.router.add_get('/api/debug', debug)
+    app.router.add_get('/api/workers', workers)
+    app.router.add_get('/api/memory', memory)
+    app.router.add_get('/api/trace/recent', trace_recent)
+    app.router.add_get('/api/history', metric_history)
+    app.router.add_get('/health', health_check)
+    if ADMIN_TOKEN:
+        app.router.add_get('/api/admin/profile', admin_profile)
+    return app
+
+
+async def start_async_webserver(reports, history=None, host=None, port=None, queue_manager=None):
+    """
+    Serve create_async_app on the running event loop and return its AppRunner.
+
+    Nothing blocks: the server runs alongside whatever else the loop does,
+    until runner.cleanup() is awaited.
+    """
+    try:
+        host = host or WEB_HOST
+        port = pick_port(host, port or WEB_PORT)
+        runner = web.AppRunner(create_async_app(reports, history, queue_manager), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        print(f"Monitoring served from the bot on {host}:{port}")
+        return runner
+    except OSError as os_error:
+        error_logger(os_error, f"Failed to bind to {host}:{port}")
+        raise
+    except Exception as e:
+        error_logger(e, "Failed to start web server")
+        raise
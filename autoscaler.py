@@ -0,0 +1,76 @@
+import math
+
+
+class Autoscaler:
+    """
+    Decides how many workers the pool should have, with hysteresis.
+
+    The target comes from Little's law: tasks in service = arrival rate x
+    service time, divided by the utilisation each worker should run at. A
+    backlog of waiting tasks asks for one more worker per tick. Scaling up
+    happens right away; scaling down only once the target has stayed below
+    the pool size for a whole cooldown, and only ever takes workers that have
+    been idle for idle_timeout. QueueManager does the actual spawning and
+    closing; this class only does the arithmetic.
+    """
+
+    def __init__(self, min_workers=1, max_workers=1, target_utilization=0.7,
+                 cooldown=30.0, idle_timeout=60.0, rate_alpha=0.3):
+        self.min_workers = min_workers
+        self.max_workers = max(max_workers, min_workers)
+        self.target_utilization = target_utilization
+        self.cooldown = cooldown
+        self.idle_timeout = idle_timeout
+        self.rate_alpha = rate_alpha
+
+        self.arrivals = 0  # Tasks since the last tick
+        self.arrival_rate = 0.0  # Tasks per second, EWMA over ticks
+        self.last_tick = None
+        self.last_scale_up = float('-inf')
+        self.below_since = None  # When the target first dropped below the pool size
+
+    def record_arrival(self, count=1):
+        self.arrivals += count
+
+    def tick(self, now):
+        """Fold the arrivals since the last tick into the arrival rate."""
+        if self.last_tick is not None and now > self.last_tick:
+            rate = self.arrivals / (now - self.last_tick)
+            self.arrival_rate = self.rate_alpha * rate + (1 - self.rate_alpha) * self.arrival_rate
+        self.arrivals = 0
+        self.last_tick = now
+
+    def target(self, service_time, backlog, current):
+        """
+        Number of workers the pool should have right now.
+
+        Args:
+            service_time (float): Seconds of work per task, or None if unknown
+            backlog (int): Tasks waiting for a worker slot
+            current (int): Workers in the pool
+        """
+        target = self.min_workers
+        if service_time:
+            in_service = self.arrival_rate * service_time
+            target = max(target, math.ceil(in_service / self.target_utilization))
+        if backlog:
+            target = max(target, current + 1)
+        return min(target, self.max_workers)
+
+    def scaled_up(self, now):
+        self.last_scale_up = now
+        self.below_since = None
+
+    def scaled_down(self, now):
+        # Each further teardown waits out another cooldown
+        self.below_since = now
+
+    def should_scale_down(self, target, current, now):
+        """True once the pool has been bigger than needed for a full cooldown."""
+        if current <= max(target, self.min_workers):
+            self.below_since = None
+            return False
+        if self.below_since is None:
+            self.below_since = now
+        return (now - self.below_since >= self.cooldown
+                and now - self.last_scale_up >= self.cooldown)
@@ -0,0 +1,172 @@
+"""
+Worker spawns and tail latency on a bursty trace: close-on-empty vs the autoscaler.
+
+Discrete-time simulation of the worker pool, so it shows the effect of the
+scaling policy on any machine: bursts of requests arrive on top of a light
+background rate, a new worker costs a model load before it can translate,
+and each worker handles one task at a time. The legacy policy spawns when
+every queue is full and closes all empty queues but one after each task;
+the autoscaler run uses autoscaler.Autoscaler the way QueueManager does.
+
+Usage:
+    python benchmarks/autoscale_trace.py [--cores 8] [--spawn-cost 3] [--bursts 15]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from autoscaler import Autoscaler
+
+STEP = 0.005  # Simulation tick, seconds
+AUTOSCALE_INTERVAL = 0.5
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def make_trace(bursts, burst_size, burst_length, gap, background_rate, seed):
+    """Arrival times: bursts of burst_size spread over burst_length, every gap seconds."""
+    rng = random.Random(seed)
+    arrivals = []
+    for burst in range(bursts):
+        start = burst * gap
+        arrivals += [start + rng.uniform(0, burst_length) for _ in range(burst_size)]
+    duration = bursts * gap
+    now = rng.expovariate(background_rate)
+    while now < duration:
+        arrivals.append(now)
+        now += rng.expovariate(background_rate)
+    return sorted(arrivals), duration
+
+
+def simulate(arrivals, duration, cores, spawn_cost, service_time, queue_max, scaler, seed):
+    """Replay a trace; scaler is an Autoscaler, or None for close-on-empty. Returns (latencies, spawns, teardowns)."""
+    rng = random.Random(seed)
+    sigma = 0.4
+    mu = math.log(service_time) - sigma ** 2 / 2
+
+    workers = []
+    backlog = deque()
+    latencies = []
+    spawns = teardowns = 0
+    service_ewma = None
+
+    def spawn(now):
+        nonlocal spawns
+        workers.append({'queue': deque(), 'current': None, 'busy_until': 0.0,
+                        'ready_at': now + spawn_cost, 'last_done': now + spawn_cost})
+        spawns += 1
+        if scaler:
+            scaler.scaled_up(now)
+
+    def outstanding(worker):
+        return len(worker['queue']) + (worker['current'] is not None)
+
+    def place(arrival, now, may_spawn):
+        open_workers = [worker for worker in workers if outstanding(worker) < queue_max]
+        if open_workers:
+            min(open_workers, key=outstanding)['queue'].append(arrival)
+            return True
+        if may_spawn and len(workers) < cores:
+            spawn(now)
+            workers[-1]['queue'].append(arrival)
+            return True
+        return False
+
+    pending = deque(arrivals)
+    next_tick = 0.0
+    step = 0
+    while pending or backlog or any(outstanding(worker) for worker in workers):
+        now = step * STEP
+        step += 1
+
+        if scaler and now >= next_tick:
+            next_tick = now + AUTOSCALE_INTERVAL
+            scaler.tick(now)
+            target = scaler.target(service_ewma, len(backlog), len(workers))
+            while len(workers) < target:
+                spawn(now)
+            if scaler.should_scale_down(target, len(workers), now):
+                idle = [worker for worker in workers
+                        if not outstanding(worker) and now >= worker['ready_at']
+                        and now - worker['last_done'] >= scaler.idle_timeout]
+                if idle:
+                    workers.remove(min(idle, key=lambda worker: worker['last_done']))
+                    teardowns += 1
+                    scaler.scaled_down(now)
+        elif not scaler and not workers:
+            spawn(now)
+
+        while pending and pending[0] <= now:
+            arrival = pending.popleft()
+            if scaler:
+                scaler.record_arrival()
+            if backlog or not place(arrival, now, may_spawn=True):
+                backlog.append(arrival)
+
+        for worker in list(workers):
+            if now < worker['ready_at']:
+                continue
+            if worker['current'] is not None and now >= worker['busy_until']:
+                latencies.append(now - worker['current'])
+                worker['current'] = None
+                worker['last_done'] = now
+                if not scaler and not outstanding(worker):
+                    # Legacy: close every empty queue except the first one
+                    empty = [other for other in workers if not outstanding(other)]
+                    for other in empty[1:]:
+                        workers.remove(other)
+                        teardowns += 1
+            if worker['current'] is None and worker['queue'] and worker in workers:
+                worker['current'] = worker['queue'].popleft()
+                service = rng.lognormvariate(mu, sigma)
+                worker['busy_until'] = now + service
+                service_ewma = service if service_ewma is None else 0.3 * service + 0.7 * service_ewma
+
+        while backlog and place(backlog[0], now, may_spawn=True):
+            backlog.popleft()
+
+    return latencies, spawns, teardowns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cores', type=int, default=8)
+    parser.add_argument('--spawn-cost', type=float, default=3.0, help="Seconds to start a worker and load the model")
+    parser.add_argument('--service-ms', type=float, default=300)
+    parser.add_argument('--queue-max', type=int, default=10)
+    parser.add_argument('--bursts', type=int, default=15)
+    parser.add_argument('--burst-size', type=int, default=60)
+    parser.add_argument('--burst-length', type=float, default=3.0)
+    parser.add_argument('--gap', type=float, default=20.0, help="Seconds between burst starts")
+    parser.add_argument('--background', type=float, default=0.5, help="Background requests per second")
+    parser.add_argument('--cooldown', type=float, default=30.0)
+    parser.add_argument('--idle-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    arrivals, duration = make_trace(args.bursts, args.burst_size, args.burst_length, args.gap,
+                                    args.background, args.seed)
+    print(f"{len(arrivals)} requests over {duration:.0f}s in {args.bursts} bursts, {args.cores} cores, "
+          f"{args.spawn_cost:.1f}s spawn cost")
+
+    for label, scaler in [
+        ('close-on-empty', None),
+        ('autoscaler', Autoscaler(min_workers=1, max_workers=args.cores, cooldown=args.cooldown,
+                                  idle_timeout=args.idle_timeout))
+    ]:
+        latencies, spawns, teardowns = simulate(arrivals, duration, args.cores, args.spawn_cost,
+                                                args.service_ms / 1000, args.queue_max, scaler, args.seed)
+        print(f"{label:15} spawns {spawns:4} | teardowns {teardowns:4} | "
+              f"p50 {percentile(latencies, 0.5) * 1000:6.0f} ms | p95 {percentile(latencies, 0.95) * 1000:6.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
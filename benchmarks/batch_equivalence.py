@@ -0,0 +1,76 @@
+"""
+Batched translation against argostranslate's own, text by text.
+
+german_to_english_batch reimplements argostranslate's PackageTranslation so
+it can batch sentences across requests. This translates the same texts with
+german_to_english one at a time and with one batched call, prints every text
+whose output differs, and times both. Exits non-zero on any mismatch, so run
+it after moving the argostranslate pin in requirements.txt. Needs the German
+to English model installed, like the bot itself.
+
+Usage:
+    python benchmarks/batch_equivalence.py [--rounds 5]
+"""
+import argparse
+import os
+import sys
+import time
+from importlib.metadata import version
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from argosetup import german_to_english, german_to_english_batch
+
+TEXTS = [
+    "Guten Tag! Ich hätte gerne eine Übersetzung dieses Satzes, bitte.",
+    "Hallo",
+    "Das Treffen ist am 3. Mai um 14 Uhr. Bitte seid pünktlich!",
+    "Dr. Müller wohnt in der Hauptstr. 5, ca. zehn Minuten vom Bahnhof entfernt.",
+    "Erste Zeile.\nZweite Zeile, die etwas länger ist als die erste.",
+    "Absatz eins.\n\nAbsatz zwei nach einer Leerzeile.\n",
+    "   ",
+    "",
+    "Wie geht es dir? Mir geht es gut, danke. Und dir?",
+    "z.B. Äpfel, Birnen usw. sind Obst, vgl. Kap. 2.",
+    "Nur ein Wort\n   \nund noch ein Absatz mit Leerzeichen davor.",
+    " ".join(["Der schnelle braune Fuchs springt über den faulen Hund."] * 12),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, default=5, help="Times to translate the sample set each way")
+    args = parser.parse_args()
+
+    # Load the translator; the batched path falls back to german_to_english until it exists
+    german_to_english(TEXTS[0])
+    print(f"argostranslate {version('argostranslate')}, ctranslate2 {version('ctranslate2')}, "
+          f"{len(TEXTS)} texts x {args.rounds} rounds")
+
+    single_elapsed = batch_elapsed = 0.0
+    mismatches = {}
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        expected = [german_to_english(text) for text in TEXTS]
+        single_elapsed += time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = german_to_english_batch(TEXTS)
+        batch_elapsed += time.perf_counter() - started
+
+        for index, (want, got) in enumerate(zip(expected, actual)):
+            if want != got:
+                mismatches[index] = (want, got)
+
+    for index, (want, got) in sorted(mismatches.items()):
+        print(f"MISMATCH {TEXTS[index]!r}\n  german_to_english:       {want!r}\n  german_to_english_batch: {got!r}")
+
+    total = len(TEXTS) * args.rounds
+    print(f"one at a time: {single_elapsed * 1000 / args.rounds:8.1f} ms per set, {total / single_elapsed:6.1f} texts/sec")
+    print(f"batched:       {batch_elapsed * 1000 / args.rounds:8.1f} ms per set, {total / batch_elapsed:6.1f} texts/sec")
+    print(f"{len(TEXTS) - len(mismatches)}/{len(TEXTS)} texts identical")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
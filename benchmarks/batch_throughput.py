@@ -0,0 +1,73 @@
+"""
+Translation throughput with and without micro-batching in the workers.
+
+Starts one real (argostranslate) worker per core, fires a burst of tasks
+round-robin across them and reports translations/sec for each batch size.
+Batches go through argosetup.german_to_english_batch (BATCH_TRANSLATE=1);
+--one-by-one translates them text by text instead, for comparison. Needs the
+German to English model installed, like the bot itself.
+
+Usage:
+    python benchmarks/batch_throughput.py [--tasks 45] [--batch-sizes 1 2 4 8] [--one-by-one]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from processspawner import spawn_process_on_core
+from usagemonitor import get_total_cores
+
+SAMPLE_TEXT = "Guten Tag! Ich hätte gerne eine Übersetzung dieses Satzes, bitte."
+
+
+def run(batch_size, tasks, cores, batch_translate):
+    """Translate `tasks` messages on `cores` workers and return tasks/sec."""
+    pipes = []
+    for core_id in range(cores):
+        _, _, pipe = spawn_process_on_core(
+            core_id,
+            start_method='forkserver',
+            preload=['argosetup'],
+            warmup_text=SAMPLE_TEXT,
+            batch_size=batch_size,
+            batch_translate=batch_translate
+        )
+        pipes.append(pipe)
+
+    for pipe in pipes:
+        pipe.recv()  # Ready message
+
+    started = time.perf_counter()
+    for task_id in range(tasks):
+        pipes[task_id % cores].send({'id': task_id, 'task': f"{SAMPLE_TEXT} ({task_id})"})
+
+    finished = 0
+    while finished < tasks:
+        for pipe in pipes:
+            while pipe.poll():
+                finished += len(pipe.recv())
+    elapsed = time.perf_counter() - started
+
+    for pipe in pipes:
+        pipe.send("STOP")
+    return tasks / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=45)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--one-by-one', action='store_true', help="Drain batches but translate text by text")
+    args = parser.parse_args()
+
+    cores = get_total_cores()
+    for batch_size in args.batch_sizes:
+        throughput = run(batch_size, args.tasks, cores, not args.one_by_one)
+        print(f"batch size {batch_size:3}: {throughput:6.1f} translations/sec on {cores} cores")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Acceptance rate under a burst, with and without the admission queue.
+
+Drives a real QueueManager with the CPU-bound stub translator and fires a
+burst of messages at once, like the README's 45 task run. Without the
+admission queue everything past queue_max per core is turned away; with it
+they wait for a worker slot and are only rejected past their deadline.
+
+Usage:
+    python benchmarks/burst_acceptance.py [--burst 45] [--deadline 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from harness import FakeMessage, FakeReaction, busy_translate, wait_for_replies
+
+from cmdqueue import QueueManager
+
+TEXT = "Guten Tag! Ich hätte gerne eine Übersetzung dieses Satzes, bitte."
+
+
+async def run(admission_max, burst, deadline):
+    queue_manager = QueueManager(translate_func=busy_translate)
+    queue_manager.admission_max = admission_max
+    queue_manager.admission_deadline = deadline
+    queue_manager.cpu_usage_max = 101  # Measure queueing, not the CPU admission check
+    queue_manager.cache = None  # Every message shares sentences; make them all real work
+    queue_manager.rate_limiter = None  # One fake channel sends everything
+    queue_manager.replies.channel_burst = 0
+    monitor = asyncio.create_task(queue_manager.async_monitor())
+
+    warmup = FakeMessage(TEXT)
+    await queue_manager.task_sort(warmup.content, FakeReaction(warmup))
+    await wait_for_replies([warmup])
+
+    messages = [FakeMessage(f"{TEXT} ({i})") for i in range(burst)]
+    started = time.perf_counter()
+    for message in messages:
+        await queue_manager.task_sort(message.content, FakeReaction(message))
+    await wait_for_replies(messages, timeout=deadline + 30)
+
+    translated = [message for message in messages if message.replies and message.replies[0].startswith('🇩🇪')]
+    latencies = [(message.replied_at - started) * 1000 for message in translated]
+    queue_wait = queue_manager.queue_wait.snapshot()
+
+    queue_manager.shutdown_all_queues()
+    monitor.cancel()
+    return len(translated), latencies, queue_wait
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--burst', type=int, default=45)
+    parser.add_argument('--deadline', type=float, default=20)
+    parser.add_argument('--queue-max', type=int, default=200, help="Admission queue size")
+    args = parser.parse_args()
+
+    for label, admission_max in [('no admission queue', 0), ('admission queue', args.queue_max)]:
+        accepted, latencies, queue_wait = asyncio.run(run(admission_max, args.burst, args.deadline))
+        line = f"{label:18}: accepted {accepted}/{args.burst} ({100 * accepted / args.burst:5.1f}%)"
+        if latencies:
+            line += (f" | median {statistics.median(latencies):7.1f} ms | max {max(latencies):7.1f} ms"
+                     f" | queue wait p50 {queue_wait['p50'] * 1000:6.1f} ms p99 {queue_wait['p99'] * 1000:6.1f} ms")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Web server CPU with dashboards polling /api/stats vs subscribed to /api/stream.
+
+Runs the monitoring app (utilmonitor.create_app) in its own process, with a
+thread there publishing fresh reports twice a second like the bot does, then
+connects N simulated dashboards for a while and measures the CPU time the
+server process used and the bytes each dashboard received. Polling viewers
+fetch /api/stats every second like the old dashboard; streaming viewers hold
+one /api/stream connection open.
+
+Usage:
+    python benchmarks/dashboard_viewers.py [--viewers 1 50] [--duration 20]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+import psutil
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from metricsblock import MetricsBlock
+from utilmonitor import create_app
+
+
+def serve(port):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    reports = MetricsBlock()
+
+    def publish():
+        jobs = 0
+        while True:
+            jobs += random.randint(0, 3)
+            reports.write({'cpu': random.uniform(5, 60), 'ram': 40 + random.random(), 'queues': 2,
+                           'jobs': jobs, 'response_time': random.uniform(0.2, 0.6),
+                           'response_p99': random.uniform(0.5, 2.0), 'connected_servers': 12})
+            time.sleep(0.5)
+
+    threading.Thread(target=publish, daemon=True).start()
+    create_app(reports).run(host='127.0.0.1', port=port, threaded=True)
+
+
+def poll_viewer(url, stop, received):
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            with urllib.request.urlopen(url + '/api/stats', timeout=5) as response:
+                received.append(len(response.read()))
+        except OSError:
+            pass
+        stop.wait(max(0.0, 1.0 - (time.monotonic() - started)))
+
+
+def stream_viewer(url, stop, received):
+    try:
+        with urllib.request.urlopen(url + '/api/stream', timeout=30) as response:
+            while not stop.is_set():
+                line = response.readline()
+                if not line:
+                    break
+                received.append(len(line))
+    except OSError:
+        pass
+
+
+def measure(url, server, mode, viewers, duration):
+    stop = threading.Event()
+    received = []
+    target = poll_viewer if mode == 'poll' else stream_viewer
+    threads = [threading.Thread(target=target, args=(url, stop, received), daemon=True) for _ in range(viewers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(2)  # Let every viewer connect
+
+    received.clear()
+    before = server.cpu_times()
+    time.sleep(duration)
+    after = server.cpu_times()
+    total_bytes = sum(received)
+
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=20)  # Streams notice on their next frame
+
+    cpu = (after.user - before.user) + (after.system - before.system)
+    print(f"{mode:6} {viewers:3} viewers | server CPU {cpu / duration:6.1%} | "
+          f"{total_bytes / duration / viewers / 1024:5.2f} KiB/s per viewer")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 50])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    process = multiprocessing.Process(target=serve, args=(args.port,), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{args.port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url + '/health', timeout=1).read()
+            break
+        except OSError:
+            time.sleep(0.1)
+    server = psutil.Process(process.pid)
+    print(f"{os.cpu_count()} cores, {args.duration:.0f}s per run")
+
+    for viewers in args.viewers:
+        for mode in ('poll', 'stream'):
+            measure(url, server, mode, viewers, args.duration)
+
+    process.terminate()
+    process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Tail latency of the dispatch policies in a simulated worker pool.
+
+Discrete-event simulation, no real workers: Poisson arrivals are dispatched
+with the same policy functions queue_check uses, onto FIFO workers with
+log-normal service times. Some workers can be made slower to stand in for a
+throttled core. Reports p50/p99 latency and rejections for each policy.
+
+Usage:
+    python benchmarks/dispatch_sim.py [--workers 8] [--load 0.8] [--slow 1 --slow-factor 0.4]
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from dispatchpolicy import DISPATCH_POLICIES, update_ewma
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def simulate(policy, speeds, load, requests, mean_service, queue_max, alpha, seed):
+    """Run one trace through one policy and return (latencies, rejected)."""
+    rng = random.Random(seed)
+    random.seed(seed)  # p2c samples from the module RNG
+
+    queues = {queue_id: [0] for queue_id in range(1, len(speeds) + 1)}
+    workers = {queue_id: {'latency_ewma': None} for queue_id in queues}
+    free_at = {queue_id: 0.0 for queue_id in queues}
+    speed = dict(zip(queues, speeds))
+
+    arrival_rate = load * sum(speeds) / mean_service
+    sigma = 0.5
+    mu = math.log(mean_service) - sigma ** 2 / 2
+
+    completions = []  # (finish_time, queue_id, sent_time)
+    latencies = []
+    rejected = 0
+    now = 0.0
+    for _ in range(requests):
+        now += rng.expovariate(arrival_rate)
+
+        while completions and completions[0][0] <= now:
+            finish, queue_id, sent = heapq.heappop(completions)
+            queues[queue_id][0] -= 1
+            workers[queue_id]['latency_ewma'] = update_ewma(workers[queue_id]['latency_ewma'], finish - sent, alpha)
+
+        candidates = [queue_id for queue_id in queues if queues[queue_id][0] < queue_max]
+        if not candidates:
+            rejected += 1
+            continue
+
+        queue_id = policy(candidates, queues, workers)
+        service = rng.lognormvariate(mu, sigma) / speed[queue_id]
+        finish = max(now, free_at[queue_id]) + service
+        free_at[queue_id] = finish
+        queues[queue_id][0] += 1
+        heapq.heappush(completions, (finish, queue_id, now))
+        latencies.append(finish - now)
+
+    return latencies, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--load', type=float, default=0.8, help="Offered load as a fraction of pool capacity")
+    parser.add_argument('--requests', type=int, default=200000)
+    parser.add_argument('--service-ms', type=float, default=300, help="Mean translation time on a normal core")
+    parser.add_argument('--slow', type=int, default=1, help="Number of throttled workers")
+    parser.add_argument('--slow-factor', type=float, default=0.4, help="Speed of a throttled worker")
+    parser.add_argument('--queue-max', type=int, default=10)
+    parser.add_argument('--alpha', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    speeds = [args.slow_factor] * args.slow + [1.0] * (args.workers - args.slow)
+    print(f"{args.workers} workers ({args.slow} at {args.slow_factor}x), load {args.load:.0%}, "
+          f"{args.requests} requests")
+    for name, policy in DISPATCH_POLICIES.items():
+        latencies, rejected = simulate(policy, speeds, args.load, args.requests, args.service_ms / 1000,
+                                       args.queue_max, args.alpha, args.seed)
+        print(f"{name:18} p50 {percentile(latencies, 0.5) * 1000:7.0f} ms | "
+              f"p99 {percentile(latencies, 0.99) * 1000:7.0f} ms | rejected {rejected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Latency of long messages with and without sentence fan-out.
+
+Drives a real QueueManager with a CPU-bound stub translator and sends one
+long message at a time, so every other core is idle. With fan-out on, the
+sentences are spread over the idle cores and the reply should come back
+roughly (number of cores) times sooner.
+
+Usage:
+    python benchmarks/fanout_latency.py [--messages 10] [--sentences 12]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from harness import FakeMessage, FakeReaction, busy_translate, wait_for_replies
+
+from cmdqueue import QueueManager
+from usagemonitor import get_total_cores
+
+
+async def run(fanout_enabled, messages, sentences):
+    queue_manager = QueueManager(translate_func=busy_translate)
+    queue_manager.fanout_enabled = fanout_enabled
+    if fanout_enabled and queue_manager.autoscaler:
+        # What FANOUT_ENABLED=1 does at startup: a warm worker per core
+        queue_manager.autoscaler.min_workers = queue_manager.autoscaler.max_workers
+    queue_manager.cpu_usage_max = 101  # Measure fan-out, not the CPU admission check
+    queue_manager.cache = None  # Every message is the same text; make them all real work
+    queue_manager.rate_limiter = None  # One fake channel sends everything
+    queue_manager.replies.channel_burst = 0
+    monitor = asyncio.create_task(queue_manager.async_monitor())
+
+    text = " ".join(f"Das ist der Satz Nummer {i} in einer langen Nachricht." for i in range(sentences))
+
+    # Warm every core first so cold starts don't skew the numbers
+    warmup = [FakeMessage(text) for _ in range(get_total_cores())]
+    for message in warmup:
+        await queue_manager.task_sort(message.content, FakeReaction(message))
+    await wait_for_replies(warmup)
+    while fanout_enabled and sum(worker['ready'] for worker in queue_manager.workers.values()) < get_total_cores():
+        await asyncio.sleep(0.1)  # The autoscaler is still warming the rest of the pool
+
+    latencies = []
+    for _ in range(messages):
+        message = FakeMessage(text)
+        started = time.perf_counter()
+        await queue_manager.task_sort(message.content, FakeReaction(message))
+        await wait_for_replies([message])
+        latencies.append((message.replied_at - started) * 1000)
+
+    queue_manager.shutdown_all_queues()
+    monitor.cancel()
+    return len(text), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--sentences', type=int, default=12)
+    args = parser.parse_args()
+
+    for fanout_enabled in (False, True):
+        length, latencies = asyncio.run(run(fanout_enabled, args.messages, args.sentences))
+        print(f"fan-out {'on ' if fanout_enabled else 'off'} ({length} chars, {get_total_cores()} cores): "
+              f"median {statistics.median(latencies):7.1f} ms | max {max(latencies):7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Shared pieces for benchmarks that drive a real QueueManager without Discord.
+
+The fake message/reaction objects only implement what QueueManager and the
+Translate cog touch. The stub translators are module-level so they can be
+pickled to forkserver/spawn workers.
+"""
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+# CPU cost of the stub translator per input character; ~10 ms for a 50 char sentence
+STUB_SECONDS_PER_CHAR = 0.0002
+
+_message_ids = itertools.count(1)
+
+
+def busy_translate(text):
+    """Stub translator that burns CPU in proportion to the text length."""
+    deadline = time.perf_counter() + len(text) * STUB_SECONDS_PER_CHAR
+    while time.perf_counter() < deadline:
+        pass
+    return text.upper()
+
+
+# What leaky_translate has kept; STUB_LEAK_BYTES is read from the environment,
+# which forkserver workers inherit from the benchmark that set it
+_leaked = []
+
+
+def leaky_translate(text):
+    """busy_translate that keeps STUB_LEAK_BYTES (default 1024) forever per call, to check leaks are found."""
+    _leaked.append(bytearray(int(os.environ.get('STUB_LEAK_BYTES', 1024))))
+    return busy_translate(text)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+
+class FakeMessage:
+    def __init__(self, content, message_id=None, channel_id=1, guild_id=1):
+        self.id = message_id if message_id is not None else next(_message_ids)
+        self.content = content
+        self.channel = type('FakeChannel', (), {'id': channel_id})()
+        self.guild = type('FakeGuild', (), {'id': guild_id})()
+        self.replies = []
+        self.created = time.perf_counter()
+        self.replied_at = None
+
+    async def reply(self, text, **kwargs):
+        self.replies.append(text)
+        if self.replied_at is None:
+            self.replied_at = time.perf_counter()
+
+
+class FakeReaction:
+    def __init__(self, message, emoji='🇩🇪'):
+        self.message = message
+        self.emoji = emoji
+
+
+async def wait_for_replies(messages, timeout=60):
+    """Wait until every message has at least one reply, or the timeout passes."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if all(message.replies for message in messages):
+            return True
+        await asyncio.sleep(0.005)
+    return False
@@ -0,0 +1,90 @@
+"""
+Worker memory growth over a long run against the stub translator.
+
+Drives a real QueueManager with worker memory tracking on, keeping
+--concurrency unique messages in flight (no cache, so every one reaches a
+worker) for --duration seconds. Every --report-every seconds it prints each
+worker's tasks, RSS and growth per 1000 tasks, fitted over all of the
+worker's memory reports so far, plus the bot process's own RSS; at the end,
+each worker's top allocation sites. With --leak-bytes the stub keeps that
+many bytes per call, to check that a leak shows up.
+
+Usage:
+    python benchmarks/memory_soak.py [--duration 7200] [--report-every 300] [--leak-bytes 0]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+import psutil
+
+from harness import FakeMessage, FakeReaction, busy_translate, leaky_translate, wait_for_replies
+
+from cmdqueue import QueueManager
+from memorytracker import format_report
+
+TEXT = "Guten Tag! Ich hätte gerne eine Übersetzung dieses Satzes, bitte."
+
+
+async def client(queue_manager, stop, numbers):
+    """Send one message at a time until stopped, like a user waiting on each reply."""
+    while not stop.is_set():
+        message = FakeMessage(f"{TEXT} ({next(numbers)})")
+        await queue_manager.task_sort(message.content, FakeReaction(message))
+        await wait_for_replies([message], timeout=60)
+
+
+def print_report(queue_manager, started, bot):
+    elapsed = time.monotonic() - started
+    print(f"--- {elapsed / 60:6.1f} min | tasks accepted {queue_manager.accepted_count} | "
+          f"failed {queue_manager.failed_count} | bot RSS {bot.memory_info().rss / 2**20:.1f} MiB")
+    for worker in queue_manager.memory_report()['workers']:
+        print(f"  queue {worker['queue_id']:3} | {worker['tasks']:8} tasks | RSS {worker['rss'] / 2**20:7.1f} MiB | "
+              f"{worker['rss_per_1k_tasks'] / 2**10:+8.2f} KiB/1k tasks | "
+              f"heap {worker['traced_per_1k_tasks'] / 2**10:+8.2f} KiB/1k tasks | {worker['reports']} reports")
+
+
+async def run(args):
+    queue_manager = QueueManager(translate_func=leaky_translate if args.leak_bytes else busy_translate)
+    queue_manager.memory_interval = args.interval
+    queue_manager.cpu_usage_max = 101  # Keep the pool busy, not the CPU admission check
+    queue_manager.cache = None
+    queue_manager.rate_limiter = None  # One fake channel sends everything
+    queue_manager.replies.channel_burst = 0
+    monitor = asyncio.create_task(queue_manager.async_monitor())
+
+    bot = psutil.Process(os.getpid())
+    stop = asyncio.Event()
+    numbers = itertools.count()
+    clients = [asyncio.create_task(client(queue_manager, stop, numbers)) for _ in range(args.concurrency)]
+
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(min(args.report_every, args.duration - (time.monotonic() - started)))
+        print_report(queue_manager, started, bot)
+
+    stop.set()
+    await asyncio.gather(*clients)
+    print()
+    print(format_report(queue_manager.memory_report()))
+    queue_manager.shutdown_all_queues()
+    monitor.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=7200, help="Seconds to run")
+    parser.add_argument('--report-every', type=float, default=300, help="Seconds between progress lines")
+    parser.add_argument('--interval', type=float, default=30, help="Seconds between worker memory reports")
+    parser.add_argument('--concurrency', type=int, default=8, help="Messages in flight")
+    parser.add_argument('--leak-bytes', type=int, default=0, help="Bytes the stub keeps per call")
+    args = parser.parse_args()
+
+    os.environ['STUB_LEAK_BYTES'] = str(args.leak_bytes)  # Before the forkserver starts
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Cost and consistency of publishing reports: one Value per metric vs MetricsBlock.
+
+Times a full update (every metric in REPORT_LAYOUT) and a full read on each
+side, first with nothing else running and then with a writer process
+publishing as fast as it can, which is also when torn reads can happen. A
+writer sets every metric to the same number on each update, so a snapshot
+with more than one distinct number in it is torn.
+
+Usage:
+    python benchmarks/metrics_block.py [--reads 20000] [--writes 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from metricsblock import MetricsBlock, REPORT_LAYOUT
+
+
+class ValueReports:
+    """The previous layout: a dict of separately locked Values and Arrays."""
+
+    def __init__(self, layout):
+        self.values = {}
+        for name, kind, *length in layout:
+            if length:
+                self.values[name] = multiprocessing.Array(kind, length[0])
+            else:
+                self.values[name] = multiprocessing.Value(kind, 0)
+
+    def write(self, metrics):
+        for name, value in metrics.items():
+            report = self.values[name]
+            if isinstance(value, list):
+                with report.get_lock():
+                    report[:] = value
+            else:
+                report.value = value
+
+    def read(self):
+        snapshot = {}
+        for name, report in self.values.items():
+            if isinstance(report, multiprocessing.sharedctypes.SynchronizedArray):
+                with report.get_lock():
+                    snapshot[name] = report[:]
+            else:
+                snapshot[name] = report.value
+        return snapshot
+
+
+def metrics_for(number):
+    """One update with every metric set to number."""
+    return {name: ([number] * length[0] if length else number) for name, kind, *length in REPORT_LAYOUT}
+
+
+def is_torn(snapshot):
+    seen = set()
+    for value in snapshot.values():
+        if isinstance(value, list):
+            seen.update(value)
+        else:
+            seen.add(value)
+    return len(seen) > 1
+
+
+def writer(reports, stop):
+    number = 0
+    while not stop.is_set():
+        number = (number + 1) % 1000
+        reports.write(metrics_for(number))
+
+
+def time_calls(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def measure(label, reports, reads, writes):
+    update = metrics_for(7)
+    write_us = time_calls(lambda: reports.write(update), writes)
+    read_us = time_calls(reports.read, reads)
+
+    stop = multiprocessing.Event()
+    process = multiprocessing.Process(target=writer, args=(reports, stop))
+    process.start()
+    time.sleep(0.2)
+    torn = 0
+    start = time.perf_counter()
+    for _ in range(reads):
+        torn += is_torn(reports.read())
+    contended_us = (time.perf_counter() - start) / reads * 1e6
+    stop.set()
+    process.join()
+
+    print(f"{label:12} write {write_us:7.1f} us | read {read_us:7.1f} us | "
+          f"read under writes {contended_us:7.1f} us | torn {torn}/{reads} ({torn / reads:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reads', type=int, default=20000)
+    parser.add_argument('--writes', type=int, default=20000)
+    args = parser.parse_args()
+
+    scalars = sum(1 for entry in REPORT_LAYOUT if len(entry) == 2)
+    slots = sum(entry[2] if len(entry) == 3 else 1 for entry in REPORT_LAYOUT)
+    print(f"{len(REPORT_LAYOUT)} metrics ({scalars} scalars, {slots} slots), {os.cpu_count()} cores")
+
+    measure('Value/Array', ValueReports(REPORT_LAYOUT), args.reads, args.writes)
+    measure('MetricsBlock', MetricsBlock(REPORT_LAYOUT), args.reads, args.writes)
+
+
+if __name__ == '__main__':
+    main()
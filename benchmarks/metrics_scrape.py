@@ -0,0 +1,73 @@
+"""
+Cost of a Prometheus scrape of /metrics, rendered vs served from the cache.
+
+Fills a reports block with a busy bot's worth of workers and histogram
+counts, then times PrometheusExporter.render() when it has to render, when
+its cache is fresh, and a whole /metrics request through Flask's test client.
+
+Usage:
+    python benchmarks/metrics_scrape.py [--scrapes 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from latencyhistogram import CumulativeHistogram
+from metricsblock import MetricsBlock, WORKER_SLOTS
+from prometheusexport import PrometheusExporter
+from requesttrace import RequestTracer
+from utilmonitor import create_app
+
+
+def fill(reports):
+    latency = CumulativeHistogram()
+    tracer = RequestTracer()
+    for job_id in range(2000):
+        stamps, now = {}, 0.0
+        for stamp in ('received', 'routed', 'piped', 'started', 'finished', 'read', 'reply_started', 'replied'):
+            now += random.expovariate(20)
+            stamps[stamp] = now
+        latency.record(now)
+        tracer.record(job_id, 1, stamps)
+    reports.write({
+        'tasks_accepted': 2000, 'tasks_rejected_ram': 3, 'admission_rejected': 12, 'worker_spawns': 9,
+        'worker_ids': list(range(1, WORKER_SLOTS + 1)), 'worker_depths': [random.randint(0, 10) for _ in range(WORKER_SLOTS)],
+        'latency_buckets': latency.pack(), 'trace_stage_buckets': tracer.pack_stage_totals()
+    })
+
+
+def per_call(function, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scrapes', type=int, default=2000)
+    args = parser.parse_args()
+
+    reports = MetricsBlock()
+    fill(reports)
+    exporter = PrometheusExporter(reports, cache_seconds=5)
+
+    def uncached():
+        exporter.body = None
+        exporter.render()
+
+    body = exporter.render()
+    print(f"{len(body)} bytes, {len(body.splitlines())} lines, {WORKER_SLOTS} worker slots")
+    print(f"render            {per_call(uncached, args.scrapes):8.1f} us")
+    print(f"cached            {per_call(exporter.render, args.scrapes):8.1f} us")
+
+    client = create_app(reports).test_client()
+    print(f"GET /metrics      {per_call(lambda: client.get('/metrics'), args.scrapes):8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
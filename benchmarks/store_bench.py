@@ -0,0 +1,77 @@
+"""
+Load and lookup cost of the persistent translation store.
+
+Fills a throwaway SQLite store through the normal buffered put()/flush()
+path, then measures batched lookups (hits and misses, as task_sort does
+them) and how long warming the cache with the hottest entries takes.
+
+Usage:
+    python benchmarks/store_bench.py [--rows 50000] [--lookups 2000] [--batch 4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from translationcache import TranslationCache
+from translationstore import TranslationStore
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(rows, lookups, batch, warm):
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranslationStore(os.path.join(directory, 'bench.db'), max_rows=rows, flush_batch=rows + 1)
+        await store.open()
+
+        started = time.perf_counter()
+        for i in range(rows):
+            store.put(f"Das ist Satz Nummer {i}.", f"This is sentence number {i}.")
+        await store.flush()
+        load_seconds = time.perf_counter() - started
+        print(f"load    {rows} rows in {load_seconds:.2f}s ({rows / load_seconds:,.0f} rows/s)")
+
+        for label, make_text in [('hit ', lambda: f"Das ist Satz Nummer {random.randrange(rows)}."),
+                                 ('miss', lambda: f"Unbekannter Satz {random.random()}.")]:
+            latencies = []
+            for _ in range(lookups):
+                texts = [make_text() for _ in range(batch)]
+                started = time.perf_counter()
+                await store.lookup_many(texts)
+                latencies.append((time.perf_counter() - started) * 1000)
+            print(f"lookup {label} batch of {batch}: median {statistics.median(latencies):.3f} ms | "
+                  f"p99 {percentile(latencies, 0.99):.3f} ms")
+
+        await store.flush()  # Hit counts, so there is something hot to warm from
+        cache = TranslationCache(max_entries=warm)
+        started = time.perf_counter()
+        for source, translation, from_code, to_code in reversed(await store.hottest(warm)):
+            cache.put(source, translation, from_code, to_code)
+        print(f"warm    {len(cache.entries)} entries into the cache in "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=4, help="Segments per lookup")
+    parser.add_argument('--warm', type=int, default=1000, help="Entries loaded on boot")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.rows, args.lookups, args.batch, args.warm))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Memory and request latency of the monitoring server in each WEB_MODE.
+
+Starts the server the way app.py would, forked from a parent that has
+imported what app.py imports: in its own process under waitress and under
+Flask's development server (WEB_MODE=process), and as the aiohttp app on a
+process's event loop (WEB_MODE=bot). After a warm-up, it records the memory
+the server costs, the whole web process in process mode and what starting the
+server added to its process in bot mode, then times sequential GETs of
+/api/stats and /metrics, each on a new connection like the dashboard's fetches.
+
+USS (memory only that process has) is what a separate process really costs
+after fork; RSS also counts pages still shared with the parent.
+
+Usage:
+    python benchmarks/web_modes.py [--requests 2000] [--port 5098]
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+import psutil
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from metricsblock import MetricsBlock, REPORT_LAYOUT
+from metricshistory import MetricsHistory
+from utilmonitor import create_app
+
+# Imported by app.py, so already in every process the servers are forked from
+for module in ('discord', 'flask'):
+    importlib.import_module(module)
+
+
+def memory(pid):
+    info = psutil.Process(pid).memory_full_info()
+    return info.rss, info.uss
+
+
+def serve_waitress(reports, history, port, ready):
+    import waitress
+    ready.set()
+    waitress.serve(create_app(reports, history, max_subscribers=4), host='127.0.0.1', port=port, threads=8)
+
+
+def serve_flask(reports, history, port, ready):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    ready.set()
+    create_app(reports, history).run(host='127.0.0.1', port=port, threaded=True)
+
+
+def serve_bot(reports, history, port, ready, before):
+    """An event loop standing in for the bot's, with the monitoring server started on it."""
+    from asyncmonitor import start_async_webserver
+
+    async def main():
+        before.value = memory(os.getpid())[1]
+        await start_async_webserver(reports, history, host='127.0.0.1', port=port)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def get(url):
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=5) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def wait_until_up(url):
+    for _ in range(100):
+        try:
+            get(url)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} never came up")
+
+
+def measure(label, target, reports, history, port, requests):
+    ready = multiprocessing.Event()
+    before = multiprocessing.Value('d', 0)
+    args = (reports, history, port, ready) + ((before,) if target is serve_bot else ())
+    process = multiprocessing.Process(target=target, args=args, daemon=True)
+    process.start()
+    ready.wait()
+    url = f"http://127.0.0.1:{port}"
+    wait_until_up(url + '/health')
+
+    for path in ('/dashboard', '/api/stats', '/metrics', '/api/history?metric=cpu&range=1h', '/api/debug'):
+        for _ in range(20):
+            get(url + path)
+    rss, uss = memory(process.pid)
+    if target is serve_bot:
+        cost = f"server adds USS {(uss - before.value) / 2**20:5.1f} MiB"
+    else:
+        cost = f"process RSS {rss / 2**20:5.1f} MiB, USS {uss / 2**20:5.1f} MiB"
+
+    timings = []
+    for path in ('/api/stats', '/metrics'):
+        samples = sorted(get(url + path) for _ in range(requests))
+        timings.append(f"{path} p50 {statistics.median(samples) * 1e3:5.2f} ms "
+                       f"p99 {samples[int(len(samples) * 0.99)] * 1e3:5.2f} ms")
+    print(f"{label:16} {cost:40} | " + " | ".join(timings))
+
+    process.terminate()
+    process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+
+    reports = MetricsBlock(REPORT_LAYOUT)
+    reports.write({'cpu': 12.5, 'ram': 41.0, 'queues': 2, 'jobs': 3, 'response_time': 0.4, 'connected_servers': 12})
+    history = MetricsHistory(reports.scalars())
+    history.record(reports.read())
+    print(f"{os.cpu_count()} cores, {args.requests} requests per endpoint, parent RSS "
+          f"{memory(os.getpid())[0] / 2**20:.1f} MiB")
+
+    measure('process/waitress', serve_waitress, reports, history, args.port, args.requests)
+    measure('process/flask', serve_flask, reports, history, args.port + 1, args.requests)
+    measure('bot/aiohttp', serve_bot, reports, history, args.port + 2, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Dispatch-to-pickup latency of an idle translation worker.
+
+Compares the old poll()/sleep(0.1) worker loop against the current
+event-driven processspawner.worker_process. Both run with a stub translator
+that returns the moment it was called, so the number measured is purely the
+time between pipe.send() in the parent and the worker picking the task up.
+
+Usage:
+    python benchmarks/worker_pickup.py [--tasks 200]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from processspawner import worker_process
+
+
+def stamp_translator(text):
+    """Stub translator: returns the monotonic time the task was picked up."""
+    return repr(time.monotonic())
+
+
+def legacy_worker_process(core_id, pipe, translate_func):
+    """The pre-change worker loop: poll the pipe, sleep 100 ms when idle."""
+    while True:
+        if pipe.poll():
+            task_data = pipe.recv()
+            if task_data == "STOP":
+                break
+            result = translate_func(task_data['task'])
+            pipe.send({'id': task_data['id'], 'result': result})
+        else:
+            time.sleep(0.1)
+
+
+def measure(target, tasks):
+    """Dispatch `tasks` tasks to an idle worker and return pickup latencies (ms)."""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=target, args=(0, child_conn, stamp_translator))
+    process.start()
+
+    latencies = []
+    try:
+        if target is worker_process:
+            parent_conn.recv()  # Ready message sent after warm-up
+
+        for task_id in range(tasks):
+            # Let the worker go idle at a random point of its sleep cycle
+            time.sleep(random.uniform(0.05, 0.25))
+            sent = time.monotonic()
+            parent_conn.send({'id': task_id, 'task': 'Hallo Welt'})
+            response = parent_conn.recv()
+            if isinstance(response, list):
+                response = response[0]  # Batched result message
+            latencies.append((float(response['result']) - sent) * 1000)
+    finally:
+        parent_conn.send("STOP")
+        process.join(timeout=5)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=200)
+    args = parser.parse_args()
+
+    for name, target in [('poll/sleep (before)', legacy_worker_process),
+                         ('event-driven (after)', worker_process)]:
+        latencies = measure(target, args.tasks)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:22} median {statistics.median(latencies):7.3f} ms | "
+              f"p99 {p99:7.3f} ms | max {latencies[-1]:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Lost requests, latency and worker memory with and without worker recycling.
+
+Drives a real QueueManager with the leaky stub translator, keeping
+--concurrency unique messages in flight for --duration seconds, once with
+no limits and once with WORKER_MAX_TASKS set to --max-tasks. Each run
+reports messages translated and lost (an error reply or none at all),
+reply latency percentiles, workers recycled, and the largest worker RSS
+seen, sampled every half second: recycling should keep RSS flat without
+losing a message or moving the latency tail.
+
+Usage:
+    python benchmarks/worker_recycling.py [--duration 60] [--max-tasks 300] [--leak-bytes 65536]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+
+import psutil
+
+from harness import FakeMessage, FakeReaction, leaky_translate, wait_for_replies
+
+from cmdqueue import QueueManager
+
+TEXT = "Guten Tag! Ich hätte gerne eine Übersetzung dieses Satzes, bitte."
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def client(queue_manager, stop, numbers, messages):
+    """Send one message at a time until stopped, like a user waiting on each reply."""
+    while not stop.is_set():
+        message = FakeMessage(f"{TEXT} ({next(numbers)})")
+        messages.append(message)
+        await queue_manager.task_sort(message.content, FakeReaction(message))
+        await wait_for_replies([message], timeout=60)
+
+
+def worker_rss(queue_manager):
+    total = 0
+    for queue_data in list(queue_manager.queues.values()):
+        try:
+            total = max(total, psutil.Process(queue_data[1]).memory_info().rss)
+        except psutil.Error:
+            pass  # Exited between listing and reading
+    return total
+
+
+async def run(args, max_tasks):
+    queue_manager = QueueManager(translate_func=leaky_translate)
+    queue_manager.max_tasks = max_tasks
+    queue_manager.max_rss = 0
+    queue_manager.cpu_usage_max = 101  # Keep the pool busy, not the CPU admission check
+    queue_manager.cache = None
+    queue_manager.rate_limiter = None  # One fake channel sends everything
+    queue_manager.replies.channel_burst = 0
+    monitor = asyncio.create_task(queue_manager.async_monitor())
+
+    # Don't count the first worker's model load against either run
+    warmup = FakeMessage(TEXT)
+    await queue_manager.task_sort(warmup.content, FakeReaction(warmup))
+    await wait_for_replies([warmup])
+
+    stop = asyncio.Event()
+    numbers = itertools.count()
+    messages = []
+    clients = [asyncio.create_task(client(queue_manager, stop, numbers, messages)) for _ in range(args.concurrency)]
+
+    peak_rss = 0
+    started = time.monotonic()
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(0.5)
+        peak_rss = max(peak_rss, worker_rss(queue_manager))
+    stop.set()
+    await asyncio.gather(*clients)
+
+    translated = [message for message in messages if message.replies and message.replies[0].startswith('🇩🇪')]
+    latencies = [message.replied_at - message.created for message in translated]
+    result = {
+        'sent': len(messages),
+        'lost': len(messages) - len(translated),
+        'failed': queue_manager.failed_count,
+        'recycled': queue_manager.recycle_count,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies, default=0.0),
+        'rss': peak_rss,
+        'rss_end': worker_rss(queue_manager)
+    }
+    queue_manager.shutdown_all_queues()
+    monitor.cancel()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=60, help="Seconds to send messages per run")
+    parser.add_argument('--concurrency', type=int, default=4, help="Messages in flight")
+    parser.add_argument('--max-tasks', type=int, default=300, help="WORKER_MAX_TASKS for the recycling run")
+    parser.add_argument('--leak-bytes', type=int, default=65536, help="Bytes the stub keeps per call")
+    args = parser.parse_args()
+
+    os.environ['STUB_LEAK_BYTES'] = str(args.leak_bytes)  # Before the forkserver starts
+    print(f"{os.cpu_count()} cores, {args.concurrency} in flight for {args.duration:g}s, "
+          f"{args.leak_bytes} bytes leaked per task")
+    for label, max_tasks in [('no recycling', 0), (f'max {args.max_tasks} tasks', args.max_tasks)]:
+        result = asyncio.run(run(args, max_tasks))
+        print(f"{label:16} {result['sent']:6} sent | lost {result['lost']} (failed {result['failed']}) | "
+              f"recycled {result['recycled']:3} | p50 {result['p50'] * 1000:6.1f} ms | "
+              f"p99 {result['p99'] * 1000:6.1f} ms | max {result['max'] * 1000:6.1f} ms | "
+              f"worker RSS peak {result['rss'] / 2**20:6.1f} MiB, end {result['rss_end'] / 2**20:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
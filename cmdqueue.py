@@ -2,13 +2,41 @@ import asyncio
 import multiprocessing
 import os
 import time
+from collections import deque
 
-import psutil
+from multiprocessing.connection import wait
 
-from usagemonitor import get_ram_usage, get_cpu_info, get_core_usage, get_total_cores
+from usagemonitor import get_sampler, get_core_usage, get_total_cores
 from processspawner import spawn_process_on_core
+from ratelimiter import RateLimiter
+from autoscaler import Autoscaler
+from latencyhistogram import CumulativeHistogram, LatencyHistogram
+from requesttrace import RequestTracer
+from replydispatcher import ReplyDispatcher
+from memorytracker import summarize_growth
+from dispatchpolicy import get_dispatch_policy, update_ewma
+from segmenter import split_segments, group_segments, join_segments
+from translationcache import TranslationCache, normalize_text
+from translationstore import TranslationStore
 from errorlogger import error_logger
-from config import AVG_ELAPSED_SAMPLE_SIZE, MAX_CPU, MAX_RAM
+from config import (LATENCY_WINDOW, MAX_CPU, MAX_RAM,
+                    WORKER_START_METHOD, WORKER_PRELOAD, WORKER_WARMUP_TEXT,
+                    BATCH_MAX_SIZE, BATCH_WAIT_MS, BATCH_TRANSLATE,
+                    FANOUT_ENABLED, FANOUT_MIN_CHARS, FANOUT_MAX_SEGMENTS,
+                    CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_MAX_MB,
+                    STORE_ENABLED, STORE_PATH, STORE_MAX_ROWS, STORE_FLUSH_INTERVAL, STORE_WARM_ON_BOOT,
+                    COALESCE_REPLY_MODE, DISPATCH_POLICY, DISPATCH_EWMA_ALPHA,
+                    ADMISSION_QUEUE_MAX, ADMISSION_DEADLINE,
+                    RATE_LIMIT_ENABLED, RATE_LIMIT_USER_BURST, RATE_LIMIT_USER_PER_MIN,
+                    RATE_LIMIT_CHANNEL_BURST, RATE_LIMIT_CHANNEL_PER_MIN,
+                    RATE_LIMIT_GUILD_BURST, RATE_LIMIT_GUILD_PER_MIN, RATE_LIMIT_MAX_BUCKETS,
+                    AUTOSCALE_ENABLED, AUTOSCALE_INTERVAL, AUTOSCALE_MIN_WORKERS, AUTOSCALE_MAX_WORKERS,
+                    AUTOSCALE_TARGET_UTILIZATION, AUTOSCALE_COOLDOWN, AUTOSCALE_IDLE_TIMEOUT,
+                    WORKER_MAX_TASKS, WORKER_MAX_RSS_MB, WORKER_RECYCLE_INTERVAL,
+                    TRACE_RECENT, TRACE_SLOW_THRESHOLD, TRACE_SLOW_LOG,
+                    REPLY_CONCURRENCY, REPLY_MAX_RETRIES, REPLY_BACKOFF,
+                    REPLY_CHANNEL_BURST, REPLY_CHANNEL_WINDOW,
+                    MEMORY_TRACK_INTERVAL, MEMORY_TRACK_SAMPLES, MEMORY_TRACK_FRAMES)
 
 
 class QueueManager:
@@ -17,46 +45,145 @@ class QueueManager:
     Handles task delegation, load balancing, and resource monitoring.
     """
     
-    def __init__(self):
+    def __init__(self, translate_func=None):
         try:
             self.queue_max = 10
+            self.translate_func = translate_func  # None = argosetup's translator
             self.queues = {}  # {queue_id: [task_count, pid, core_id, pipe]}
+            self.queue_counter = 0  # Never reused, so a closed queue's ID can't collide
+            self.workers = {}  # {queue_id: {'ready', 'spawned_at', 'held', ...}}, see make_new_queue
+
+            # Completion delivery: pipe readers registered on the event loop
+            self.loop = None
+            self.readers = {}  # {queue_id: fd}
+            self.completed = None  # asyncio.Queue of (queue_id, result)
+            self.use_readers = True  # False on loops without add_reader (Windows Proactor)
+            self.harvest_task = None
+
+            # Worker profiles in progress, see profile_worker
+            self.profiles = {}  # {queue_id: asyncio.Future}
+
+            # Opt-in memory reports from new workers, see memory_report
+            self.memory_interval = MEMORY_TRACK_INTERVAL  # 0 = off
+            self.memory_frames = MEMORY_TRACK_FRAMES
             
             # Resource thresholds
             self.ram_usage_max = MAX_RAM  # Percentage
             self.cpu_usage_max = MAX_CPU  # Percentage
+
+            # Which eligible worker gets the next task
+            self.dispatch_policy = get_dispatch_policy(DISPATCH_POLICY)
+            self.latency_alpha = DISPATCH_EWMA_ALPHA
+
+            # Tasks waiting for a worker slot when every queue is full; drained by
+            # run_admission as slots free up, oldest first
+            self.admission = deque()  # {'job_id', 'segments', 'queued_at', 'deadline'}
+            self.admission_max = ADMISSION_QUEUE_MAX
+            self.admission_deadline = ADMISSION_DEADLINE  # Seconds a task may wait for a worker
+            self.admission_event = None  # asyncio.Event, set when a slot may have freed
+            self.admission_task = None
+            self.admission_rejected = 0
+
+            # Pool size follows the predicted load instead of closing idle workers
+            # after every task; without it, empty queues are closed right away.
+            # With fan-out on, a long message's segments only go to warm workers,
+            # so keep one warm on every core a message may be spread over
+            max_workers = min(AUTOSCALE_MAX_WORKERS or get_total_cores(), get_total_cores())
+            fanout_width = min(FANOUT_MAX_SEGMENTS, max_workers) if FANOUT_ENABLED else 1
+            self.autoscaler = Autoscaler(
+                min_workers=max(AUTOSCALE_MIN_WORKERS, fanout_width),
+                max_workers=max_workers,
+                target_utilization=AUTOSCALE_TARGET_UTILIZATION,
+                cooldown=AUTOSCALE_COOLDOWN,
+                idle_timeout=AUTOSCALE_IDLE_TIMEOUT
+            ) if AUTOSCALE_ENABLED else None
+            self.autoscale_task = None
+            self.spawn_count = 0
+            self.teardown_count = 0
+
+            # Workers past their task or RSS limit are replaced, see recycle
+            self.max_tasks = WORKER_MAX_TASKS  # 0 = no limit
+            self.max_rss = WORKER_MAX_RSS_MB * 1024 * 1024  # Bytes, 0 = no limit
+            self.recycling = {}  # {old queue_id: replacement queue_id}
+            self.recycle_task = None
+            self.recycle_count = 0
+
+            # Flood protection, checked before a request costs anything
+            self.rate_limiter = RateLimiter({
+                'user': (RATE_LIMIT_USER_BURST, RATE_LIMIT_USER_PER_MIN),
+                'channel': (RATE_LIMIT_CHANNEL_BURST, RATE_LIMIT_CHANNEL_PER_MIN),
+                'guild': (RATE_LIMIT_GUILD_BURST, RATE_LIMIT_GUILD_PER_MIN)
+            }, RATE_LIMIT_MAX_BUCKETS) if RATE_LIMIT_ENABLED else None
+
+            # Sentence fan-out of long messages
+            self.fanout_enabled = FANOUT_ENABLED
+            self.fanout_min_chars = FANOUT_MIN_CHARS
             
             # Task tracking
             self.task_counter = 0
             self.pending_tasks = {}  # {task_id: task_info}
 
-            self.times_avg_list = []
+            # A job is one translation request, split into sentence segments;
+            # uncached segments go to workers as one or more tasks
+            self.job_counter = 0
+            self.jobs = {}  # {job_id: job_info}
+
+            # Single-flight: repeat requests for a message already being translated
+            # wait on that job instead of dispatching again
+            self.inflight = {}  # {(message_id, normalized_text): job_id}
+            self.coalesce_reply_mode = COALESCE_REPLY_MODE  # 'single' or 'each'
+            self.coalesced_count = 0
+
+            # Segment translations, checked before anything is dispatched
+            self.cache = TranslationCache(CACHE_MAX_ENTRIES, CACHE_MAX_MB * 1024 * 1024) if CACHE_ENABLED else None
+
+            # On-disk translations behind the cache; opened by async_monitor
+            self.store = None
+            self.store_task = None
+
+            # Request latency over a rolling window; avg_time is its mean
+            self.latency = LatencyHistogram(window=LATENCY_WINDOW)
+            self.latency_totals = CumulativeHistogram()  # Since startup, for /metrics
             self.avg_time = None
+
+            # Lifetime task counters for /metrics
+            self.accepted_count = 0  # Sent to a worker or admitted to wait for one
+            self.ram_rejected_count = 0
+            self.failed_count = 0  # Accepted, then lost to a dead worker or a failed send
+
+            # Where that latency goes, stage by stage
+            self.tracer = RequestTracer(TRACE_RECENT, TRACE_SLOW_THRESHOLD, TRACE_SLOW_LOG, LATENCY_WINDOW)
+
+            # Replies are queued and sent off the completion path, so a slow or
+            # rate-limited Discord call never holds up draining the worker pipes
+            self.replies = ReplyDispatcher(
+                concurrency=REPLY_CONCURRENCY,
+                max_retries=REPLY_MAX_RETRIES,
+                backoff=REPLY_BACKOFF,
+                channel_burst=REPLY_CHANNEL_BURST,
+                channel_window=REPLY_CHANNEL_WINDOW,
+                latency_window=LATENCY_WINDOW
+            )
+
+            # Requests that waited on a warming worker vs. ones that hit a ready one
+            self.cold_latency = LatencyHistogram(window=LATENCY_WINDOW)
+            self.warm_latency = LatencyHistogram(window=LATENCY_WINDOW)
+            self.warmup_latency = LatencyHistogram(window=LATENCY_WINDOW)  # Spawn to model loaded
+            self.queue_wait = LatencyHistogram(window=LATENCY_WINDOW)  # Admission queue wait for a slot
+
+            # CPU/RAM/worker RSS sampled in the background; dispatch only reads its snapshot
+            self.sampler = get_sampler()
             
             print("🔧 QueueManager initialized")
         except Exception as e:
             error_logger(e, "Failed to initialize QueueManager")
             raise
 
-    async def is_ram_free(self, reply_context):
+    async def is_ram_free(self):
         """Check if system has enough available RAM."""
         try:
-            ram_data = get_ram_usage()
-            if not ram_data or 'percentage' not in ram_data:
-                error_logger(ValueError("Invalid RAM data returned"), "RAM check validation")
-                return True  # Fail open
-                
-            ram_percentage = float(ram_data['percentage'].replace('%', ''))
-            
-            if ram_percentage >= self.ram_usage_max:
-                try:
-                    await reply_context.message.reply(
-                        "System overloaded, please try again later."
-                    )
-                except Exception as reply_error:
-                    error_logger(reply_error, f"Failed to send RAM overload message to user")
-                return False
-            return True
+            ram_percentage = float(self.sampler.latest()['ram_percent'])
+            return ram_percentage < self.ram_usage_max
             
         except ValueError as e:
             error_logger(e, "Failed to parse RAM percentage")
@@ -114,14 +241,42 @@ class QueueManager:
                 error_logger(ValueError(f"Invalid core ID: {core_id}"), f"Total cores: {get_total_cores()}")
                 return None
                 
-            pid, actual_core_id, pipe = spawn_process_on_core(core_id)
+            pid, actual_core_id, pipe = spawn_process_on_core(
+                core_id,
+                translate_func=self.translate_func,
+                start_method=WORKER_START_METHOD,
+                preload=['argosetup'] if WORKER_PRELOAD else None,
+                warmup_text=WORKER_WARMUP_TEXT,
+                batch_size=BATCH_MAX_SIZE,
+                batch_wait=BATCH_WAIT_MS / 1000,
+                batch_translate=BATCH_TRANSLATE,
+                memory_interval=self.memory_interval,
+                memory_frames=self.memory_frames
+            )
             
             if not pipe:
                 error_logger(RuntimeError("Pipe creation failed"), f"Core {core_id}")
                 return None
                 
-            queue_id = len(self.queues) + 1
+            self.queue_counter += 1
+            queue_id = self.queue_counter
             self.queues[queue_id] = [0, pid, actual_core_id, pipe]
+            self.workers[queue_id] = {
+                'ready': False,
+                'spawned_at': time.monotonic(),
+                'held': [],
+                'latency_ewma': None,  # Seconds from send to result, warm tasks only
+                'service_ewma': None,  # Seconds of work per task, for admission wait estimates
+                'last_completed_at': None,
+                'completed': 0,
+                'stats': {'tasks': 0, 'busy': 0.0, 'cpu': 0.0},  # The worker's own totals, sent with its results
+                'translate_latency': CumulativeHistogram(),  # Worker-side seconds per task, for /api/workers
+                'memory': deque(maxlen=MEMORY_TRACK_SAMPLES),  # Its MemoryTracker reports, when tracking
+                'draining': False  # Being recycled: no new tasks, stopped once its queue is empty
+            }
+            self.add_pipe_reader(queue_id)
+            self.sampler.watch_pid(pid)
+            self.spawn_count += 1
             print(f"🆕 Created queue {queue_id} on core {actual_core_id}")
             return queue_id
             
@@ -129,21 +284,216 @@ class QueueManager:
             error_logger(e, f"Failed to create queue on core {core_id}")
             return None
 
-    def queue_check(self):
-        """Find an available queue or create a new one."""
+    def free_core(self):
+        """Return the lowest core ID without a queue, or None if all are taken."""
+        used_cores = {queue_data[2] for queue_data in self.queues.values()
+                      if queue_data and len(queue_data) > 2}
+        for core_id in range(get_total_cores()):
+            if core_id not in used_cores:
+                return core_id
+        return None
+
+    def add_pipe_reader(self, queue_id):
+        """Register a readiness callback for a queue's pipe on the event loop."""
         try:
-            # Get CPU usage for all cores ONCE
+            if self.loop is None or self.completed is None:
+                return  # async_monitor registers it once it is running
+
+            if queue_id in self.readers or queue_id not in self.queues:
+                return
+
+            pipe = self.queues[queue_id][3]
+            if not self.use_readers:
+                self.start_threaded_harvest()
+                return
+
             try:
-                all_core_usage = psutil.cpu_percent(interval=0.1, percpu=True)
-                if not all_core_usage:
-                    raise ValueError("Empty CPU usage data")
+                self.loop.add_reader(pipe.fileno(), self.on_pipe_readable, queue_id)
+                self.readers[queue_id] = pipe.fileno()
+            except NotImplementedError:
+                # Proactor loops can't watch pipe handles; wait on them in a thread
+                self.use_readers = False
+                self.start_threaded_harvest()
+                
+        except Exception as e:
+            error_logger(e, f"Failed to register reader for queue {queue_id}")
+
+    def remove_pipe_reader(self, queue_id):
+        """Unregister a queue's pipe from the event loop."""
+        fd = self.readers.pop(queue_id, None)
+        if fd is None or self.loop is None:
+            return
+        try:
+            self.loop.remove_reader(fd)
+        except Exception as e:
+            error_logger(e, f"Failed to remove reader for queue {queue_id}")
+
+    def close_queue(self, queue_id, send_stop=True):
+        """Stop watching a queue, optionally tell its worker to stop, and forget it."""
+        self.remove_pipe_reader(queue_id)
+        for old_id, new_id in list(self.recycling.items()):
+            if queue_id in (old_id, new_id):
+                del self.recycling[old_id]
+                if queue_id == new_id and old_id in self.workers:
+                    self.workers[old_id]['draining'] = False  # Replacement died; keep the old worker
+        profile = self.profiles.pop(queue_id, None)
+        if profile and not profile.done():
+            profile.set_exception(RuntimeError(f"Queue {queue_id} closed while profiling"))
+        self.workers.pop(queue_id, None)
+        queue_data = self.queues.pop(queue_id, None)
+        if queue_data and len(queue_data) > 1:
+            self.sampler.unwatch_pid(queue_data[1])
+        if not queue_data or len(queue_data) < 4 or not queue_data[3]:
+            return
+        pipe = queue_data[3]
+        try:
+            if send_stop:
+                pipe.send("STOP")
+        except (BrokenPipeError, ConnectionError, OSError):
+            pass  # Worker already gone
+        finally:
+            try:
+                pipe.close()
+            except Exception:
+                pass
+
+    def on_pipe_readable(self, queue_id):
+        """Event loop callback: drain a worker pipe into the completion queue."""
+        queue_data = self.queues.get(queue_id)
+        if not queue_data or len(queue_data) < 4 or not queue_data[3]:
+            self.remove_pipe_reader(queue_id)
+            return
+
+        pipe = queue_data[3]
+        try:
+            while pipe.poll():
+                message = pipe.recv()
+                # Workers send a batch's results as one list
+                read_at = time.monotonic()
+                for result in (message if isinstance(message, list) else [message]):
+                    if isinstance(result, dict) and 'id' in result:
+                        result['time_read'] = read_at
+                        if 'worker_stats' in result:
+                            self.workers[queue_id]['stats'] = result.pop('worker_stats')
+                    self.completed.put_nowait((queue_id, result))
+        except (EOFError, BrokenPipeError, ConnectionError, OSError) as pipe_error:
+            error_logger(pipe_error, f"Pipe broken for queue {queue_id}")
+            self.close_queue(queue_id, send_stop=False)
+            self.loop.create_task(self.fail_queue_tasks(queue_id))
+        except Exception as e:
+            error_logger(e, f"Error reading queue {queue_id}")
+
+    def mark_ready(self, queue_id, message):
+        """Mark a worker as warm and send it the tasks that were held for it."""
+        try:
+            worker = self.workers.get(queue_id)
+            if worker is None or queue_id not in self.queues:
+                return
+
+            worker['ready'] = True
+            self.warmup_latency.record(time.monotonic() - worker['spawned_at'])
+            print(f"🔥 Queue {queue_id} ready (model warm-up {message.get('warmup_time', 0):.2f}s)")
+
+            # A replacement is warm: its old worker takes no more tasks from here
+            for old_id, new_id in list(self.recycling.items()):
+                if new_id == queue_id and old_id in self.workers:
+                    self.workers[old_id]['draining'] = True
+                    self.finish_recycling(old_id)
+
+            pipe = self.queues[queue_id][3]
+            held, worker['held'] = worker['held'], []
+            for task_data in held:
+                pipe.send(task_data)
+                task_info = self.pending_tasks.get(task_data['id'])
+                if task_info:
+                    task_info['piped'] = time.monotonic()
+                
+        except (BrokenPipeError, ConnectionError, OSError) as pipe_error:
+            error_logger(pipe_error, f"Failed to flush held tasks to queue {queue_id}")
+            self.close_queue(queue_id, send_stop=False)
+            self.loop.create_task(self.fail_queue_tasks(queue_id))
+        except Exception as e:
+            error_logger(e, f"Failed to mark queue {queue_id} ready")
+
+    async def fail_queue_tasks(self, queue_id):
+        """Tell users whose tasks were on a queue that died that it failed."""
+        for task_id, task_info in list(self.pending_tasks.items()):
+            if task_info.get('queue_id') != queue_id:
+                continue
+            del self.pending_tasks[task_id]
+            self.failed_count += 1
+
+            job = self.jobs.get(task_info.get('job_id'))
+            if not job:
+                continue
+            job['remaining'] -= 1
+            if job['remaining'] <= 0:
+                self.forget_job(task_info['job_id'])
+            if job['failed']:
+                continue  # User was already told
+            self.fail_job(task_info['job_id'])
+            self.send_to_requesters(job, "❌ Translation service temporarily unavailable")
+
+    def start_threaded_harvest(self):
+        """Start the fallback harvester for loops without add_reader support."""
+        if self.loop is None or self.completed is None:
+            return
+        if self.harvest_task is None or self.harvest_task.done():
+            self.harvest_task = self.loop.create_task(self.threaded_harvest())
+
+    async def threaded_harvest(self):
+        """Block on all worker pipes in an executor thread and hand ready ones to the loop."""
+        while True:
+            try:
+                pipes = {queue_data[3]: queue_id for queue_id, queue_data in self.queues.items()
+                         if queue_data and len(queue_data) > 3 and queue_data[3]}
+                if not pipes:
+                    await asyncio.sleep(0.5)
+                    continue
+
+                ready = await self.loop.run_in_executor(None, wait, list(pipes), 0.5)
+                for pipe in ready:
+                    self.on_pipe_readable(pipes[pipe])
+                    
             except Exception as e:
-                error_logger(e, "Failed to get CPU usage")
-                all_core_usage = [0] * get_total_cores()  # Fallback
+                error_logger(e, "Threaded harvest error")
+                await asyncio.sleep(0.1)
+
+    def sample_core_usage(self):
+        """Per-core CPU usage from the latest background sample, for a round of queue checks."""
+        try:
+            all_core_usage = self.sampler.latest()['per_core']
+            if not all_core_usage:
+                raise ValueError("Empty CPU usage data")
+            return all_core_usage
+        except Exception as e:
+            error_logger(e, "Failed to get CPU usage")
+            return [0] * get_total_cores()  # Fallback
+
+    def queue_check(self, exclude=(), all_core_usage=None, verbose=True):
+        """
+        Find an available queue or create a new one.
+
+        Args:
+            exclude (set): Queue IDs to skip (queues already holding a segment of this job).
+                With any given and the autoscaler on, no queue is created: it keeps a warm
+                worker per fan-out core, so the caller goes round those again rather than
+                wait for a cold one. Without the autoscaler nothing is kept warm, and
+                later segments start workers on free cores like the first one
+            all_core_usage (list, optional): Per-core CPU usage measured by the caller
+            verbose (bool): Print each queue's usage (off for the admission loop's retries)
+        """
+        try:
+            # Get CPU usage for all cores ONCE
+            if all_core_usage is None:
+                all_core_usage = self.sample_core_usage()
             
             # Find available queues using pre-measured CPU data
             good_queues = []
+            warming_queues = []
             for queue_id, queue_data in self.queues.items():
+                if queue_id in exclude or self.workers.get(queue_id, {}).get('draining'):
+                    continue
                 try:
                     if not queue_data or len(queue_data) < 3:
                         error_logger(ValueError("Malformed queue data"), f"Queue {queue_id}: {queue_data}")
@@ -152,149 +502,713 @@ class QueueManager:
                     core_id = queue_data[2]
                     task_count = queue_data[0]
                     
-                    # Use pre-measured CPU data instead of calling get_core_usage()
+                    # Use the sampled CPU data instead of calling get_core_usage()
                     core_usage = all_core_usage[core_id] if core_id < len(all_core_usage) else 0
                     
                     cpu_too_high = core_usage >= self.cpu_usage_max
                     queue_full = task_count >= self.queue_max
                     
-                    print(f"🔍 Core {core_id}: {core_usage}% usage, {task_count} tasks")
-                    print(f"🔍 CPU too high? {cpu_too_high} (core usage: {core_usage}%, threshold: {self.cpu_usage_max}%)")
+                    if verbose:
+                        print(f"🔍 Core {core_id}: {core_usage}% usage, {task_count} tasks")
+                        print(f"🔍 CPU too high? {cpu_too_high} (core usage: {core_usage}%, threshold: {self.cpu_usage_max}%)")
                     
                     if not cpu_too_high and not queue_full:
-                        good_queues.append(queue_id)
+                        if self.workers.get(queue_id, {}).get('ready', True):
+                            good_queues.append(queue_id)
+                        else:
+                            warming_queues.append(queue_id)
                         
                 except Exception as queue_error:
                     error_logger(queue_error, f"Error checking queue {queue_id}")
                     continue
 
             if good_queues:
-                return good_queues[0]
-            elif len(self.queues) >= get_total_cores():
-                return None  # All cores busy
+                return self.dispatch_policy(good_queues, self.queues, self.workers)
+            elif warming_queues:
+                # Task is held until the worker is warm
+                return self.dispatch_policy(warming_queues, self.queues, self.workers)
+            elif exclude and self.autoscaler:
+                return None  # Later fan-out segments share a warm queue; the autoscaler grows the pool
             else:
-                core_id = len(self.queues)
-                return self.make_new_queue(core_id)
+                # Out of slots: grow the pool now rather than on the next autoscaler tick
+                core_id = self.free_core()
+                if core_id is None:
+                    return None  # All cores busy
+                if self.autoscaler and len(self.queues) - len(self.recycling) >= self.autoscaler.max_workers:
+                    return None
+                queue_id = self.make_new_queue(core_id)
+                if queue_id and self.autoscaler:
+                    self.autoscaler.scaled_up(time.monotonic())
+                return queue_id
                 
         except Exception as e:
             error_logger(e, "Queue check failed")
             return None
 
-    async def task_sort(self, task, reaction):
+    async def task_sort(self, task, reaction, user=None):
         """Main entry point for processing translation requests."""
+        job_id = None
         try:
             if not task or not reaction:
                 error_logger(ValueError("Invalid task or reaction"), f"Task: {task}, Reaction: {reaction}")
                 return
-                
-            # Check system resources
-            if not await self.is_ram_free(reaction):
-                return
 
-            # Find available queue
-            queue_id = self.queue_check()
-            if not queue_id:
-                try:
-                    await reaction.message.reply(
-                        "Bot is processing too many requests, please try again later."
-                    )
-                except Exception as reply_error:
-                    error_logger(reply_error, "Failed to send overload message")
+            if not await self.rate_limit_ok(reaction, user):
                 return
 
-            # Create and track task
-            self.task_counter += 1
-            task_id = self.task_counter
+            # Attach to an identical request that is already in flight
+            message_id = getattr(reaction.message, 'id', None)
+            inflight_key = (message_id, normalize_text(task)) if message_id is not None else None
+            if inflight_key in self.inflight:
+                job = self.jobs.get(self.inflight[inflight_key])
+                if job and not job['failed']:
+                    job['waiters'].append((reaction, user))
+                    self.coalesced_count += 1
+                    print(f"🔗 Coalesced request for message {message_id} ({self.coalesced_count} dispatches saved)")
+                    return
 
-            self.pending_tasks[task_id] = {
+            # Register the job before the first await so concurrent repeats find it
+            self.job_counter += 1
+            job_id = self.job_counter
+            job = {
                 'reaction': reaction,
-                'queue_id': queue_id,
-                'sent_time': time.time()
+                'waiters': [],  # (reaction, user) of coalesced repeat requests
+                'inflight_key': inflight_key,
+                'segments': None,
+                'results': None,
+                'separators': None,
+                'remaining': 0,
+                'sent_time': time.monotonic(),
+                'trace': {'received': time.monotonic()},  # Stage stamps, see requesttrace
+                'tasks': 0,
+                'cold': False,
+                'failed': False
             }
+            self.jobs[job_id] = job
+            if inflight_key is not None:
+                self.inflight[inflight_key] = job_id
 
-            # Send task to worker
-            try:
-                task_data = {'id': task_id, 'task': task}
-                
-                if queue_id not in self.queues or len(self.queues[queue_id]) < 4:
-                    error_logger(ValueError("Invalid queue structure"), f"Queue {queue_id}: {self.queues.get(queue_id)}")
-                    return
-                    
-                pipe = self.queues[queue_id][3]
-                if not pipe:
-                    error_logger(RuntimeError("Pipe is None"), f"Queue {queue_id}")
-                    return
-                    
-                pipe.send(task_data)
-                self.queues[queue_id][0] += 1
+            # Sentence granularity is needed by the cache and by fan-out
+            if self.cache or self.fanout_enabled:
+                segments, separators = split_segments(task)
+            else:
+                segments, separators = [task], ['']
+
+            # Answer from the cache where possible
+            results = [None] * len(segments)
+            missing = []
+            for index, segment in enumerate(segments):
+                cached = self.cache.get(segment) if self.cache else None
+                if cached is None:
+                    missing.append(index)
+                else:
+                    results[index] = cached
+            job.update({'segments': segments, 'results': results, 'separators': separators})
+
+            # Then from the on-disk store, which also refills the memory cache
+            if missing and self.store:
+                stored = await self.store.lookup_many([segments[index] for index in missing])
+                still_missing = []
+                for index, translation in zip(missing, stored):
+                    if translation is None:
+                        still_missing.append(index)
+                        continue
+                    results[index] = translation
+                    if self.cache:
+                        self.cache.put(segments[index], translation)
+                missing = still_missing
+
+            if not missing:
+                self.forget_job(job_id)
+                self.reply_to_job(job_id, job, join_segments(results, separators))
+                return
                 
-            except (BrokenPipeError, ConnectionError) as pipe_error:
-                error_logger(pipe_error, f"Pipe communication failed for queue {queue_id}")
-                # Clean up broken queue
-                try:
-                    del self.queues[queue_id]
-                    del self.pending_tasks[task_id]
-                except:
-                    pass
-                await reaction.message.reply("❌ Translation service temporarily unavailable")
+            # Check system resources
+            if not await self.is_ram_free():
+                self.ram_rejected_count += 1
+                self.fail_job(job_id)
+                self.forget_job(job_id)
+                self.send_to_requesters(job, "System overloaded, please try again later.")
+                return
+
+            # Long messages are spread over idle cores; no more tasks than cores,
+            # extra ones would only queue up behind each other
+            if self.fanout_enabled and len(task) > self.fanout_min_chars:
+                max_tasks = min(FANOUT_MAX_SEGMENTS, get_total_cores())
+            else:
+                max_tasks = 1
+            groups = group_segments([len(segments[index]) for index in missing], max_tasks)
+
+            # Spread tasks over distinct queues, going round again once all have one.
+            # With no slot free (or others already waiting) tasks wait for one instead
+            job['trace']['routed'] = time.monotonic()
+            all_core_usage = self.sample_core_usage()
+            used_queues = set()
+            failure_message = None
+            for group in groups:
+                segment_indices = [missing[position] for position in group]
+
+                queue_id = None
+                if not self.admission:
+                    queue_id = self.queue_check(exclude=used_queues, all_core_usage=all_core_usage)
+                    if not queue_id and used_queues:
+                        used_queues = set()
+                        queue_id = self.queue_check(all_core_usage=all_core_usage)
+
+                if queue_id:
+                    if not self.send_task(job_id, segment_indices, queue_id):
+                        self.failed_count += 1
+                        failure_message = "❌ Translation service temporarily unavailable"
+                        break
+                    used_queues.add(queue_id)
+                elif not self.admit(job_id, segment_indices):
+                    failure_message = "Bot is processing too many requests, please try again later."
+                    break
+                job['remaining'] += 1
+                job['tasks'] += 1
+                self.accepted_count += 1
+                if self.autoscaler:
+                    self.autoscaler.record_arrival()
+
+            if failure_message:
+                # Tasks already sent still finish; their results are cached but not sent
+                self.fail_job(job_id)
+                self.drop_admitted(job_id)
+                self.send_to_requesters(job, failure_message)
             
         except Exception as e:
             error_logger(e, "Task sorting failed")
             try:
-                await reaction.message.reply("❌ Translation service error")
+                job = self.jobs.get(job_id)
+                if job:
+                    self.send_to_requesters(job, "❌ Translation service error")
+                else:
+                    self.replies.send(reaction.message, "❌ Translation service error")
             except:
-                pass  # Don't log Discord reply failures in the main exception handler
+                pass  # Don't log reply failures in the main exception handler
+
+    def admit(self, job_id, segment_indices):
+        """
+        Put a task in the admission queue to wait for a worker slot.
+
+        Returns:
+            bool: False if the queue is full or the expected wait is past the deadline
+        """
+        if len(self.admission) >= self.admission_max:
+            self.admission_rejected += 1
+            return False
+
+        expected_wait = self.expected_admission_wait(len(self.admission))
+        if expected_wait is not None and expected_wait > self.admission_deadline:
+            print(f"⏳ Rejecting task, expected wait {expected_wait:.1f}s > {self.admission_deadline}s")
+            self.admission_rejected += 1
+            return False
+
+        now = time.monotonic()
+        self.admission.append({
+            'job_id': job_id,
+            'segments': segment_indices,
+            'queued_at': now,
+            'deadline': now + self.admission_deadline
+        })
+        self.wake_admission()
+        return True
+
+    def expected_admission_wait(self, position):
+        """
+        Seconds until a task at this position of the admission queue is being
+        translated, from the pool's measured throughput: the tasks already
+        queued on workers go first, then the ones ahead of it here. None while
+        there's nothing to go by.
+        """
+        throughput = sum(1 / max(worker['service_ewma'], 0.001) for worker in self.workers.values()
+                         if worker.get('ready') and worker.get('service_ewma'))
+        if not throughput:
+            return None
+        backlog = sum(queue_data[0] for queue_data in self.queues.values() if queue_data)
+        return (backlog + position + 1) / throughput
+
+    def wake_admission(self):
+        """Let run_admission know a worker slot may have freed up."""
+        if self.admission_event is not None:
+            self.admission_event.set()
+
+    def drop_admitted(self, job_id):
+        """Remove a failed job's waiting tasks, and the job itself once nothing of it is outstanding."""
+        job = self.jobs.get(job_id)
+        kept = deque()
+        for entry in self.admission:
+            if entry['job_id'] == job_id:
+                if job:
+                    job['remaining'] -= 1
+            else:
+                kept.append(entry)
+        self.admission = kept
+        if job and job['remaining'] <= 0:
+            self.forget_job(job_id)
+
+    async def run_admission(self):
+        """Hand waiting tasks to workers as slots free up and expire ones past their deadline."""
+        while True:
+            try:
+                if not self.admission:
+                    await self.admission_event.wait()  # Nothing waiting: sleep until a task is queued
+                else:
+                    # Also retry when the head task expires or a new CPU sample may have
+                    # dropped below the threshold, whichever comes first
+                    timeout = min(self.admission[0]['deadline'] - time.monotonic(), self.sampler.interval)
+                    try:
+                        await asyncio.wait_for(self.admission_event.wait(), timeout=max(0.0, timeout))
+                    except asyncio.TimeoutError:
+                        pass
+                self.admission_event.clear()
+                if self.admission:
+                    await self.dispatch_admitted()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger(e, "Admission loop error")
 
-    async def handle_completed_task(self, task_id, result, time_of_recv):
-        """Handle completed translation and reply to user."""
+    async def dispatch_admitted(self):
+        """Send waiting tasks, oldest first, until no worker has a free slot."""
+        all_core_usage = self.sample_core_usage()
+        while self.admission:
+            entry = self.admission[0]
+            job_id = entry['job_id']
+            job = self.jobs.get(job_id)
+            now = time.monotonic()
+
+            if job is None:
+                self.admission.popleft()
+                continue
+            if job['failed']:
+                self.drop_admitted(job_id)
+                continue
+
+            if now > entry['deadline']:
+                self.fail_job(job_id)
+                self.drop_admitted(job_id)
+                self.admission_rejected += 1
+                self.send_to_requesters(job, "Bot is processing too many requests, please try again later.")
+                continue
+
+            queue_id = self.queue_check(all_core_usage=all_core_usage, verbose=False)
+            if not queue_id:
+                return  # Still no free slot
+
+            self.admission.popleft()
+            self.queue_wait.record(now - entry['queued_at'])
+            if not self.send_task(job_id, entry['segments'], queue_id):
+                self.failed_count += 1
+                job['remaining'] -= 1
+                self.fail_job(job_id)
+                self.drop_admitted(job_id)
+                self.send_to_requesters(job, "❌ Translation service temporarily unavailable")
+
+    async def rate_limit_ok(self, reaction, user=None):
+        """Check the requester's user, channel and guild buckets; tell them once if they're limited."""
+        if not self.rate_limiter:
+            return True
+
+        message = reaction.message
+        channel = getattr(message, 'channel', None)
+        guild = getattr(message, 'guild', None)
+        limited_scope, notify = self.rate_limiter.check({
+            'user': getattr(user, 'id', None),
+            'channel': getattr(channel, 'id', None),
+            'guild': getattr(guild, 'id', None)
+        })
+        if limited_scope is None:
+            return True
+
+        print(f"🚦 Rate limited by {limited_scope} bucket")
+        if notify:
+            who = "You are" if limited_scope == 'user' else f"This {limited_scope} is"
+            self.replies.send(message, f"⏳ {who} sending translation requests too fast, please slow down.")
+        return False
+
+    async def run_autoscaler(self):
+        """Resize the worker pool on a fixed tick, starting with the minimum warm pool."""
+        while True:
+            try:
+                self.autoscale()
+                await asyncio.sleep(AUTOSCALE_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger(e, "Autoscaler error")
+                await asyncio.sleep(AUTOSCALE_INTERVAL)
+
+    def autoscale(self):
+        """Spawn workers up to the autoscaler's target, or retire one long-idle worker."""
+        now = time.monotonic()
+        scaler = self.autoscaler
+        scaler.tick(now)
+
+        # A worker and its replacement count as one
+        current = len(self.queues) - len(self.recycling)
+        target = scaler.target(self.service_time_estimate(), len(self.admission), current)
+
+        if current < target:
+            for _ in range(target - current):
+                core_id = self.free_core()
+                if core_id is None:
+                    break
+                if self.make_new_queue(core_id):
+                    scaler.scaled_up(now)
+            if len(self.queues) - len(self.recycling) > current:
+                print(f"📈 Scaled up to {len(self.queues) - len(self.recycling)} workers "
+                      f"(target {target}, {scaler.arrival_rate:.2f} tasks/s)")
+
+        elif scaler.should_scale_down(target, current, now):
+            idle_queues = []
+            for queue_id, worker in self.workers.items():
+                queue_data = self.queues.get(queue_id)
+                if not queue_data or queue_data[0] or not worker['ready'] or worker['held']:
+                    continue
+                if queue_id in self.recycling or queue_id in self.recycling.values():
+                    continue
+                idle_for = now - (worker['last_completed_at'] or worker['spawned_at'])
+                if idle_for >= scaler.idle_timeout:
+                    idle_queues.append((idle_for, queue_id))
+
+            if idle_queues:
+                _, queue_id = max(idle_queues)
+                self.close_queue(queue_id)
+                self.teardown_count += 1
+                scaler.scaled_down(now)
+                print(f"📉 Retired idle queue {queue_id}, {len(self.queues)} workers left (target {target})")
+
+    async def run_recycler(self):
+        """Check the workers against their RSS limit (and task limit, also checked per task) on a fixed tick."""
+        while True:
+            try:
+                self.recycle()
+                await asyncio.sleep(WORKER_RECYCLE_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_logger(e, "Recycler error")
+                await asyncio.sleep(WORKER_RECYCLE_INTERVAL)
+
+    def recycle(self):
+        """
+        Start replacing one worker that is past its task or RSS limit.
+
+        The replacement is spawned next to it, on a free core if there is
+        one, and the old worker keeps serving while the replacement warms
+        up, so capacity never drops. Once the replacement is ready (see
+        mark_ready) the old worker gets no new tasks; finish_recycling stops
+        it when its last task is back. One worker at a time, so a pool that
+        reaches its limits together isn't replaced all at once.
+        """
+        for queue_id in list(self.recycling):
+            self.finish_recycling(queue_id)  # In case it was held up by a profile
+        if self.recycling:
+            return  # Still replacing one
+        worker_rss = self.sampler.latest()['worker_rss']
+        for queue_id, worker in sorted(self.workers.items()):
+            queue_data = self.queues.get(queue_id)
+            if not queue_data or not worker['ready']:
+                continue
+            rss = worker_rss.get(queue_data[1], 0)
+            if self.max_tasks and worker['completed'] >= self.max_tasks:
+                reason = f"{worker['completed']} tasks"
+            elif self.max_rss and rss >= self.max_rss:
+                reason = f"RSS {rss / 2**20:.0f} MiB"
+            else:
+                continue
+
+            core_id = self.free_core()
+            replacement = self.make_new_queue(queue_data[2] if core_id is None else core_id)
+            if replacement:
+                self.recycling[queue_id] = replacement
+                print(f"♻️ Recycling queue {queue_id} ({reason}), replacement is queue {replacement}")
+            return
+
+    def finish_recycling(self, queue_id):
+        """Stop a draining worker once it has no tasks left."""
+        worker = self.workers.get(queue_id)
+        queue_data = self.queues.get(queue_id)
+        if not worker or not queue_data or not worker['draining']:
+            return
+        if queue_data[0] or worker['held'] or queue_id in self.profiles:
+            return  # Still finishing its tasks
+        replacement = self.recycling.get(queue_id)
+        self.close_queue(queue_id)
+        self.teardown_count += 1
+        self.recycle_count += 1
+        print(f"♻️ Recycled queue {queue_id} after {worker['completed']} tasks, queue {replacement} took over")
+
+    def worker_stats(self):
+        """
+        Per-worker statistics, by queue ID.
+
+        Tasks, busy and CPU seconds are the worker's own totals from its last
+        result; RSS comes from the background sampler. Nothing here asks the
+        worker anything.
+
+        Returns:
+            list: dicts with queue_id, pid, core, ready, depth, tasks, busy,
+                cpu, rss, uptime, latency_buckets (a CumulativeHistogram.pack()),
+                and with memory tracking on traced bytes and RSS growth per
+                1000 tasks (zeros otherwise)
+        """
+        now = time.monotonic()
+        worker_rss = self.sampler.latest()['worker_rss']
+        stats = []
+        for queue_id, queue_data in sorted(self.queues.items()):
+            worker = self.workers.get(queue_id)
+            if not worker or len(queue_data) < 3:
+                continue
+            stats.append({
+                'queue_id': queue_id,
+                'pid': queue_data[1],
+                'core': queue_data[2],
+                'ready': worker['ready'],
+                'depth': queue_data[0],
+                'tasks': worker['stats']['tasks'],
+                'busy': worker['stats']['busy'],
+                'cpu': worker['stats']['cpu'],
+                'rss': worker_rss.get(queue_data[1], 0),
+                'uptime': now - worker['spawned_at'],
+                'latency_buckets': worker['translate_latency'].pack(),
+                'traced': worker['memory'][-1]['traced'] if worker['memory'] else 0,
+                'rss_growth': summarize_growth(worker['memory'])['rss_per_1k_tasks'] if worker['memory'] else 0.0
+            })
+        return stats
+
+    def memory_report(self):
+        """
+        What each worker's memory did since it warmed up, for /api/memory.
+
+        Returns:
+            dict: 'tracking' (seconds between reports, 0 = off) and 'workers',
+                per worker its latest report (rss, traced, top allocation
+                sites), growth rates and how many reports they are based on
+        """
+        workers = []
+        for queue_id, worker in sorted(self.workers.items()):
+            queue_data = self.queues.get(queue_id)
+            if not queue_data or not worker['memory']:
+                continue
+            samples = list(worker['memory'])
+            latest = samples[-1]
+            workers.append(dict(
+                summarize_growth(samples),
+                queue_id=queue_id,
+                pid=queue_data[1],
+                core=queue_data[2],
+                tasks=latest['tasks'],
+                rss=latest['rss'],
+                rss_at_start=samples[0]['rss'],
+                traced=latest['traced'],
+                traced_peak=latest['traced_peak'],
+                reports=len(samples),
+                tracked_for=latest['time'] - samples[0]['time'],
+                top=latest['top']
+            ))
+        return {'tracking': self.memory_interval, 'workers': workers}
+
+    async def profile_worker(self, queue_id, seconds, mode='sample'):
+        """
+        Profile one worker for seconds while it keeps serving tasks.
+
+        The request goes down the task pipe, so a worker busy with a batch
+        starts once the batch is done. See cpuprofiler for the modes.
+
+        Returns:
+            dict: The worker's cpuprofiler result
+
+        Raises:
+            ValueError: If there is no such ready worker
+            RuntimeError: If it is already being profiled, refused, or went away
+        """
+        worker = self.workers.get(queue_id)
+        if worker is None or queue_id not in self.queues:
+            raise ValueError(f"No worker with queue ID {queue_id}")
+        if not worker['ready']:
+            raise ValueError(f"Queue {queue_id} is still warming up")
+        if queue_id in self.profiles:
+            raise RuntimeError(f"Queue {queue_id} is already being profiled")
+
+        profile = self.loop.create_future()
+        self.profiles[queue_id] = profile
+        try:
+            self.queues[queue_id][3].send({'profile': seconds, 'mode': mode})
+            # The worker may finish a batch first; give it time for that
+            result = await asyncio.wait_for(profile, seconds + max(30.0, seconds))
+        except (BrokenPipeError, ConnectionError, OSError) as pipe_error:
+            raise RuntimeError(f"Couldn't reach queue {queue_id}: {pipe_error}") from pipe_error
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Queue {queue_id} didn't send its profile back") from None
+        finally:
+            if self.profiles.get(queue_id) is profile:
+                del self.profiles[queue_id]
+
+        if 'error' in result:
+            raise RuntimeError(f"Queue {queue_id}: {result['error']}")
+        return result
+
+    def service_time_estimate(self):
+        """Seconds of work per task across warm workers, or None before any have finished one."""
+        samples = [worker['service_ewma'] for worker in self.workers.values() if worker.get('service_ewma')]
+        if samples:
+            return sum(samples) / len(samples)
+        return self.avg_time or None
+
+    def fail_job(self, job_id):
+        """Mark a job failed so nothing else attaches to it; its user is told separately."""
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        job['failed'] = True
+        if self.inflight.get(job['inflight_key']) == job_id:
+            del self.inflight[job['inflight_key']]
+
+    def forget_job(self, job_id):
+        """Drop a job once none of its tasks are outstanding."""
+        job = self.jobs.pop(job_id, None)
+        if job and self.inflight.get(job['inflight_key']) == job_id:
+            del self.inflight[job['inflight_key']]
+
+    def send_task(self, job_id, segment_indices, queue_id):
+        """
+        Send some of a job's segments to a worker queue as one task.
+
+        Returns:
+            int: Task ID, or None if the queue turned out to be broken
+        """
+        # Create and track task
+        self.task_counter += 1
+        task_id = self.task_counter
+
+        self.pending_tasks[task_id] = {
+            'job_id': job_id,
+            'segments': segment_indices,
+            'queue_id': queue_id,
+            'sent_time': time.monotonic()
+        }
+
+        # Send task to worker
+        try:
+            segments = self.jobs[job_id]['segments']
+            texts = [segments[index] for index in segment_indices]
+            task_data = {'id': task_id, 'task': texts if len(texts) > 1 else texts[0]}
+            
+            if queue_id not in self.queues or len(self.queues[queue_id]) < 4:
+                raise ConnectionError(f"Invalid queue structure: {self.queues.get(queue_id)}")
+                
+            pipe = self.queues[queue_id][3]
+            if not pipe:
+                raise ConnectionError("Pipe is None")
+                
+            worker = self.workers.get(queue_id)
+            if worker and not worker['ready']:
+                # Only ready workers get tasks; this one is flushed on warm-up
+                worker['held'].append(task_data)
+                self.pending_tasks[task_id]['cold'] = True
+            else:
+                pipe.send(task_data)
+                self.pending_tasks[task_id]['piped'] = time.monotonic()
+            self.queues[queue_id][0] += 1
+            return task_id
+            
+        except (BrokenPipeError, ConnectionError, OSError) as pipe_error:
+            error_logger(pipe_error, f"Pipe communication failed for queue {queue_id}")
+            # Clean up broken queue
+            self.pending_tasks.pop(task_id, None)
+            self.close_queue(queue_id, send_stop=False)
+            self.loop.create_task(self.fail_queue_tasks(queue_id))
+            return None
+
+    def record_worker_latency(self, queue_id, task_info, timing=None):
+        """Update a worker's latency and service time EWMAs with a finished task (held tasks include warm-up, so skip them)."""
+        worker = self.workers.get(queue_id)
+        if not worker:
+            return
+        worker['completed'] += 1
+        if timing and timing.get('started') is not None and timing.get('finished') is not None:
+            worker['translate_latency'].record(timing['finished'] - timing['started'])
+        now = time.monotonic()
+        if not task_info.get('cold'):
+            latency = now - task_info['sent_time']
+            worker['latency_ewma'] = update_ewma(worker['latency_ewma'], latency, self.latency_alpha)
+
+            # Service time: since the previous result if the worker was busy all along
+            busy_since = max(task_info['sent_time'], worker['last_completed_at'] or 0)
+            worker['service_ewma'] = update_ewma(worker['service_ewma'], now - busy_since, self.latency_alpha)
+        worker['last_completed_at'] = now
+
+    async def handle_completed_task(self, task_id, result, time_of_recv, timing=None):
+        """
+        Handle a completed task and reply once its whole job is translated.
+
+        timing holds the worker's started/finished stamps and when the bot read
+        the result; the job's last task provides its trace.
+        """
         try:
             if task_id not in self.pending_tasks:
                 error_logger(ValueError(f"Unknown task ID: {task_id}"), "Task completion error")
                 return
 
-            task_info = self.pending_tasks[task_id]
+            task_info = self.pending_tasks.pop(task_id)
             if not task_info:
                 error_logger(ValueError("Empty task info"), f"Task ID: {task_id}")
                 return
                 
-            reaction = task_info.get('reaction')
             queue_id = task_info.get('queue_id')
-            start_time = task_info.get('sent_time')
-            
-            if not all([reaction, queue_id is not None, start_time]):
-                error_logger(ValueError("Incomplete task info"), f"Task {task_id}: {task_info}")
-                return
-
-            # Calculate elapsed time
-            try:
-                elapsed_time = time_of_recv - start_time
-                self.avg_list_calc(elapsed_time)
-            except Exception as timing_error:
-                error_logger(timing_error, f"Failed to calculate elapsed time for task {task_id}")
+            job_id = task_info.get('job_id')
 
-            # Reply to user
+            # Free the queue slot
             try:
-                if not result:
-                    result = "[Translation failed]"
-                await reaction.message.reply(f"🇩🇪➡️🇺🇸 {result}")
-            except Exception as reply_error:
-                error_logger(reply_error, f"Failed to send translation result for task {task_id}")
-
-            # Clean up
-            try:
-                del self.pending_tasks[task_id]
-                
                 if queue_id in self.queues and len(self.queues[queue_id]) > 0:
                     self.queues[queue_id][0] -= 1
                 else:
                     error_logger(ValueError("Invalid queue during cleanup"), f"Queue {queue_id}")
             except Exception as cleanup_error:
                 error_logger(cleanup_error, f"Failed to clean up task {task_id}")
+
+            job = self.jobs.get(job_id)
+            if not job:
+                error_logger(ValueError(f"Unknown job ID: {job_id}"), f"Task {task_id}: {task_info}")
+                return
+
+            # List tasks come back as a list of segment translations
+            segment_indices = task_info.get('segments', [0])
+            translations = result if isinstance(result, list) else [result] * len(segment_indices)
+            for index, translation in zip(segment_indices, translations):
+                job['results'][index] = translation
+                if self.cache and translation:
+                    self.cache.put(job['segments'][index], translation)
+                if self.store and translation:
+                    self.store.put(job['segments'][index], translation)
+            job['cold'] = job['cold'] or task_info.get('cold', False)
+            job['remaining'] -= 1
+            self.record_worker_latency(queue_id, task_info, timing)
+            if queue_id in self.recycling:
+                self.finish_recycling(queue_id)
+            elif self.max_tasks and not self.recycling:
+                if self.workers.get(queue_id, {}).get('completed', 0) >= self.max_tasks:
+                    self.recycle()  # Don't wait for the tick to start a replacement
+
+            if job['remaining'] <= 0:
+                self.forget_job(job_id)
+                job['trace']['piped'] = task_info.get('piped')
+                job['trace'].update(timing or {})
+                if not job['failed']:
+                    await self.complete_job(job_id, job, time_of_recv)
+
+            self.wake_admission()
             
-            # Clean up empty queues
+            # Without the autoscaler, clean up empty queues (not while tasks are waiting for one)
             try:
                 empty_queues = []
                 for q_id, queue_data in self.queues.items():
+                    if self.autoscaler or self.admission:
+                        break
+                    if q_id in self.recycling or q_id in self.recycling.values():
+                        continue  # Closed by finish_recycling
                     if queue_data and len(queue_data) > 0 and queue_data[0] == 0:
                         empty_queues.append(q_id)
                 
@@ -302,10 +1216,8 @@ class QueueManager:
                 for q_id in empty_queues[1:]:  # Skip first empty queue
                     try:
                         if q_id in self.queues and len(self.queues[q_id]) > 3:
-                            pipe = self.queues[q_id][3]
-                            if pipe:
-                                pipe.send("STOP")
-                            del self.queues[q_id]
+                            self.close_queue(q_id)
+                            self.teardown_count += 1
                             print(f"🧹 Closed empty queue {q_id}")
                     except Exception as queue_cleanup_error:
                         error_logger(queue_cleanup_error, f"Failed to close queue {q_id}")
@@ -318,114 +1230,154 @@ class QueueManager:
         except Exception as e:
             error_logger(e, f"Failed to handle completed task {task_id}")
 
+    async def complete_job(self, job_id, job, time_of_recv):
+        """Record a finished job's latency and reply with the reassembled translation."""
+        reaction = job.get('reaction')
+        start_time = job.get('sent_time')
+        
+        if not all([reaction, start_time]):
+            error_logger(ValueError("Incomplete job info"), f"Job {job_id}: {job}")
+            return
+
+        # Calculate elapsed time
+        try:
+            elapsed_time = time_of_recv - start_time
+            self.latency.record(elapsed_time)
+            self.latency_totals.record(elapsed_time)
+            self.avg_time = self.latency.snapshot(percentiles=())['mean']
+            (self.cold_latency if job['cold'] else self.warm_latency).record(elapsed_time)
+        except Exception as timing_error:
+            error_logger(timing_error, f"Failed to calculate elapsed time for job {job_id}")
+
+        # Reply to user
+        if any(job['results']):
+            segments = [segment or "[Translation failed]" for segment in job['results']]
+            result = join_segments(segments, job['separators'])
+        else:
+            result = "[Translation failed]"
+
+        def on_replied(queued_at, delivered_at, ok):
+            job['trace']['reply_started'] = queued_at
+            job['trace']['replied'] = delivered_at
+            self.tracer.record(job_id, job['tasks'], job['trace'])
+
+        self.reply_to_job(job_id, job, result, on_replied)
+
+    def reply_to_job(self, job_id, job, result, on_done=None):
+        """Queue a job's translation for its requester and any coalesced requesters."""
+        self.send_to_requesters(job, f"🇩🇪➡️🇺🇸 {result}", on_done)
+
+    def send_to_requesters(self, job, content, on_done=None):
+        """Queue a reply, translation or failure, for a job's requester and any coalesced requesters."""
+        self.replies.send(job['reaction'].message, content, on_done)
+
+        if self.coalesce_reply_mode != 'each':
+            return  # Everyone reacted to the same message; one reply answers them all
+
+        for reaction, user in job['waiters']:
+            mention = f"{user.mention} " if user is not None else ""
+            self.replies.send(reaction.message, f"{mention}{content}")
+
     async def async_monitor(self):
-        """Monitor all worker pipes for completed translations."""
+        """Handle completed translations as worker pipes become readable."""
         print("👀 Monitor started...")
+
+        self.loop = asyncio.get_running_loop()
+        self.completed = asyncio.Queue()
+
+        await self.start_store()
+
+        self.admission_event = asyncio.Event()
+        self.admission_task = asyncio.create_task(self.run_admission())
+
+        if self.autoscaler:
+            self.autoscale_task = asyncio.create_task(self.run_autoscaler())
+
+        if self.max_tasks or self.max_rss:
+            self.recycle_task = asyncio.create_task(self.run_recycler())
+        
+        # Queues created before the loop was running still need their readers
+        for queue_id in list(self.queues):
+            self.add_pipe_reader(queue_id)
         
         while True:
             try:
-                # Only process if we have active queues
-                if not self.queues:
-                    await asyncio.sleep(0.5)  # Longer sleep when no queues
-                    continue
-                
-                any_data_processed = False
-                
-                # Create a copy of queue items to avoid modification during iteration
-                queue_items = list(self.queues.items())
-                
-                for queue_id, queue_data in queue_items:
-                    try:
-                        if not queue_data or len(queue_data) < 4:
-                            error_logger(ValueError("Invalid queue data in monitor"), f"Queue {queue_id}: {queue_data}")
-                            continue
-                            
-                        pipe = queue_data[3]
-                        if not pipe:
-                            error_logger(ValueError("Pipe is None"), f"Queue {queue_id}")
-                            continue
-                        
-                        # Check if pipe has data without blocking
-                        if pipe.poll():
-                            try:
-                                result = pipe.recv()
-                                if isinstance(result, dict) and 'id' in result and 'result' in result:
-                                    task_id = result['id']
-                                    translation = result['result']
-                                    time_of_recv = result.get('time_finished', time.time())
-                                    await self.handle_completed_task(task_id, translation, time_of_recv)
-                                    any_data_processed = True
-                                else:
-                                    error_logger(ValueError("Invalid result format"), f"Queue {queue_id}: {result}")
-                                    
-                            except (EOFError, BrokenPipeError) as pipe_error:
-                                error_logger(pipe_error, f"Pipe broken for queue {queue_id}")
-                                # Remove broken queue
-                                try:
-                                    del self.queues[queue_id]
-                                except:
-                                    pass
-                            except Exception as process_error:
-                                error_logger(process_error, f"Error processing queue {queue_id}")
-                                
-                    except Exception as queue_error:
-                        error_logger(queue_error, f"Error monitoring queue {queue_id}")
-                        continue
-                
-                # Adaptive sleep - shorter if we processed data, longer if idle
-                if any_data_processed:
-                    await asyncio.sleep(0.05)  # 50ms when active
+                queue_id, result = await self.completed.get()
+
+                if isinstance(result, dict) and result.get('status') == 'ready':
+                    self.mark_ready(queue_id, result)
+                elif isinstance(result, dict) and result.get('status') == 'memory':
+                    if queue_id in self.workers:
+                        self.workers[queue_id]['memory'].append(result)
+                elif isinstance(result, dict) and result.get('status') == 'profile':
+                    profile = self.profiles.get(queue_id)
+                    if profile and not profile.done():
+                        profile.set_result(result)
+                elif isinstance(result, dict) and 'id' in result and 'result' in result:
+                    task_id = result['id']
+                    translation = result['result']
+                    time_of_recv = result.get('time_finished', time.monotonic())
+                    timing = {
+                        'started': result.get('time_started'),
+                        'finished': result.get('time_finished'),
+                        'read': result.get('time_read')
+                    }
+                    await self.handle_completed_task(task_id, translation, time_of_recv, timing)
                 else:
-                    await asyncio.sleep(0.2)   # 200ms when idle
+                    error_logger(ValueError("Invalid result format"), f"Queue {queue_id}: {result}")
                     
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 error_logger(e, "Monitor loop error")
-                await asyncio.sleep(1)
+
+    async def start_store(self):
+        """Open the persistent store, warm the memory cache from it and start its flusher."""
+        if not STORE_ENABLED or self.store:
+            return
+        try:
+            store = TranslationStore(STORE_PATH, STORE_MAX_ROWS, STORE_FLUSH_INTERVAL)
+            await store.open()
+            self.store = store
+
+            if STORE_WARM_ON_BOOT and self.cache:
+                hottest = await store.hottest(STORE_WARM_ON_BOOT)
+                # Coldest first, so the hottest end up most recently used
+                for source, translation, from_code, to_code in reversed(hottest):
+                    self.cache.put(source, translation, from_code, to_code)
+                print(f"💾 Warmed cache with {len(hottest)} stored translations")
+
+            self.store_task = asyncio.create_task(store.run_flusher())
+            print(f"💾 Translation store opened at {STORE_PATH}")
+            
+        except Exception as e:
+            error_logger(e, f"Failed to open translation store at {STORE_PATH}")
+            self.store = None
+
+    async def shutdown(self):
+        """Stop every worker, then write out what the store and slow request log still have buffered."""
+        self.shutdown_all_queues()
+        await asyncio.get_running_loop().run_in_executor(None, self.tracer.close)
+        if self.store_task:
+            self.store_task.cancel()
+            await asyncio.gather(self.store_task, return_exceptions=True)
+            self.store_task = None
+        if self.store:
+            try:
+                await self.store.close()
+                print("💾 Translation store flushed and closed")
+            except Exception as e:
+                error_logger(e, "Failed to close translation store")
+            self.store = None
 
     def shutdown_all_queues(self):
         """Gracefully shutdown all worker processes."""
         try:
-            for queue_id, queue_data in self.queues.items():
+            for queue_id in list(self.queues):
                 try:
-                    if queue_data and len(queue_data) > 3:
-                        pipe = queue_data[3]
-                        if pipe:
-                            pipe.send("STOP")
-                            print(f"🔄 Sent shutdown signal to queue {queue_id}")
-                        else:
-                            error_logger(ValueError("Pipe is None during shutdown"), f"Queue {queue_id}")
-                    else:
-                        error_logger(ValueError("Invalid queue data during shutdown"), f"Queue {queue_id}: {queue_data}")
+                    self.close_queue(queue_id)
+                    print(f"🔄 Sent shutdown signal to queue {queue_id}")
                 except Exception as queue_shutdown_error:
                     error_logger(queue_shutdown_error, f"Failed to shutdown queue {queue_id}")
         except Exception as e:
             error_logger(e, "Failed to shutdown all queues")
-
-    def avg_list_calc(self, new_time_elapsed):
-        """Calculate running average of translation times."""
-        try:
-            if not isinstance(new_time_elapsed, (int, float)) or new_time_elapsed < 0:
-                error_logger(ValueError(f"Invalid elapsed time: {new_time_elapsed}"), "Average calculation")
-                return self.avg_time or 0
-
-            if len(self.times_avg_list) < AVG_ELAPSED_SAMPLE_SIZE:
-                self.times_avg_list.append(new_time_elapsed)
-            elif len(self.times_avg_list) == AVG_ELAPSED_SAMPLE_SIZE:
-                self.times_avg_list.pop(0)  # Remove oldest (FIFO)
-                self.times_avg_list.append(new_time_elapsed)
-            else:
-                # This shouldn't happen, but handle gracefully
-                error_logger(ValueError(f"Unexpected list size: {len(self.times_avg_list)}"), "Average calculation")
-                self.times_avg_list = [new_time_elapsed]
-
-            # Calculate and store average
-            if self.times_avg_list:
-                self.avg_time = sum(self.times_avg_list) / len(self.times_avg_list)
-                return self.avg_time
-            else:
-                self.avg_time = 0
-                return 0
-                
-        except Exception as e:
-            error_logger(e, f"Failed to calculate average for time: {new_time_elapsed}")
-            return self.avg_time or 0
\ No newline at end of file
@@ -0,0 +1,99 @@
+import io
+import sys
+
+from discord.ext import commands
+import discord
+
+from cpuprofiler import run_profile
+from memorytracker import format_report
+from errorlogger import error_logger
+
+# Add higher directory to python modules path
+sys.path.append("..")
+
+
+class Admin(commands.Cog):
+    """Owner-only commands for looking inside the running bot."""
+
+    def __init__(self, bot):
+        try:
+            if not bot:
+                raise ValueError("Bot instance cannot be None")
+
+            self.bot = bot
+
+        except Exception as e:
+            error_logger(e, "Failed to initialize Admin cog")
+            raise
+
+    @commands.command(name='profile')
+    @commands.is_owner()
+    async def profile(self, ctx, target='bot', seconds: float = 10, mode='sample'):
+        """
+        $profile [bot|<queue id>] [seconds] [sample|cprofile]
+
+        Profiles the bot's event loop or one worker and uploads the result:
+        collapsed stacks for 'sample', a pstats report and .prof dump for
+        'cprofile'. Queue IDs are the ones on /api/workers.
+        """
+        try:
+            await ctx.reply(f"🔬 Profiling {target} ({mode}) for {seconds:g}s...")
+            result = await run_profile(getattr(self.bot, 'queue_manager', None), target, seconds, mode)
+
+            name = f"profile-{target}-{result['pid']}"
+            if mode == 'cprofile':
+                files = [discord.File(io.BytesIO(result['output'].encode()), filename=f"{name}.txt"),
+                         discord.File(io.BytesIO(result['dump']), filename=f"{name}.prof")]
+                summary = f"{result['seconds']:.1f}s traced"
+            else:
+                files = [discord.File(io.BytesIO(result['output'].encode()), filename=f"{name}.collapsed")]
+                summary = f"{result['samples']} samples over {result['seconds']:.1f}s"
+            await ctx.reply(f"✅ Profile of {target} (pid {result['pid']}): {summary}", files=files)
+
+        except (ValueError, RuntimeError) as profile_error:
+            await ctx.reply(f"❌ {profile_error}")
+        except Exception as e:
+            error_logger(e, f"Profiling {target} failed")
+            await ctx.reply("❌ Profiling failed")
+
+    @commands.command(name='memory')
+    @commands.is_owner()
+    async def memory(self, ctx):
+        """
+        $memory
+
+        Uploads each worker's memory growth since warm-up and its top
+        allocation sites (needs MEMORY_TRACK_INTERVAL set).
+        """
+        try:
+            queue_manager = getattr(self.bot, 'queue_manager', None)
+            if queue_manager is None:
+                await ctx.reply("❌ Workers aren't available")
+                return
+            report = format_report(queue_manager.memory_report())
+            await ctx.reply("🧠 Worker memory", file=discord.File(io.BytesIO(report.encode()), filename="memory.txt"))
+
+        except Exception as e:
+            error_logger(e, "Memory report failed")
+            await ctx.reply("❌ Memory report failed")
+
+    @profile.error
+    @memory.error
+    async def admin_command_error(self, ctx, error):
+        if isinstance(error, commands.NotOwner):
+            return  # Not worth an answer
+        if isinstance(error, commands.BadArgument):
+            await ctx.reply(f"❌ Usage: {ctx.command.help.strip().splitlines()[0]}")  # The docstring's first line
+            return
+        error_logger(error, f"{ctx.command.name} command error")
+
+
+async def setup(bot):
+    """Setup function for loading the cog."""
+    try:
+        await bot.add_cog(Admin(bot))
+        print("✅ Admin cog loaded successfully")
+
+    except Exception as e:
+        error_logger(e, "Failed to setup Admin cog")
+        raise
@@ -36,6 +36,13 @@ class Translate(commands.Cog):
             error_logger(e, "Failed to initialize Translate cog")
             raise
         
+    async def cog_unload(self):
+        """Called when the bot closes: stop the workers and flush the translation store."""
+        try:
+            await queue_manager.shutdown()
+        except Exception as e:
+            error_logger(e, "Failed to shut down QueueManager")
+
     @commands.Cog.listener()
     async def on_ready(self):
         """Called when the cog is ready."""
@@ -105,7 +112,7 @@ class Translate(commands.Cog):
                         return
                     
                     # Send to queue manager for processing
-                    await self.bot.queue_manager.task_sort(message_content, reaction)
+                    await self.bot.queue_manager.task_sort(message_content, reaction, user)
                     
                 except AttributeError as attr_error:
                     error_logger(attr_error, f"Missing attribute during translation: {attr_error}")
@@ -2,6 +2,8 @@ import sys
 import psutil
 from discord.ext import commands, tasks
 from errorlogger import error_logger
+from usagemonitor import get_sampler
+from metricsblock import WORKER_FIELDS
 import asyncio
 
 # Add higher directory to python modules path
@@ -35,9 +37,9 @@ class Utilities(commands.Cog):
     @commands.Cog.listener()
     async def on_ready(self):
         try:
-            # Initialize CPU monitoring baseline
+            # Start background CPU/RAM sampling
             try:
-                psutil.cpu_percent(interval=0.1)
+                get_sampler()
             except Exception as cpu_init_error:
                 error_logger(cpu_init_error, "Failed to initialize CPU monitoring")
                 
@@ -57,7 +59,7 @@ class Utilities(commands.Cog):
             await self.bot.wait_until_ready()
             
             try:
-                psutil.cpu_percent(interval=0.1)
+                get_sampler()
             except Exception as cpu_init_error:
                 error_logger(cpu_init_error, "Failed to initialize CPU monitoring in cog_load")
                 
@@ -72,9 +74,10 @@ class Utilities(commands.Cog):
     @tasks.loop(seconds=0.5)
     async def update_all_stats(self):
         try:
-            # Get system metrics with individual error handling
+            # Get system metrics from the background sampler's latest snapshot
+            snapshot = get_sampler().latest()
             try:
-                cpu_usage = psutil.cpu_percent(interval=None)
+                cpu_usage = snapshot['cpu_percent']
                 if not isinstance(cpu_usage, (int, float)) or cpu_usage < 0:
                     raise ValueError(f"Invalid CPU usage value: {cpu_usage}")
             except Exception as cpu_error:
@@ -82,7 +85,7 @@ class Utilities(commands.Cog):
                 cpu_usage = 0
                 
             try:
-                mem_usage = psutil.virtual_memory().percent
+                mem_usage = snapshot['ram_percent']
                 if not isinstance(mem_usage, (int, float)) or mem_usage < 0:
                     raise ValueError(f"Invalid memory usage value: {mem_usage}")
             except Exception as mem_error:
@@ -103,6 +106,21 @@ class Utilities(commands.Cog):
                     queue_count = 0
                     job_count = 0
                     avg_response_time = 0
+                    cold_stats = {}
+                    warm_stats = {}
+                    cache_stats = {}
+                    coalesced_count = 0
+                    queue_wait_stats = {}
+                    warmup_stats = {}
+                    admission_depth = 0
+                    admission_rejected = 0
+                    rate_limit_stats = {}
+                    spawn_count = 0
+                    teardown_count = 0
+                    recycle_count = 0
+                    latency_stats = {}
+                    reply_stats = {}
+                    counters = {}
                 else:
                     queue_manager = self.bot.queue_manager
                     
@@ -129,14 +147,75 @@ class Utilities(commands.Cog):
                     except Exception as response_time_error:
                         error_logger(response_time_error, "Failed to get average response time")
                         avg_response_time = 0
+
+                    # Cold = request waited on a worker still loading its model
+                    cold_stats = queue_manager.cold_latency.snapshot()
+                    warm_stats = queue_manager.warm_latency.snapshot()
+                    warmup_stats = queue_manager.warmup_latency.snapshot()
+
+                    cache = getattr(queue_manager, 'cache', None)
+                    cache_stats = cache.stats() if cache else {}
+
+                    coalesced_count = getattr(queue_manager, 'coalesced_count', 0)
+
+                    # Time tasks spent waiting for a worker slot
+                    queue_wait_stats = queue_manager.queue_wait.snapshot()
+                    admission_depth = len(getattr(queue_manager, 'admission', ()))
+                    admission_rejected = getattr(queue_manager, 'admission_rejected', 0)
+
+                    rate_limiter = getattr(queue_manager, 'rate_limiter', None)
+                    rate_limit_stats = rate_limiter.stats() if rate_limiter else {}
+
+                    spawn_count = getattr(queue_manager, 'spawn_count', 0)
+                    teardown_count = getattr(queue_manager, 'teardown_count', 0)
+                    recycle_count = getattr(queue_manager, 'recycle_count', 0)
+
+                    # Rolling-window percentiles of request latency
+                    latency = getattr(queue_manager, 'latency', None)
+                    latency_stats = latency.snapshot() if latency else {}
+
+                    replies = getattr(queue_manager, 'replies', None)
+                    reply_stats = replies.stats() if replies else {}
+
+                    # Lifetime counters and histograms for /metrics
+                    counters = {
+                        'tasks_accepted': getattr(queue_manager, 'accepted_count', 0),
+                        'tasks_rejected_ram': getattr(queue_manager, 'ram_rejected_count', 0),
+                        'tasks_failed': getattr(queue_manager, 'failed_count', 0)
+                    }
+                    try:
+                        workers = queue_manager.worker_stats()
+                        for field, report_key in WORKER_FIELDS:
+                            counters[report_key] = [worker[field] for worker in workers]
+                        counters['worker_latency_buckets'] = [
+                            count for worker in workers for count in worker['latency_buckets']]
+                        counters['latency_buckets'] = queue_manager.latency_totals.pack()
+                        counters['trace_stage_buckets'] = queue_manager.tracer.pack_stage_totals()
+                    except Exception as counters_error:
+                        error_logger(counters_error, "Failed to collect worker and histogram metrics")
                         
             except Exception as queue_manager_error:
                 error_logger(queue_manager_error, "Failed to access queue manager")
                 queue_count = 0
                 job_count = 0
                 avg_response_time = 0
+                cold_stats = {}
+                warm_stats = {}
+                cache_stats = {}
+                coalesced_count = 0
+                queue_wait_stats = {}
+                warmup_stats = {}
+                admission_depth = 0
+                admission_rejected = 0
+                rate_limit_stats = {}
+                spawn_count = 0
+                teardown_count = 0
+                recycle_count = 0
+                latency_stats = {}
+                reply_stats = {}
+                counters = {}
 
-            # Update reports with error handling for each metric
+            # Publish every metric to the shared reports block
             try:
                 if hasattr(self.bot, 'reports') and self.bot.reports:
                     metrics = {
@@ -145,17 +224,65 @@ class Utilities(commands.Cog):
                         'connected_servers': server_count,
                         'queues': queue_count,
                         'jobs': job_count,
-                        'response_time': avg_response_time
+                        'response_time': avg_response_time,
+                        'cold_response_p50': cold_stats.get('p50', 0),
+                        'cold_response_p90': cold_stats.get('p90', 0),
+                        'cold_response_p99': cold_stats.get('p99', 0),
+                        'warm_response_p50': warm_stats.get('p50', 0),
+                        'warm_response_p90': warm_stats.get('p90', 0),
+                        'warm_response_p99': warm_stats.get('p99', 0),
+                        'warmup_p50': warmup_stats.get('p50', 0),
+                        'warmup_p90': warmup_stats.get('p90', 0),
+                        'warmup_p99': warmup_stats.get('p99', 0),
+                        'cache_hits': cache_stats.get('hits', 0),
+                        'cache_misses': cache_stats.get('misses', 0),
+                        'cache_evictions': cache_stats.get('evictions', 0),
+                        'coalesced': coalesced_count,
+                        'queue_wait_p50': queue_wait_stats.get('p50', 0),
+                        'queue_wait_p90': queue_wait_stats.get('p90', 0),
+                        'queue_wait_p99': queue_wait_stats.get('p99', 0),
+                        'admission_depth': admission_depth,
+                        'admission_rejected': admission_rejected,
+                        'rate_limited': rate_limit_stats.get('limited', 0),
+                        'rate_limit_buckets': rate_limit_stats.get('buckets', 0),
+                        'worker_spawns': spawn_count,
+                        'worker_teardowns': teardown_count,
+                        'worker_recycles': recycle_count,
+                        'response_p50': latency_stats.get('p50', 0),
+                        'response_p90': latency_stats.get('p90', 0),
+                        'response_p99': latency_stats.get('p99', 0),
+                        'response_max': latency_stats.get('max', 0),
+                        'reply_queue_depth': reply_stats.get('depth', 0),
+                        'reply_latency_p50': reply_stats.get('latency_p50', 0),
+                        'reply_latency_p99': reply_stats.get('latency_p99', 0),
+                        'reply_failures': reply_stats.get('failed', 0)
                     }
+                    metrics.update(counters)
                     
-                    for metric_name, value in metrics.items():
+                    # Request traces ride along in the same update
+                    tracer = getattr(getattr(self.bot, 'queue_manager', None), 'tracer', None)
+                    if tracer:
+                        try:
+                            metrics['trace_recent'] = tracer.pack_recent()
+                            metrics['trace_count'] = len(tracer.recent)
+                            metrics['trace_stages'] = tracer.pack_stage_stats()
+                        except Exception as trace_error:
+                            error_logger(trace_error, "Failed to pack trace reports")
+
+                    missing = [metric_name for metric_name in metrics if metric_name not in self.bot.reports]
+                    for metric_name in missing:
+                        error_logger(KeyError(f"Missing report key: {metric_name}"), "Report update")
+                        del metrics[metric_name]
+
+                    # One write, so the web process never sees half an update
+                    self.bot.reports.write(metrics)
+
+                    history = getattr(self.bot, 'history', None)
+                    if history:
                         try:
-                            if metric_name in self.bot.reports:
-                                self.bot.reports[metric_name].value = value
-                            else:
-                                error_logger(KeyError(f"Missing report key: {metric_name}"), "Report update")
-                        except Exception as metric_error:
-                            error_logger(metric_error, f"Failed to update {metric_name} metric")
+                            history.record(metrics)
+                        except Exception as history_error:
+                            error_logger(history_error, "Failed to record metric history")
                 else:
                     error_logger(AttributeError("Bot reports not available"), "Stats update")
                     
@@ -13,8 +13,155 @@ intents.message_content = True  # Discord.py treats message content as privilege
 PROJECT_ROOT = find_project_root()
 
 STARTUP_DELAY = 25
+SHUTDOWN_TIMEOUT = 10  # Seconds the bot gets to close cleanly before it is terminated
 HEALTH_CHECK_INTERVAL = 1
 
 MAX_CPU = int(os.getenv('MAX_CPU', 85))
 MAX_RAM = int(os.getenv('MAX_RAM', 85)) 
-AVG_ELAPSED_SAMPLE_SIZE = int(os.getenv('SAMPLE_SIZE', 10))
+
+# Seconds of history behind the latency percentiles
+LATENCY_WINDOW = float(os.getenv('LATENCY_WINDOW', 60))
+
+# Per-stage request tracing: how many recent breakdowns /api/trace/recent
+# shows, and requests slower than TRACE_SLOW_THRESHOLD seconds (0 = off) are
+# appended to TRACE_SLOW_LOG as JSON lines
+TRACE_RECENT = int(os.getenv('TRACE_RECENT', 50))
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', 0))
+TRACE_SLOW_LOG = os.getenv('TRACE_SLOW_LOG', str(PROJECT_ROOT / 'slow_requests.log'))
+
+# Seconds between background CPU/RAM/worker RSS samples
+SAMPLER_INTERVAL = float(os.getenv('SAMPLER_INTERVAL', 0.5))
+
+# Worker pool. Workers are started from a forkserver that has already imported
+# argosetup, then run a warm-up translation before they report ready.
+WORKER_START_METHOD = os.getenv('WORKER_START_METHOD', 'forkserver')
+WORKER_PRELOAD = os.getenv('WORKER_PRELOAD', '1') == '1'
+WORKER_WARMUP_TEXT = os.getenv('WORKER_WARMUP_TEXT', 'Guten Morgen, wie geht es dir?')
+
+# Micro-batching inside each worker: tasks already waiting on the pipe are
+# translated together, up to BATCH_MAX_SIZE, waiting at most BATCH_WAIT_MS.
+# BATCH_TRANSLATE=1 hands them to argosetup.german_to_english_batch in one
+# CTranslate2 call; off, they're translated one by one. It reimplements
+# argostranslate internals, so leave it off until benchmarks/batch_equivalence.py
+# and benchmarks/batch_throughput.py have been run against the real model.
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 8))
+BATCH_WAIT_MS = float(os.getenv('BATCH_WAIT_MS', 0))
+BATCH_TRANSLATE = os.getenv('BATCH_TRANSLATE', '0') == '1'
+
+# Sentence fan-out: the sentences of messages longer than FANOUT_MIN_CHARS
+# are spread over up to FANOUT_MAX_SEGMENTS tasks (and one per core) that are
+# translated on separate cores. With the autoscaler on, that many workers are
+# kept warm (at least AUTOSCALE_MIN_WORKERS)
+FANOUT_ENABLED = os.getenv('FANOUT_ENABLED', '0') == '1'
+FANOUT_MIN_CHARS = int(os.getenv('FANOUT_MIN_CHARS', 500))
+FANOUT_MAX_SEGMENTS = int(os.getenv('FANOUT_MAX_SEGMENTS', 16))
+
+# In-memory LRU cache of sentence translations, checked before dispatching
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 5000))
+CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', 16))
+
+# Optional on-disk SQLite store of translations behind the cache. The hottest
+# STORE_WARM_ON_BOOT entries are loaded into the cache at startup (0 = off)
+STORE_ENABLED = os.getenv('STORE_ENABLED', '0') == '1'
+STORE_PATH = os.getenv('STORE_PATH', str(PROJECT_ROOT / 'translations.db'))
+STORE_MAX_ROWS = int(os.getenv('STORE_MAX_ROWS', 200000))
+STORE_FLUSH_INTERVAL = float(os.getenv('STORE_FLUSH_INTERVAL', 2))
+STORE_WARM_ON_BOOT = int(os.getenv('STORE_WARM_ON_BOOT', 1000))
+
+# Repeat requests for a message that is already being translated wait on the
+# first one. 'single' answers them all with one reply, 'each' replies per user
+COALESCE_REPLY_MODE = os.getenv('COALESCE_REPLY_MODE', 'single')
+
+# How queue_check picks among eligible workers: 'least_outstanding', 'p2c'
+# (power of two choices), 'ewma' (latency weighted) or 'first' (creation order)
+DISPATCH_POLICY = os.getenv('DISPATCH_POLICY', 'least_outstanding')
+DISPATCH_EWMA_ALPHA = float(os.getenv('DISPATCH_EWMA_ALPHA', 0.3))
+
+# When every worker queue is full, tasks wait here for a slot instead of being
+# turned away. A request is only rejected when the queue is full or its expected
+# wait for a worker is longer than the deadline (seconds)
+ADMISSION_QUEUE_MAX = int(os.getenv('ADMISSION_QUEUE_MAX', 200))
+ADMISSION_DEADLINE = float(os.getenv('ADMISSION_DEADLINE', 20))
+
+# Flood protection: token buckets per user, channel and guild. BURST requests
+# at once, refilled at PER_MIN per minute; a burst of 0 turns that scope off
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_USER_BURST = int(os.getenv('RATE_LIMIT_USER_BURST', 5))
+RATE_LIMIT_USER_PER_MIN = float(os.getenv('RATE_LIMIT_USER_PER_MIN', 20))
+RATE_LIMIT_CHANNEL_BURST = int(os.getenv('RATE_LIMIT_CHANNEL_BURST', 15))
+RATE_LIMIT_CHANNEL_PER_MIN = float(os.getenv('RATE_LIMIT_CHANNEL_PER_MIN', 60))
+RATE_LIMIT_GUILD_BURST = int(os.getenv('RATE_LIMIT_GUILD_BURST', 40))
+RATE_LIMIT_GUILD_PER_MIN = float(os.getenv('RATE_LIMIT_GUILD_PER_MIN', 150))
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv('RATE_LIMIT_MAX_BUCKETS', 50000))
+
+# Worker pool autoscaling. The target size is arrival rate x service time
+# (Little's law) over the target utilisation, never below MIN_WORKERS warm
+# workers. Workers are only retired after being idle for IDLE_TIMEOUT seconds,
+# one per COOLDOWN seconds. MAX_WORKERS=0 means one per core. With it off,
+# empty queues are closed after every task
+AUTOSCALE_ENABLED = os.getenv('AUTOSCALE_ENABLED', '1') == '1'
+AUTOSCALE_INTERVAL = float(os.getenv('AUTOSCALE_INTERVAL', 0.5))
+AUTOSCALE_MIN_WORKERS = int(os.getenv('AUTOSCALE_MIN_WORKERS', 1))
+AUTOSCALE_MAX_WORKERS = int(os.getenv('AUTOSCALE_MAX_WORKERS', 0))
+AUTOSCALE_TARGET_UTILIZATION = float(os.getenv('AUTOSCALE_TARGET_UTILIZATION', 0.7))
+AUTOSCALE_COOLDOWN = float(os.getenv('AUTOSCALE_COOLDOWN', 30))
+AUTOSCALE_IDLE_TIMEOUT = float(os.getenv('AUTOSCALE_IDLE_TIMEOUT', 60))
+
+# Worker recycling: a worker is replaced after WORKER_MAX_TASKS tasks or once
+# its RSS passes WORKER_MAX_RSS_MB (0 = no limit). The replacement warms up
+# while the old worker keeps serving; then the old one drains and is stopped.
+# RSS is checked every WORKER_RECYCLE_INTERVAL seconds; one worker is replaced at a time
+WORKER_MAX_TASKS = int(os.getenv('WORKER_MAX_TASKS', 0))
+WORKER_MAX_RSS_MB = float(os.getenv('WORKER_MAX_RSS_MB', 0))
+WORKER_RECYCLE_INTERVAL = float(os.getenv('WORKER_RECYCLE_INTERVAL', 5))
+
+# Discord replies are sent by a dispatcher off the completion path: at most
+# REPLY_CONCURRENCY sends in flight, paced to REPLY_CHANNEL_BURST messages per
+# REPLY_CHANNEL_WINDOW seconds per channel (0 = no pacing), and 5xx/network
+# errors retried up to REPLY_MAX_RETRIES times with exponential backoff
+REPLY_CONCURRENCY = int(os.getenv('REPLY_CONCURRENCY', 4))
+REPLY_MAX_RETRIES = int(os.getenv('REPLY_MAX_RETRIES', 4))
+REPLY_BACKOFF = float(os.getenv('REPLY_BACKOFF', 0.5))
+REPLY_CHANNEL_BURST = int(os.getenv('REPLY_CHANNEL_BURST', 5))
+REPLY_CHANNEL_WINDOW = float(os.getenv('REPLY_CHANNEL_WINDOW', 5))
+
+# Metric history kept for /api/history, as step:points pairs (seconds per
+# point, points kept). The default keeps 1 s points for an hour and 1 min
+# points for a day; every scalar report is kept, costing 8 bytes x (2 + number
+# of metrics) per point, about 1.7 MB for the default with 41 metrics
+HISTORY_RESOLUTIONS = tuple(
+    tuple(int(part) for part in resolution.split(':'))
+    for resolution in os.getenv('HISTORY_RESOLUTIONS', '1:3600,60:1440').split(',')
+)
+
+# Live dashboard stream (/api/stream): seconds between pushes, and between
+# keepalive comments when nothing changes
+STREAM_INTERVAL = float(os.getenv('STREAM_INTERVAL', 1))
+STREAM_KEEPALIVE = float(os.getenv('STREAM_KEEPALIVE', 15))
+
+# /metrics (Prometheus) reuses a render for this many seconds; set it to the
+# scrape interval
+PROMETHEUS_CACHE_SECONDS = float(os.getenv('PROMETHEUS_CACHE_SECONDS', 5))
+
+# Where the dashboard and API are served. 'process' runs them in a process of
+# their own (waitress with WEB_THREADS threads if installed); 'bot' serves them
+# from the bot's event loop with aiohttp, saving that process's memory
+WEB_MODE = os.getenv('WEB_MODE', 'process')
+WEB_HOST = os.getenv('WEB_HOST', '0.0.0.0')
+WEB_PORT = int(os.getenv('WEB_PORT', 5000))
+WEB_THREADS = int(os.getenv('WEB_THREADS', 8))
+
+# On-demand profiling ($profile, owner only, or /api/admin/profile): longest
+# allowed run in seconds. The endpoint only exists with WEB_MODE=bot and an
+# ADMIN_TOKEN, sent as 'Authorization: Bearer <token>'
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 60))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Opt-in worker memory tracking (tracemalloc, which slows allocations down):
+# seconds between each worker's reports, 0 = off. Reports kept per worker for
+# the growth rates, and traceback depth of the allocation sites; see
+# /api/memory (WEB_MODE=bot) or $memory
+MEMORY_TRACK_INTERVAL = float(os.getenv('MEMORY_TRACK_INTERVAL', 0))
+MEMORY_TRACK_SAMPLES = int(os.getenv('MEMORY_TRACK_SAMPLES', 720))
+MEMORY_TRACK_FRAMES = int(os.getenv('MEMORY_TRACK_FRAMES', 1))
@@ -0,0 +1,159 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from config import PROFILE_MAX_SECONDS
+
+
+# 'sample' walks the profiled thread's stack every interval from a second
+# thread and returns collapsed stacks (flamegraph.pl / speedscope input);
+# 'cprofile' traces every call in the profiled thread and returns a pstats
+# report plus the raw dump
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Statistical profiler for one thread.
+
+    A daemon thread reads the target thread's current frame every interval
+    and counts each distinct stack, root first. Time spent in C code that
+    holds the GIL shows up as the Python frame that called it; time in C
+    code that released it (CTranslate2 decoding) is sampled as usual.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return  # Thread exited
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """One 'root;...;leaf count' line per stack, most sampled first."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.counts.most_common()) + '\n'
+
+
+class Profile:
+    """
+    One profiling session of the calling thread: start(), then stop() for the result.
+
+    Nothing is installed until start() and everything is removed by stop(),
+    so code that isn't being profiled runs exactly as before.
+    """
+
+    def __init__(self, mode='sample', interval=0.005, top=60):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}, expected one of {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.interval = interval
+        self.top = top
+        self.profiler = None
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        if self.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(interval=self.interval)
+            self.profiler.start()
+
+    def stop(self):
+        """
+        Stop profiling and return the result.
+
+        Returns:
+            dict: mode, pid, seconds and 'output' (collapsed stacks, or the
+                pstats report sorted by cumulative time); 'samples' for
+                'sample', 'dump' (pstats.Stats-loadable bytes) for 'cprofile'
+        """
+        seconds = time.monotonic() - self.started_at
+        result = {'status': 'profile', 'mode': self.mode, 'pid': os.getpid(), 'seconds': seconds}
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+            self.profiler.create_stats()
+            result['dump'] = marshal.dumps(self.profiler.stats)  # Before Stats(), which empties them
+            report = io.StringIO()
+            pstats.Stats(self.profiler, stream=report).sort_stats('cumulative').print_stats(self.top)
+            result['output'] = report.getvalue()
+        else:
+            self.profiler.stop()
+            result['output'] = self.profiler.collapsed()
+            result['samples'] = self.profiler.samples
+        self.profiler = None
+        return result
+
+
+async def profile_loop(seconds, mode='sample'):
+    """Profile the thread running the event loop (every task on it) for seconds; returns Profile.stop()."""
+    profile = Profile(mode)
+    profile.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        result = profile.stop()
+    return result
+
+
+async def run_profile(queue_manager, target, seconds, mode='sample'):
+    """
+    Profile the bot's event loop or one worker, for the $profile command and /api/admin/profile.
+
+    Args:
+        queue_manager (QueueManager): For worker targets; may be None for 'bot'
+        target (str): 'bot' or a worker's queue ID
+        seconds (float): How long, up to PROFILE_MAX_SECONDS
+        mode (str): One of PROFILE_MODES
+
+    Raises:
+        ValueError: For a bad target, duration or mode
+        RuntimeError: If the worker couldn't be profiled
+    """
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise ValueError(f"Profile for more than 0 and at most {PROFILE_MAX_SECONDS:g} seconds")
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Mode must be one of {', '.join(PROFILE_MODES)}")
+    if str(target) == 'bot':
+        return await profile_loop(seconds, mode)
+    try:
+        queue_id = int(target)
+    except ValueError:
+        raise ValueError("Target must be 'bot' or a worker's queue ID") from None
+    if queue_manager is None:
+        raise RuntimeError("Workers aren't available")
+    return await queue_manager.profile_worker(queue_id, seconds, mode)
@@ -0,0 +1,67 @@
+import random
+
+
+def first_available(candidates, queues, workers):
+    """Original behaviour: the first eligible queue in creation order."""
+    return candidates[0]
+
+
+def least_outstanding(candidates, queues, workers):
+    """The queue with the fewest tasks in flight (oldest queue on a tie)."""
+    return min(candidates, key=lambda queue_id: queues[queue_id][0])
+
+
+def power_of_two_choices(candidates, queues, workers):
+    """Pick two queues at random and take the one with fewer tasks in flight."""
+    if len(candidates) <= 2:
+        return least_outstanding(candidates, queues, workers)
+    return least_outstanding(random.sample(candidates, 2), queues, workers)
+
+
+def ewma_latency(candidates, queues, workers):
+    """
+    The queue with the lowest expected wait: its latency EWMA times the work
+    already in front of a new task. Slow or throttled cores get less traffic.
+    Workers without samples yet are scored with the average of the others, so
+    they get tried instead of starved or flooded.
+    """
+    known = [workers[queue_id]['latency_ewma'] for queue_id in candidates
+             if workers.get(queue_id, {}).get('latency_ewma') is not None]
+    default = sum(known) / len(known) if known else 1.0
+
+    def expected_wait(queue_id):
+        latency = workers.get(queue_id, {}).get('latency_ewma')
+        return (latency if latency is not None else default) * (queues[queue_id][0] + 1)
+
+    return min(candidates, key=expected_wait)
+
+
+DISPATCH_POLICIES = {
+    'first': first_available,
+    'least_outstanding': least_outstanding,
+    'p2c': power_of_two_choices,
+    'ewma': ewma_latency
+}
+
+
+def get_dispatch_policy(name):
+    """
+    Look up a dispatch policy by name.
+
+    Args:
+        name (str): One of DISPATCH_POLICIES
+
+    Returns:
+        function: policy(candidates, queues, workers) -> queue_id
+    """
+    try:
+        return DISPATCH_POLICIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown dispatch policy {name!r}, expected one of {sorted(DISPATCH_POLICIES)}")
+
+
+def update_ewma(previous, sample, alpha):
+    """Fold a new sample into an exponentially weighted moving average."""
+    if previous is None:
+        return sample
+    return alpha * sample + (1 - alpha) * previous
@@ -0,0 +1,146 @@
+import bisect
+import math
+import time
+
+
+# Bucket bounds (seconds) for exported histograms: sub-millisecond pipe hops up
+# to translations that time out
+EXPORT_BOUNDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram over a rolling time window.
+
+    Buckets grow geometrically (buckets_per_doubling per factor of two, ~9%
+    wide by default), so percentiles keep the same relative precision for a
+    10 ms translation and a 30 s one, at a fixed cost per sample. The window
+    is split into slots that are reset as time moves on, so old samples age
+    out in slot-sized steps without keeping the samples themselves.
+    """
+
+    def __init__(self, window=60.0, slots=6, min_value=0.0001, max_value=300.0, buckets_per_doubling=8):
+        self.slot_length = window / slots
+        self.slot_count = slots
+        self.min_value = min_value
+        self.growth = 2 ** (1 / buckets_per_doubling)
+        self.log_growth = math.log(self.growth)
+        # Bucket 0 holds everything at or below min_value, the last one everything past max_value
+        self.bucket_count = math.ceil(math.log(max_value / min_value) / self.log_growth) + 2
+
+        # Per slot: [epoch, counts, count, total, max]
+        self.slots = [[None, [0] * self.bucket_count, 0, 0.0, 0.0] for _ in range(slots)]
+
+    def bucket_index(self, value):
+        if value <= self.min_value:
+            return 0
+        return min(self.bucket_count - 1, 1 + int(math.log(value / self.min_value) / self.log_growth))
+
+    def bucket_upper_bound(self, index):
+        return self.min_value * self.growth ** index
+
+    def slot_for(self, now):
+        """The slot for this moment, cleared first if it still holds an older epoch."""
+        epoch = int(now / self.slot_length)
+        slot = self.slots[epoch % self.slot_count]
+        if slot[0] != epoch:
+            slot[0] = epoch
+            slot[1] = [0] * self.bucket_count
+            slot[2] = 0
+            slot[3] = 0.0
+            slot[4] = 0.0
+        return slot
+
+    def record(self, value, now=None):
+        """Add a latency sample, in seconds. Negative values are ignored."""
+        if not isinstance(value, (int, float)) or value < 0:
+            return
+        slot = self.slot_for(time.monotonic() if now is None else now)
+        slot[1][self.bucket_index(value)] += 1
+        slot[2] += 1
+        slot[3] += value
+        if value > slot[4]:
+            slot[4] = value
+
+    def live_slots(self, now):
+        oldest_epoch = int(now / self.slot_length) - self.slot_count + 1
+        return [slot for slot in self.slots if slot[0] is not None and slot[0] >= oldest_epoch]
+
+    def snapshot(self, percentiles=(0.5, 0.9, 0.99), now=None):
+        """
+        Summarise the current window.
+
+        Returns:
+            dict: count, mean, max and p50/p90/p99 (by default) in seconds; zeros when empty
+        """
+        slots = self.live_slots(time.monotonic() if now is None else now)
+        count = sum(slot[2] for slot in slots)
+        summary = {'count': count, 'mean': 0.0, 'max': 0.0}
+        summary.update({f"p{round(fraction * 100)}": 0.0 for fraction in percentiles})
+        if not count:
+            return summary
+
+        counts = [sum(buckets) for buckets in zip(*(slot[1] for slot in slots))]
+        maximum = max(slot[4] for slot in slots)
+        summary['mean'] = sum(slot[3] for slot in slots) / count
+        summary['max'] = maximum
+
+        for fraction in percentiles:
+            rank = max(1, math.ceil(fraction * count))
+            seen = 0
+            for index, bucket in enumerate(counts):
+                seen += bucket
+                if seen >= rank:
+                    # A bucket's upper bound can overshoot the largest sample in it
+                    summary[f"p{round(fraction * 100)}"] = min(self.bucket_upper_bound(index), maximum)
+                    break
+        return summary
+
+
+class CumulativeHistogram:
+    """
+    Lifetime latency histogram with fixed bucket bounds, for Prometheus.
+
+    Unlike LatencyHistogram nothing ages out: counts only grow, which is
+    what a scraper computing rates over them expects.
+    """
+
+    def __init__(self, bounds=EXPORT_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last one is past the largest bound
+        self.total = 0.0
+
+    def record(self, value):
+        """Add a latency sample, in seconds. Negative values are ignored."""
+        if not isinstance(value, (int, float)) or value < 0:
+            return
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def pack(self):
+        """Per-bucket (not cumulative) counts followed by the sum, for the reports block."""
+        return self.counts + [self.total]
+
+
+def summarize_packed(packed, bounds=EXPORT_BOUNDS, percentiles=(0.5, 0.9, 0.99)):
+    """
+    count, mean and percentiles of a CumulativeHistogram.pack().
+
+    A percentile is the upper bound of the bucket it falls in (the largest
+    bound when it is past all of them), so it is only as fine as the bounds.
+    """
+    counts = [int(count) for count in packed[:-1]]
+    count = sum(counts)
+    summary = {'count': count, 'mean': packed[-1] / count if count else 0.0}
+    for fraction in percentiles:
+        rank = max(1, math.ceil(fraction * count))
+        seen = 0
+        value = 0.0
+        if count:
+            for index, bucket in enumerate(counts):
+                seen += bucket
+                if seen >= rank:
+                    value = bounds[min(index, len(bounds) - 1)]
+                    break
+        summary[f"p{round(fraction * 100)}"] = value
+    return summary
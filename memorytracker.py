@@ -0,0 +1,118 @@
+import os
+import time
+import tracemalloc
+
+import psutil
+
+
+# Allocation sites that are tracemalloc's or the import system's own
+IGNORED_SITES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MemoryTracker:
+    """
+    Worker-side memory tracking: RSS plus tracemalloc's view of Python allocations.
+
+    start() begins tracing and takes the baseline once the model is loaded,
+    so sample() reports what has grown since the worker went into service:
+    the allocation sites that grew the most, and the totals. tracemalloc
+    slows every allocation down, which is why this only runs when asked for.
+    Native memory (CTranslate2) isn't traced; RSS shows it.
+    """
+
+    def __init__(self, frames=1, top=10):
+        self.frames = frames
+        self.top = top
+        self.baseline = None
+        self.process = psutil.Process(os.getpid())
+
+    def start(self):
+        tracemalloc.start(self.frames)
+        self.baseline = tracemalloc.take_snapshot().filter_traces(IGNORED_SITES)
+
+    def sample(self, tasks):
+        """
+        A memory report for the parent.
+
+        Returns:
+            dict: status 'memory', pid, time (monotonic), tasks, rss, traced and
+                traced_peak in bytes, and top: the sites that grew most since
+                start(), each {'site', 'size', 'size_diff', 'count', 'count_diff'}
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(IGNORED_SITES)
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        top = []
+        for stat in snapshot.compare_to(self.baseline, 'traceback' if self.frames > 1 else 'lineno')[:self.top]:
+            top.append({
+                'site': ' <- '.join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback),
+                'size': stat.size,
+                'size_diff': stat.size_diff,
+                'count': stat.count,
+                'count_diff': stat.count_diff
+            })
+        return {
+            'status': 'memory',
+            'pid': os.getpid(),
+            'time': time.monotonic(),
+            'tasks': tasks,
+            'rss': self.process.memory_info().rss,
+            'traced': traced,
+            'traced_peak': traced_peak,
+            'top': top
+        }
+
+
+def slope(points):
+    """Least-squares slope of (x, y) points; 0 with fewer than two distinct x."""
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, y in points)
+    if not spread:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def summarize_growth(samples):
+    """
+    Growth rates from a worker's memory samples.
+
+    A steady slope, rather than the difference between two samples, so one
+    garbage collection or a burst of long messages doesn't read as a leak.
+
+    Args:
+        samples: MemoryTracker.sample() dicts, oldest first
+
+    Returns:
+        dict: rss and traced growth in bytes per 1000 tasks and per hour
+    """
+    return {
+        'rss_per_1k_tasks': slope([(sample['tasks'], sample['rss']) for sample in samples]) * 1000,
+        'rss_per_hour': slope([(sample['time'], sample['rss']) for sample in samples]) * 3600,
+        'traced_per_1k_tasks': slope([(sample['tasks'], sample['traced']) for sample in samples]) * 1000,
+        'traced_per_hour': slope([(sample['time'], sample['traced']) for sample in samples]) * 3600
+    }
+
+
+def format_report(report):
+    """QueueManager.memory_report() as text, for $memory."""
+    if not report['tracking']:
+        return "Memory tracking is off (MEMORY_TRACK_INTERVAL=0)\n"
+    lines = []
+    for worker in report['workers']:
+        lines.append(f"Queue {worker['queue_id']} (pid {worker['pid']}, core {worker['core']}): "
+                     f"{worker['tasks']} tasks over {worker['tracked_for'] / 3600:.1f}h, {worker['reports']} reports")
+        lines.append(f"  RSS {worker['rss_at_start'] / 2**20:.1f} -> {worker['rss'] / 2**20:.1f} MiB, "
+                     f"{worker['rss_per_1k_tasks'] / 2**10:+.1f} KiB per 1k tasks, "
+                     f"{worker['rss_per_hour'] / 2**20:+.2f} MiB per hour")
+        lines.append(f"  Python heap {worker['traced'] / 2**20:.1f} MiB (peak {worker['traced_peak'] / 2**20:.1f}), "
+                     f"{worker['traced_per_1k_tasks'] / 2**10:+.1f} KiB per 1k tasks")
+        for site in worker['top']:
+            lines.append(f"    {site['size_diff'] / 2**10:+9.1f} KiB {site['count_diff']:+7d} blocks  {site['site']}")
+    return '\n'.join(lines or ["No reports yet"]) + '\n'
@@ -0,0 +1,201 @@
+import multiprocessing
+import time
+
+from config import TRACE_RECENT
+from latencyhistogram import EXPORT_BOUNDS
+from requesttrace import TRACE_FIELDS, TRACE_STAGES, TRACE_STAT_NAMES
+from usagemonitor import get_total_cores
+
+
+# Per-worker metrics get one slot per core, the most workers there can be,
+# plus one for a replacement warming up while the worker it replaces drains
+WORKER_SLOTS = get_total_cores() + 1
+
+# A CumulativeHistogram.pack(): a count per bucket, one past the last bound, and the sum
+HISTOGRAM_SLOTS = len(EXPORT_BOUNDS) + 2
+
+
+# QueueManager.worker_stats fields and the per-worker reports they are kept in
+WORKER_FIELDS = (
+    ('queue_id', 'worker_ids'),
+    ('depth', 'worker_depths'),
+    ('pid', 'worker_pids'),
+    ('core', 'worker_cores'),
+    ('ready', 'worker_ready'),
+    ('tasks', 'worker_tasks'),
+    ('busy', 'worker_busy'),
+    ('cpu', 'worker_cpu'),
+    ('rss', 'worker_rss'),
+    ('uptime', 'worker_uptime'),
+    ('traced', 'worker_traced'),
+    ('rss_growth', 'worker_rss_growth'),
+)
+
+
+# Everything the bot reports to the web process: (name, type) for a number,
+# (name, type, length) for a list. 'i' fields are read back as ints, 'd' as
+# floats. A new metric is one more line here and one more key in update_all_stats
+REPORT_LAYOUT = (
+    ('cpu', 'd'),
+    ('ram', 'd'),
+    ('queues', 'i'),
+    ('jobs', 'i'),
+    ('response_time', 'd'),
+    ('connected_servers', 'i'),
+    ('cold_response_p50', 'd'),
+    ('cold_response_p90', 'd'),
+    ('cold_response_p99', 'd'),
+    ('warm_response_p50', 'd'),
+    ('warm_response_p90', 'd'),
+    ('warm_response_p99', 'd'),
+    ('warmup_p50', 'd'),
+    ('warmup_p90', 'd'),
+    ('warmup_p99', 'd'),
+    ('cache_hits', 'i'),
+    ('cache_misses', 'i'),
+    ('cache_evictions', 'i'),
+    ('coalesced', 'i'),
+    ('queue_wait_p50', 'd'),
+    ('queue_wait_p90', 'd'),
+    ('queue_wait_p99', 'd'),
+    ('admission_depth', 'i'),
+    ('admission_rejected', 'i'),
+    ('rate_limited', 'i'),
+    ('rate_limit_buckets', 'i'),
+    ('worker_spawns', 'i'),
+    ('worker_teardowns', 'i'),
+    ('worker_recycles', 'i'),
+    ('response_p50', 'd'),
+    ('response_p90', 'd'),
+    ('response_p99', 'd'),
+    ('response_max', 'd'),
+    ('reply_queue_depth', 'i'),
+    ('reply_latency_p50', 'd'),
+    ('reply_latency_p99', 'd'),
+    ('reply_failures', 'i'),
+    ('tasks_accepted', 'i'),
+    ('tasks_rejected_ram', 'i'),
+    ('tasks_failed', 'i'),
+    # Per worker: queue ID (0 = free slot) and tasks outstanding
+    ('worker_ids', 'i', WORKER_SLOTS),
+    ('worker_depths', 'i', WORKER_SLOTS),
+    # More per worker for /api/workers, in the same order, see QueueManager.worker_stats
+    ('worker_pids', 'i', WORKER_SLOTS),
+    ('worker_cores', 'i', WORKER_SLOTS),
+    ('worker_ready', 'i', WORKER_SLOTS),
+    ('worker_tasks', 'i', WORKER_SLOTS),
+    ('worker_busy', 'd', WORKER_SLOTS),
+    ('worker_cpu', 'd', WORKER_SLOTS),
+    ('worker_rss', 'i', WORKER_SLOTS),
+    ('worker_uptime', 'd', WORKER_SLOTS),
+    # Only with memory tracking on: Python heap traced, RSS bytes gained per 1000 tasks
+    ('worker_traced', 'i', WORKER_SLOTS),
+    ('worker_rss_growth', 'd', WORKER_SLOTS),
+    ('worker_latency_buckets', 'd', WORKER_SLOTS * HISTOGRAM_SLOTS),
+    # Lifetime latency histograms for /metrics: requests, then per trace stage
+    ('latency_buckets', 'd', HISTOGRAM_SLOTS),
+    ('trace_stage_buckets', 'd', (len(TRACE_STAGES) + 1) * HISTOGRAM_SLOTS),
+    # Request traces: recent breakdowns and per-stage percentiles, see requesttrace
+    ('trace_recent', 'd', TRACE_RECENT * len(TRACE_FIELDS)),
+    ('trace_count', 'i'),
+    ('trace_stages', 'd', (len(TRACE_STAGES) + 1) * len(TRACE_STAT_NAMES)),
+)
+
+
+class MetricsBlock:
+    """
+    Fixed-layout metrics in one block of shared memory, read with a seqlock.
+
+    Every metric is a slot (or a run of slots) in a single RawArray of
+    doubles, after a sequence number in slot 0. write() makes the sequence
+    odd, stores all the values and makes it even again; read() copies the
+    whole block and retries if the sequence was odd or changed meanwhile.
+    Readers never take a lock or hold up the writer, and always get every
+    metric from the same write. Doubles hold integers exactly up to 2**53.
+    """
+
+    def __init__(self, layout=REPORT_LAYOUT, retries=100):
+        self.fields = {}  # {name: (offset, type, length)}, length None for a number
+        offset = 1  # Slot 0 is the sequence number
+        for name, kind, *length in layout:
+            if name in self.fields:
+                raise ValueError(f"Duplicate metric {name}")
+            length = length[0] if length else None
+            self.fields[name] = (offset, kind, length)
+            offset += length or 1
+
+        self.size = offset
+        self.retries = retries
+        self.raw = multiprocessing.RawArray('d', self.size)
+        self.write_lock = multiprocessing.Lock()  # Only writers contend on this
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __bool__(self):
+        return True
+
+    def keys(self):
+        return list(self.fields)
+
+    def scalars(self):
+        """Names of the single-number metrics."""
+        return [name for name, (offset, kind, length) in self.fields.items() if length is None]
+
+    def write(self, values):
+        """
+        Publish a set of metrics as one update.
+
+        Args:
+            values (dict): {name: number}, or {name: sequence} for multi-slot
+                metrics; shorter sequences are zero-padded. Metrics not
+                given keep their previous value.
+        """
+        updates = []
+        for name, value in values.items():
+            offset, kind, length = self.fields[name]  # KeyError for metrics not in the layout
+            if length is None:
+                updates.append((offset, float(value)))
+            else:
+                value = list(value[:length])
+                value.extend([0.0] * (length - len(value)))
+                updates.append((slice(offset, offset + length), value))
+
+        raw = self.raw
+        with self.write_lock:
+            raw[0] += 1  # Odd: write in progress
+            try:
+                for index, value in updates:
+                    raw[index] = value
+            finally:
+                raw[0] += 1  # Even again, even if a value was rejected
+
+    def snapshot(self):
+        """Copy the raw block once no write overlaps the copy."""
+        raw = self.raw
+        values = raw[:]
+        for _ in range(self.retries):
+            sequence = values[0]
+            if sequence % 2 == 0 and raw[0] == sequence:
+                return values
+            time.sleep(0)  # Let the writer finish
+            values = raw[:]
+        return values  # The writer died mid-write; a torn read beats none
+
+    def read(self):
+        """All metrics from one consistent snapshot, as {name: value}."""
+        values = self.snapshot()
+        metrics = {}
+        for name, (offset, kind, length) in self.fields.items():
+            if length is None:
+                value = values[offset]
+                metrics[name] = int(value) if kind == 'i' else value
+            else:
+                run = values[offset:offset + length]
+                metrics[name] = [int(item) for item in run] if kind == 'i' else run
+        return metrics
+
+    @property
+    def sequence(self):
+        """Number of completed writes."""
+        return int(self.raw[0]) // 2
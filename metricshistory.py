@@ -0,0 +1,160 @@
+import math
+import multiprocessing
+import time
+
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text, default=None):
+    """Seconds from '90', '90s', '15m', '1h' or '1d'; default if text is empty."""
+    if not text:
+        return default
+    text = text.strip().lower()
+    unit = DURATION_UNITS.get(text[-1])
+    if unit:
+        text = text[:-1]
+    value = float(text) * (unit or 1)
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError("Duration must be a positive number")
+    return value
+
+
+def compact(value):
+    """Round to 4 significant digits to keep history responses small."""
+    return float(f"{value:.4g}")
+
+
+class MetricsHistory:
+    """
+    Time series of scalar metrics in fixed-size shared-memory rings.
+
+    One ring per resolution, e.g. (1, 3600) keeps one-second points for an
+    hour and (60, 1440) one-minute points for a day. Every sample goes into
+    each ring; samples landing in the same point are averaged. A ring is
+    column-major: a sequence number, then a column of bucket numbers
+    (seconds since the epoch // step), a column of sample counts and one
+    column per metric, so reading one metric's history copies two columns
+    rather than the whole ring. Writes are seqlocked like MetricsBlock.
+
+    Memory is fixed at creation: 8 bytes x (1 + slots x (2 + metrics)) per
+    ring, see memory_bytes.
+    """
+
+    def __init__(self, metrics, resolutions=((1, 3600), (60, 1440)), retries=100):
+        self.metrics = {name: index for index, name in enumerate(metrics)}
+        self.retries = retries
+        self.rings = []
+        for step, slots in sorted(resolutions):
+            self.rings.append({
+                'step': step,
+                'slots': slots,
+                'raw': multiprocessing.RawArray('d', 1 + slots * (2 + len(self.metrics)))
+            })
+        self.write_lock = multiprocessing.Lock()
+
+    @property
+    def memory_bytes(self):
+        return sum(len(ring['raw']) * 8 for ring in self.rings)
+
+    def record(self, values, now=None):
+        """
+        Add a sample of every metric.
+
+        Args:
+            values (dict): {name: number}; names not being kept are ignored
+            now (float, optional): Wall-clock time of the sample
+        """
+        now = time.time() if now is None else now
+        samples = [(index, float(values[name])) for name, index in self.metrics.items() if name in values]
+
+        with self.write_lock:
+            for ring in self.rings:
+                raw, slots = ring['raw'], ring['slots']
+                bucket = int(now // ring['step'])
+                slot = bucket % slots
+
+                raw[0] += 1  # Odd: write in progress
+                try:
+                    if raw[1 + slot] != bucket:
+                        # First sample of a new point: clear what the slot held a lap ago
+                        raw[1 + slot] = bucket
+                        raw[1 + slots + slot] = 0
+                        for index in self.metrics.values():
+                            raw[1 + (2 + index) * slots + slot] = 0.0
+                    count = raw[1 + slots + slot] + 1
+                    raw[1 + slots + slot] = count
+                    for index, value in samples:
+                        position = 1 + (2 + index) * slots + slot
+                        raw[position] += (value - raw[position]) / count  # Running mean
+                finally:
+                    raw[0] += 1
+
+    def ring_for(self, range_seconds):
+        """The finest ring that covers the range, else the coarsest."""
+        for ring in self.rings:
+            if ring['step'] * ring['slots'] >= range_seconds:
+                return ring
+        return self.rings[-1]
+
+    def read_column(self, ring, index):
+        """(buckets, values) for one metric, from a single consistent copy."""
+        raw, slots = ring['raw'], ring['slots']
+        start = 1 + (2 + index) * slots
+        for _ in range(self.retries):
+            sequence = raw[0]
+            buckets = raw[1:1 + slots]
+            values = raw[start:start + slots]
+            if sequence % 2 == 0 and raw[0] == sequence:
+                break
+            time.sleep(0)
+        return buckets, values
+
+    def series(self, metric, range_seconds, step=None, now=None):
+        """
+        A metric's history, downsampled.
+
+        Args:
+            metric (str): Metric name
+            range_seconds (float): How far back to go; capped at the longest ring
+            step (float, optional): Seconds per point, rounded up to a multiple
+                of the ring's resolution; defaults to about 300 points
+
+        Returns:
+            tuple: (start, step, values): the first point's wall-clock time,
+                seconds per point and the points, oldest first, with None where
+                nothing was recorded
+        """
+        index = self.metrics[metric]  # KeyError for metrics not being kept
+        now = time.time() if now is None else now
+        ring = self.ring_for(range_seconds)
+        resolution = ring['step']
+        range_seconds = min(range_seconds, resolution * ring['slots'])
+        if not step:
+            step = range_seconds / 300
+        group = max(1, math.ceil(step / resolution))
+        step = group * resolution
+
+        points = max(1, math.ceil(range_seconds / step))
+        last_bucket = int(now // resolution)
+        first_bucket = last_bucket - points * group + 1
+
+        sums = [0.0] * points
+        counts = [0] * points
+        for bucket, value in zip(*self.read_column(ring, index)):
+            offset = int(bucket) - first_bucket
+            if 0 <= offset < points * group:
+                sums[offset // group] += value
+                counts[offset // group] += 1
+
+        values = [compact(total / count) if count else None for total, count in zip(sums, counts)]
+        return first_bucket * resolution, step, values
+
+    def describe(self):
+        """Metrics and resolutions kept, for the history endpoint's index."""
+        return {
+            'metrics': list(self.metrics),
+            'resolutions': [{'step': ring['step'], 'points': ring['slots'],
+                             'span': ring['step'] * ring['slots']} for ring in self.rings],
+            'memory_bytes': self.memory_bytes
+        }
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import time
+
+from errorlogger import error_logger
+
+
+class MetricsStream:
+    """
+    Pushes metric updates to any number of Server-Sent Events subscribers.
+
+    One producer thread calls source() every interval, works out which values
+    changed and encodes the update once; each subscriber only waits for the
+    next version and writes out the frame that is already encoded. A new
+    subscriber, or one that missed an update, gets the full snapshot instead
+    of the delta, so no client can drift. The producer only runs while
+    someone is subscribed.
+
+    Frames are 'snapshot' and 'delta' events whose data is a JSON object of
+    metrics plus 'timestamp'. subscribe() is for threaded servers, where each
+    subscriber holds a thread; subscribe_async() for asyncio ones. With
+    max_subscribers set, full() says when to turn a new client away.
+    """
+
+    def __init__(self, source, interval=1.0, keepalive=15.0, max_subscribers=None):
+        self.source = source
+        self.interval = interval
+        self.keepalive = keepalive
+        self.max_subscribers = max_subscribers
+
+        self.condition = threading.Condition()
+        self.state = {}
+        self.version = 0
+        self.snapshot_frame = None
+        self.delta_frame = None
+        self.subscribers = 0
+        self.producer = None
+        self.published = 0
+        self.waiters = set()  # (loop, asyncio.Event) of async subscribers
+
+    def full(self):
+        return self.max_subscribers is not None and self.subscribers >= self.max_subscribers
+
+    def join(self):
+        """Count a new subscriber in, starting the producer if it isn't running. Call with the condition held."""
+        self.subscribers += 1
+        if self.producer is None:
+            self.producer = threading.Thread(target=self.produce, daemon=True, name="metrics-stream")
+            self.producer.start()
+
+    def next_frame(self, seen, version, snapshot_frame, delta_frame):
+        if seen and version == seen + 1:
+            return delta_frame
+        return snapshot_frame
+
+    def subscribe(self):
+        """Generator of SSE frames for one client; ends when the client goes away."""
+        with self.condition:
+            self.join()
+
+        try:
+            yield f"retry: {int(self.interval * 2000)}\n\n"  # Reconnect delay for EventSource
+            seen = 0
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.version != seen, timeout=self.keepalive)
+                    version, snapshot_frame, delta_frame = self.version, self.snapshot_frame, self.delta_frame
+
+                if version == seen:
+                    yield ": keepalive\n\n"  # Also how a dead connection gets noticed
+                else:
+                    yield self.next_frame(seen, version, snapshot_frame, delta_frame)
+                seen = version
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    async def subscribe_async(self):
+        """Async generator of the same frames, waiting on the running loop instead of a thread."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        wakeup = waiter[1]
+        with self.condition:
+            self.join()
+            self.waiters.add(waiter)
+
+        try:
+            yield f"retry: {int(self.interval * 2000)}\n\n"
+            seen = 0
+            while True:
+                wakeup.clear()  # Before reading, so a publish in between still wakes us
+                with self.condition:
+                    version, snapshot_frame, delta_frame = self.version, self.snapshot_frame, self.delta_frame
+
+                if version == seen:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                    continue
+                yield self.next_frame(seen, version, snapshot_frame, delta_frame)
+                seen = version
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+                self.waiters.discard(waiter)
+
+    def produce(self):
+        while True:
+            with self.condition:
+                if not self.subscribers:
+                    self.producer = None
+                    return
+            try:
+                self.publish(self.source())
+            except Exception as e:
+                error_logger(e, "Metrics stream update failed")
+            time.sleep(self.interval)
+
+    def publish(self, metrics):
+        """Encode what changed since the last update and wake the subscribers."""
+        timestamp = metrics.pop('timestamp', time.time())
+        changes = {key: value for key, value in metrics.items()
+                   if key not in self.state or self.state[key] != value}
+        if not changes and self.version:
+            return  # Nothing new; keepalives hold the connections open
+
+        self.state.update(changes)
+        snapshot_frame = self.frame('snapshot', self.state, timestamp)
+        delta_frame = self.frame('delta', changes, timestamp)
+        with self.condition:
+            self.version += 1
+            self.snapshot_frame = snapshot_frame
+            self.delta_frame = delta_frame
+            self.published += 1
+            self.condition.notify_all()
+            waiters = list(self.waiters)
+
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # Loop closed; the subscriber's finally removes it
+
+    def frame(self, event, metrics, timestamp):
+        data = json.dumps(dict(metrics, timestamp=timestamp), separators=(',', ':'))
+        return f"event: {event}\nid: {self.version + 1}\ndata: {data}\n\n"
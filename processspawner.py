@@ -3,51 +3,258 @@ import os
 import sys
 import time
 import psutil
+from multiprocessing.connection import wait
 
+from cpuprofiler import Profile
+from memorytracker import MemoryTracker
 from errorlogger import error_logger
 
 
-def worker_process(core_id, pipe):
+def collect_batch(pipe, first_task, batch_size, batch_wait, controls=None):
+    """
+    Drain tasks already waiting on the pipe into one batch.
+
+    Args:
+        pipe (Connection): Child end of the task pipe
+        first_task (dict): Task that woke the worker up
+        batch_size (int): Maximum tasks per batch
+        batch_wait (float): Seconds to keep waiting for more tasks (0 = only
+            take what is already queued)
+        controls (list, optional): Other dict messages drained on the way
+            (profile requests) are appended here instead of dropped
+
+    Returns:
+        tuple: (list of task dicts, True if STOP arrived while draining)
+    """
+    batch = [first_task]
+    deadline = time.monotonic() + batch_wait
+    
+    while len(batch) < batch_size:
+        if not pipe.poll(max(0, deadline - time.monotonic())):
+            break
+        task_data = pipe.recv()
+        if isinstance(task_data, dict) and 'id' in task_data:
+            batch.append(task_data)
+        elif task_data == "STOP":
+            return batch, True
+        elif isinstance(task_data, dict) and controls is not None:
+            controls.append(task_data)
+            
+    return batch, False
+
+
+def translate_batch(batch, translate_func, batch_translate_func):
+    """
+    Translate a batch of tasks, isolating failures to the text that caused them.
+
+    A task's 'task' is either one text or a list of sentence segments; the
+    texts of every task in the batch are translated together.
+
+    Args:
+        batch (list): Task dicts with 'id' and 'task'
+        translate_func (callable): Single-text translator
+        batch_translate_func (callable, optional): List-of-texts translator
+
+    Returns:
+        list: Response dicts tagged with each task's id; 'result' is a list
+            for list tasks, 'time_finished' a time.monotonic() stamp
+    """
+    texts = []
+    for task_data in batch:
+        task = task_data['task']
+        texts.extend(task if isinstance(task, list) else [task])
+    results = None
+    
+    if batch_translate_func is not None and len(texts) > 1:
+        try:
+            results = batch_translate_func(texts)
+        except Exception as e:
+            error_logger(e, f"Worker {os.getpid()} batch of {len(texts)} failed, retrying one by one")
+
+    if results is None:
+        results = []
+        for text in texts:
+            try:
+                results.append(translate_func(text))
+            except Exception as e:
+                error_logger(e, f"Worker {os.getpid()} failed to translate: {text[:50]}")
+                results.append(None)  # Parent replies "[Translation failed]"
+
+    # Monotonic clock is system-wide, so the parent can compare it with its own stamps
+    time_finished = time.monotonic()
+    responses = []
+    cursor = 0
+    for task_data in batch:
+        task = task_data['task']
+        if isinstance(task, list):
+            result = results[cursor:cursor + len(task)]
+            cursor += len(task)
+        else:
+            result = results[cursor]
+            cursor += 1
+        responses.append({'id': task_data['id'], 'result': result, 'time_finished': time_finished})
+    return responses
+
+
+def begin_profile(pipe, request, profile, profile_until):
+    """
+    Start the profile a {'profile': seconds, 'mode': ...} message asks for.
+
+    Returns:
+        tuple: (Profile, monotonic deadline) of the new profile, or of the
+            running one if there is one (the parent is told it was refused)
+    """
+    if profile is not None:
+        pipe.send({'status': 'profile', 'error': 'Already profiling'})
+        return profile, profile_until
+    try:
+        new_profile = Profile(request.get('mode', 'sample'))
+        new_profile.start()
+    except Exception as e:
+        pipe.send({'status': 'profile', 'error': str(e)})
+        return None, None
+    print(f"🔬 Worker {os.getpid()} profiling ({new_profile.mode}) for {request['profile']}s")
+    return new_profile, time.monotonic() + request['profile']
+
+
+def worker_process(core_id, pipe, translate_func=None, warmup_text=None,
+                   batch_translate_func=None, batch_size=1, batch_wait=0, memory_interval=0, memory_frames=1,
+                   batch_translate=False):
+    """
+    Translation worker loop, pinned to a single CPU core.
+
+    Loads the translator and runs a warm-up translation first, then sends a
+    ready message so the parent only routes work here once the model is hot.
+    After that it blocks on the task pipe and the parent's sentinel at the
+    same time, so a task is picked up the moment it arrives and the worker
+    exits as soon as the parent goes away instead of sleeping between polls.
+    Tasks that are already waiting are drained and translated together, and
+    their results go back as one list. The last result of each list carries
+    the worker's running totals ('worker_stats': tasks, busy and CPU seconds),
+    so the parent gets them without asking.
+
+    A {'profile': seconds, 'mode': ...} message profiles this worker's loop
+    for that long and sends the cpuprofiler result back ('status': 'profile').
+    Nothing profiles it otherwise. With memory_interval set, a MemoryTracker
+    report ('status': 'memory') is sent that often, starting at warm-up.
+
+    Args:
+        core_id (int): CPU core ID to pin the worker to
+        pipe (Connection): Child end of the task pipe
+        translate_func (callable, optional): Translator used instead of
+            argosetup.german_to_english (benchmarks pass a stub here)
+        warmup_text (str, optional): Text translated once before reporting ready
+        batch_translate_func (callable, optional): Batched translator; without
+            one, batched tasks are translated one by one
+        batch_size (int): Maximum tasks translated in one call
+        batch_wait (float): Seconds to wait for a batch to fill up
+        memory_interval (float): Seconds between memory reports (0 = don't track)
+        memory_frames (int): Traceback depth of the allocation sites tracked
+        batch_translate (bool): Use argosetup.german_to_english_batch when
+            translate_func isn't given
+    """
     try:
         process = psutil.Process(os.getpid())
         process.cpu_affinity([core_id])
         
         print(f"🔧 Worker {os.getpid()} started on core {core_id}")
+
+        # Load the model up front instead of on the first real task
+        warmup_started = time.time()
+        if translate_func is None:
+            from argosetup import german_to_english as translate_func
+            if batch_translate_func is None and batch_translate:
+                from argosetup import german_to_english_batch as batch_translate_func
+        if warmup_text:
+            translate_func(warmup_text)
+
+        # Memory growth is measured from here, with the model loaded
+        tracker = None
+        memory_due = None
+        if memory_interval:
+            tracker = MemoryTracker(memory_frames)
+            tracker.start()
+            memory_due = time.monotonic()
+        pipe.send({'status': 'ready', 'pid': os.getpid(), 'warmup_time': time.time() - warmup_started})
+        print(f"🔥 Worker {os.getpid()} warm after {time.time() - warmup_started:.2f}s")
+
+        # With fork the child inherits the parent's end of the pipe too, so a
+        # dead parent never shows up as EOF. Watch its sentinel as well.
+        parent = multiprocessing.parent_process()
+        parent_sentinel = parent.sentinel if parent else None
+        watched = [pipe] if parent_sentinel is None else [pipe, parent_sentinel]
+
+        tasks_done = 0
+        busy_time = 0.0
+
+        profile = None  # Running on the parent's request, see cpuprofiler
+        profile_until = None
+        controls = []  # Profile requests drained while collecting a batch
         
         while True:
             try:
-                # Check for work
-                if pipe.poll():
-                    task_data = pipe.recv()
-                    print(f"📥 Worker {os.getpid()} received: {task_data}")
+                # Sleep in the kernel until a task, STOP or parent exit arrives,
+                # or until a running profile or a memory report is due
+                due = [deadline for deadline in (profile_until, memory_due) if deadline is not None]
+                if controls:
+                    timeout = 0
+                elif due:
+                    timeout = max(0.0, min(due) - time.monotonic())
+                else:
+                    timeout = None
+                ready = wait(watched, timeout)
+
+                if parent_sentinel is not None and parent_sentinel in ready:
+                    print(f"📡 Worker {os.getpid()}: Parent exited, shutting down")
+                    break
+
+                if profile is not None and time.monotonic() >= profile_until:
+                    pipe.send(profile.stop())
+                    profile, profile_until = None, None
+                if tracker is not None and time.monotonic() >= memory_due:
+                    pipe.send(tracker.sample(tasks_done))
+                    memory_due = time.monotonic() + memory_interval
+                while controls:
+                    profile, profile_until = begin_profile(pipe, controls.pop(0), profile, profile_until)
+                if pipe not in ready:
+                    continue
+
+                task_data = pipe.recv()
+                
+                if isinstance(task_data, dict) and 'id' in task_data:
+                    batch, stop_requested = collect_batch(pipe, task_data, batch_size, batch_wait, controls)
+                    print(f"🔄 Worker {os.getpid()} translating batch of {len(batch)}: {str(batch[0]['task'])[:50]}...")
                     
-                    if isinstance(task_data, dict) and 'id' in task_data:
-                        task_id = task_data['id']
-                        text = task_data['task']
-                        
-                        print(f"🔄 Worker {os.getpid()} translating: {text[:50]}...")
-                        
-                        # In the worker_process function, change the import:
-                        from argosetup import german_to_english  # Changed import
-                        result = german_to_english(text)  # Changed function call
-                        
-                        response = {'id': task_id, 'result': result, 'time_finished': int(time.time())}
-                        
-                        pipe.send(response)
-                        
-                    elif task_data == "STOP":
+                    time_started = time.monotonic()
+                    responses = translate_batch(batch, translate_func, batch_translate_func)
+                    for response in responses:
+                        response['time_started'] = time_started
+
+                    tasks_done += len(batch)
+                    busy_time += responses[-1]['time_finished'] - time_started
+                    responses[-1]['worker_stats'] = {
+                        'tasks': tasks_done,
+                        'busy': busy_time,
+                        'cpu': time.process_time()  # Every thread's CPU, CTranslate2's included
+                    }
+                    pipe.send(responses)
+
+                    if stop_requested:
                         print(f"🔄 Worker {os.getpid()} shutting down")
                         break
-                else:
-                    # CRITICAL: Sleep when no work available
-                    time.sleep(0.1)  # 100ms idle sleep
+                    
+                elif task_data == "STOP":
+                    print(f"🔄 Worker {os.getpid()} shutting down")
+                    break
+
+                elif isinstance(task_data, dict) and 'profile' in task_data:
+                    profile, profile_until = begin_profile(pipe, task_data, profile, profile_until)
                         
             except (EOFError, BrokenPipeError):
                 print(f"📡 Worker {os.getpid()}: Pipe closed, shutting down")
                 break
             except Exception as e:
                 error_logger(e, f"Worker {os.getpid()} task error")
-                time.sleep(0.1)  # Sleep on error too
                 
     except Exception as e:
         error_logger(e, f"Worker {os.getpid()} fatal error")
@@ -58,12 +265,50 @@ def worker_process(core_id, pipe):
             pass
 
 
-def spawn_process_on_core(core_id):
+def get_worker_context(start_method=None, preload=None):
+    """
+    Get the multiprocessing context workers are started from.
+
+    With the forkserver method the server process imports the preload modules
+    once, so every worker forks with argosetup (package index and language
+    objects) already loaded. Falls back to the platform default when the
+    requested method isn't available (forkserver doesn't exist on Windows).
+
+    Args:
+        start_method (str, optional): 'fork', 'forkserver' or 'spawn'
+        preload (list, optional): Modules the forkserver imports before forking
+
+    Returns:
+        BaseContext: Context to create worker processes and pipes from
+    """
+    if start_method not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context()
+
+    context = multiprocessing.get_context(start_method)
+    if preload and start_method == 'forkserver':
+        # Only takes effect before the forkserver is first started
+        context.set_forkserver_preload(preload)
+    return context
+
+
+def spawn_process_on_core(core_id, translate_func=None, start_method=None, preload=None, warmup_text=None,
+                          batch_size=1, batch_wait=0, memory_interval=0, memory_frames=1, batch_translate=False):
     """
     Spawn a translation worker and pin it to a specific CPU core.
     
     Args:
         core_id (int): CPU core ID to pin the worker to
+        translate_func (callable, optional): Module-level translator to use
+            instead of argosetup.german_to_english
+        start_method (str, optional): Multiprocessing start method for the worker
+        preload (list, optional): Modules a forkserver should import up front
+        warmup_text (str, optional): Text the worker translates before reporting ready
+        batch_size (int): Maximum tasks the worker translates in one call
+        batch_wait (float): Seconds the worker waits for a batch to fill up
+        memory_interval (float): Seconds between the worker's memory reports (0 = off)
+        memory_frames (int): Traceback depth of the allocation sites it tracks
+        batch_translate (bool): Translate a batch in one batched call
+            (argosetup.german_to_english_batch) instead of one by one
         
     Returns:
         tuple: (process_id, core_id, parent_pipe)
@@ -72,21 +317,27 @@ def spawn_process_on_core(core_id):
         Exception: If process spawning fails
     """
     try:
+        context = get_worker_context(start_method, preload)
+
         # Create bidirectional pipes
-        parent_conn, child_conn = multiprocessing.Pipe()
+        parent_conn, child_conn = context.Pipe()
         
         # Create the process
-        process = multiprocessing.Process(
+        process = context.Process(
             target=worker_process, 
-            args=(core_id, child_conn)
+            args=(core_id, child_conn, translate_func, warmup_text, None, batch_size, batch_wait,
+                  memory_interval, memory_frames, batch_translate)
         )
         
         # Start it
         process.start()
+
+        # The child has its own copy now
+        child_conn.close()
         
         # Return process info and parent's end of the pipe
         return process.pid, core_id, parent_conn
         
     except Exception as e:
         error_logger(e, f"Failed to spawn worker on core {core_id}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,134 @@
+import time
+
+from latencyhistogram import EXPORT_BOUNDS
+from metricsblock import HISTOGRAM_SLOTS
+from requesttrace import TRACE_STAGES
+
+
+# (metric, reports key, help); every name gets the exporter's prefix
+COUNTERS = (
+    ('tasks_accepted_total', 'tasks_accepted', "Translation tasks sent to a worker or admitted to wait for one."),
+    ('tasks_failed_total', 'tasks_failed', "Accepted translation tasks lost to a dead worker or a failed send."),
+    ('workers_spawned_total', 'worker_spawns', "Worker processes started."),
+    ('workers_stopped_total', 'worker_teardowns', "Worker processes retired by the pool."),
+    ('workers_recycled_total', 'worker_recycles', "Workers replaced for reaching their task or RSS limit."),
+    ('coalesced_requests_total', 'coalesced', "Repeat requests answered by a translation already in flight."),
+    ('cache_hits_total', 'cache_hits', "Sentence translations served from the cache."),
+    ('cache_misses_total', 'cache_misses', "Sentence lookups that missed the cache."),
+    ('reply_failures_total', 'reply_failures', "Discord replies given up on."),
+)
+
+# (reason label, reports key) of translator_tasks_rejected_total
+REJECTIONS = (
+    ('ram', 'tasks_rejected_ram'),
+    ('queue', 'admission_rejected'),  # No worker slot: CPU or queue limits, and the wait was too long
+    ('rate_limit', 'rate_limited'),
+)
+
+GAUGES = (
+    ('workers', 'queues', "Worker processes in the pool."),
+    ('tasks_in_progress', 'jobs', "Tasks outstanding on workers."),
+    ('admission_queue_depth', 'admission_depth', "Tasks waiting for a worker slot."),
+    ('reply_queue_depth', 'reply_queue_depth', "Replies waiting to be sent."),
+    ('cpu_percent', 'cpu', "System CPU usage."),
+    ('ram_percent', 'ram', "System RAM usage."),
+    ('guilds', 'connected_servers', "Discord servers the bot is in."),
+)
+
+
+def format_value(value):
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class PrometheusExporter:
+    """
+    Renders the reports block in the Prometheus text format for /metrics.
+
+    A render is reused for cache_seconds, and past that only redone when the
+    bot has published since, so a scrape is normally a cache hit. Everything
+    that doesn't change between renders (HELP/TYPE lines, label sets, bucket
+    bounds) is built once.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, reports, cache_seconds=5.0, prefix='translator_'):
+        self.reports = reports
+        self.cache_seconds = cache_seconds
+        self.prefix = prefix
+
+        self.body = None
+        self.rendered_at = float('-inf')
+        self.rendered_sequence = None
+        self.renders = 0
+
+        self.counter_lines = [(self.header(name, 'counter', help_text) + f"\n{prefix}{name} ", key)
+                              for name, key, help_text in COUNTERS]
+        self.gauge_lines = [(self.header(name, 'gauge', help_text) + f"\n{prefix}{name} ", key)
+                            for name, key, help_text in GAUGES]
+        self.rejection_header = self.header('tasks_rejected_total', 'counter',
+                                            "Translation requests turned away, by reason.")
+        self.rejection_lines = [(f'{prefix}tasks_rejected_total{{reason="{reason}"}} ', key)
+                                for reason, key in REJECTIONS]
+        self.worker_header = self.header('worker_queue_depth', 'gauge', "Tasks outstanding per worker queue.")
+        self.request_header = self.header('request_duration_seconds', 'histogram',
+                                          "Time from a request arriving to its translation being read back.")
+        self.stage_header = self.header('stage_duration_seconds', 'histogram',
+                                        "Time translated requests spent in each stage, see /api/trace/recent.")
+        self.bounds = [format_value(bound) for bound in EXPORT_BOUNDS] + ['+Inf']
+
+    def header(self, name, kind, help_text):
+        return f"# HELP {self.prefix}{name} {help_text}\n# TYPE {self.prefix}{name} {kind}"
+
+    def render(self):
+        """The exposition as bytes, from the cache while it is fresh."""
+        now = time.monotonic()
+        if self.body is not None and now - self.rendered_at < self.cache_seconds:
+            return self.body
+        sequence = self.reports.sequence
+        if self.body is not None and sequence == self.rendered_sequence:
+            self.rendered_at = now  # Nothing published since; the old render is still right
+            return self.body
+
+        snapshot = self.reports.read()
+        lines = []
+        for line, key in self.counter_lines:
+            lines.append(line + format_value(snapshot[key]))
+        lines.append(self.rejection_header)
+        for line, key in self.rejection_lines:
+            lines.append(line + format_value(snapshot[key]))
+        for line, key in self.gauge_lines:
+            lines.append(line + format_value(snapshot[key]))
+
+        lines.append(self.worker_header)
+        for queue_id, depth in zip(snapshot['worker_ids'], snapshot['worker_depths']):
+            if queue_id:
+                lines.append(f'{self.prefix}worker_queue_depth{{queue="{queue_id}"}} {depth}')
+
+        lines.append(self.request_header)
+        self.histogram(lines, 'request_duration_seconds', '', snapshot['latency_buckets'])
+        lines.append(self.stage_header)
+        stage_buckets = snapshot['trace_stage_buckets']
+        for index, stage in enumerate(TRACE_STAGES + ('total',)):
+            self.histogram(lines, 'stage_duration_seconds', f'stage="{stage}",',
+                           stage_buckets[index * HISTOGRAM_SLOTS:(index + 1) * HISTOGRAM_SLOTS])
+
+        lines.append('')
+        self.body = '\n'.join(lines).encode()
+        self.rendered_at = now
+        self.rendered_sequence = sequence
+        self.renders += 1
+        return self.body
+
+    def histogram(self, lines, name, labels, packed):
+        """Append one histogram's _bucket, _sum and _count lines from a CumulativeHistogram.pack()."""
+        metric = self.prefix + name
+        cumulative = 0
+        for bound, count in zip(self.bounds, packed):
+            cumulative += int(count)
+            lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        braces = f"{{{labels.rstrip(',')}}}" if labels else ''
+        lines.append(f'{metric}_sum{braces} {format_value(packed[-1])}')
+        lines.append(f'{metric}_count{braces} {cumulative}')
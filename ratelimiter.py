@@ -0,0 +1,97 @@
+import time
+
+from errorlogger import error_logger
+
+
+class RateLimiter:
+    """
+    Token buckets per user, channel and guild, checked before a request costs anything.
+
+    Each scope has a burst size and a refill rate. Buckets are plain tuples in
+    one dict per scope, and a bucket that has been idle long enough to refill
+    completely is dropped on the next sweep (a fresh bucket is identical), so
+    memory only grows with the number of recently active ids. max_buckets is a
+    hard cap on top of that.
+    """
+
+    def __init__(self, limits, max_buckets=50000, sweep_interval=60):
+        """
+        Args:
+            limits (dict): {scope: (burst, per_minute)}; a burst of 0 turns the scope off
+            max_buckets (int): Buckets kept per scope at most
+            sweep_interval (float): Seconds between sweeps of idle buckets
+        """
+        self.limits = {scope: (burst, per_minute / 60) for scope, (burst, per_minute) in limits.items()
+                       if burst > 0 and per_minute > 0}
+        self.max_buckets = max_buckets
+        self.sweep_interval = sweep_interval
+        self.buckets = {scope: {} for scope in self.limits}  # {scope: {id: (tokens, updated, notified)}}
+        self.last_sweep = time.monotonic()
+
+        self.allowed = 0
+        self.limited = {scope: 0 for scope in self.limits}
+
+    def check(self, ids):
+        """
+        Take a token from every bucket a request falls under, if they all have one.
+
+        Args:
+            ids (dict): {scope: id}; scopes without an id (e.g. guild in DMs) are skipped
+
+        Returns:
+            tuple: (limited_scope, notify). limited_scope is None when the request
+                may go ahead; notify is True for the first rejection since the
+                caller last got through, so users are told once, not per request
+        """
+        try:
+            now = time.monotonic()
+            if now - self.last_sweep >= self.sweep_interval:
+                self.sweep(now)
+
+            # Refill first, and only spend tokens once every bucket has one
+            refilled = {}
+            for scope, bucket_id in ids.items():
+                if scope not in self.limits or bucket_id is None:
+                    continue
+                burst, rate = self.limits[scope]
+                tokens, updated, notified = self.buckets[scope].get(bucket_id, (burst, now, False))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                if tokens < 1:
+                    self.buckets[scope][bucket_id] = (tokens, now, True)
+                    self.limited[scope] += 1
+                    return scope, not notified
+                refilled[scope] = (bucket_id, tokens)
+
+            for scope, (bucket_id, tokens) in refilled.items():
+                buckets = self.buckets[scope]
+                # Re-insert so dict order is least recently used first
+                if buckets.pop(bucket_id, None) is None and len(buckets) >= self.max_buckets:
+                    del buckets[next(iter(buckets))]
+                buckets[bucket_id] = (tokens - 1, now, False)
+
+            self.allowed += 1
+            return None, False
+
+        except Exception as e:
+            error_logger(e, "Rate limit check failed")
+            return None, False  # Fail open
+
+    def sweep(self, now=None):
+        """Drop buckets that have refilled completely since they were last used."""
+        now = time.monotonic() if now is None else now
+        for scope, buckets in self.buckets.items():
+            burst, rate = self.limits[scope]
+            stale = [bucket_id for bucket_id, (tokens, updated, _) in buckets.items()
+                     if tokens + (now - updated) * rate >= burst]
+            for bucket_id in stale:
+                del buckets[bucket_id]
+        self.last_sweep = now
+
+    def stats(self):
+        """Return limiter counters for reports."""
+        return {
+            'allowed': self.allowed,
+            'limited': sum(self.limited.values()),
+            'limited_by_scope': dict(self.limited),
+            'buckets': sum(len(buckets) for buckets in self.buckets.values())
+        }
@@ -0,0 +1,166 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import discord
+
+from errorlogger import error_logger
+from latencyhistogram import LatencyHistogram
+
+
+class ReplyDispatcher:
+    """
+    Sends Discord replies off the completion path.
+
+    send() only queues a reply and returns, so the monitor loop keeps draining
+    worker pipes while Discord is slow. Each channel's replies go out in order
+    from their own drain task; at most `concurrency` HTTP calls are in flight
+    across all channels. Sends are paced to Discord's per-channel bucket
+    (channel_burst messages per channel_window seconds), a 429 blocks only
+    that channel for its retry_after, and 5xx/network errors are retried with
+    jittered exponential backoff.
+    """
+
+    def __init__(self, concurrency=4, max_retries=4, backoff=0.5, max_backoff=10.0,
+                 channel_burst=5, channel_window=5.0, latency_window=60.0):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.channel_burst = channel_burst  # 0 turns pacing off
+        self.channel_window = channel_window
+
+        self.semaphore = None  # Created on first use, inside the running loop
+        self.channels = {}  # {channel_id: {'pending', 'sent', 'blocked_until', 'task'}}
+
+        self.pending = 0  # Queued or being sent
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.latency = LatencyHistogram(window=latency_window)  # Queued -> delivered
+
+    def send(self, message, content, on_done=None, **kwargs):
+        """
+        Queue a reply to a message.
+
+        Args:
+            message: Message to reply to
+            content (str): Reply text
+            on_done (callable, optional): Called with (queued_at, delivered_at, ok)
+                once the reply is delivered or given up on
+            **kwargs: Passed on to message.reply
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        channel_id = getattr(getattr(message, 'channel', None), 'id', None)
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = {'pending': deque(), 'sent': deque(), 'blocked_until': 0.0, 'task': None}
+            self.channels[channel_id] = channel
+
+        channel['pending'].append((message, content, kwargs, time.monotonic(), on_done))
+        self.pending += 1
+        if channel['task'] is None or channel['task'].done():
+            channel['task'] = asyncio.get_running_loop().create_task(self.drain(channel_id, channel))
+
+    async def drain(self, channel_id, channel):
+        """Deliver one channel's replies in order, then forget the channel once its bucket has refilled."""
+        try:
+            while channel['pending']:
+                message, content, kwargs, queued_at, on_done = channel['pending'].popleft()
+                ok = await self.deliver(channel, message, content, kwargs)
+                delivered_at = time.monotonic()
+                self.pending -= 1
+                if ok:
+                    self.delivered += 1
+                    self.latency.record(delivered_at - queued_at)
+                else:
+                    self.failed += 1
+                if on_done:
+                    try:
+                        on_done(queued_at, delivered_at, ok)
+                    except Exception as callback_error:
+                        error_logger(callback_error, "Reply callback failed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error_logger(e, f"Reply drain failed for channel {channel_id}")
+        finally:
+            channel['task'] = None
+            asyncio.get_running_loop().call_later(self.channel_window, self.forget_channel, channel_id)
+
+    def forget_channel(self, channel_id):
+        channel = self.channels.get(channel_id)
+        if channel and not channel['pending'] and channel['task'] is None:
+            del self.channels[channel_id]
+
+    async def pace(self, channel):
+        """Wait until the channel's rate-limit bucket has room for another message."""
+        while True:
+            now = time.monotonic()
+            wait = channel['blocked_until'] - now
+            if self.channel_burst:
+                sent = channel['sent']
+                while sent and now - sent[0] >= self.channel_window:
+                    sent.popleft()
+                if len(sent) >= self.channel_burst:
+                    wait = max(wait, sent[0] + self.channel_window - now)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def deliver(self, channel, message, content, kwargs):
+        """Send one reply, retrying what's worth retrying. Returns True once it's sent."""
+        for attempt in range(self.max_retries + 1):
+            await self.pace(channel)
+            try:
+                async with self.semaphore:
+                    if self.channel_burst:
+                        channel['sent'].append(time.monotonic())
+                    await message.reply(content, **kwargs)
+                return True
+
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None or attempt == self.max_retries:
+                    error_logger(e, f"Failed to send reply after {attempt + 1} attempt(s)")
+                    return False
+                if getattr(e, 'status', None) == 429 or isinstance(e, discord.RateLimited):
+                    # Only this channel waits; the others keep sending
+                    channel['blocked_until'] = time.monotonic() + delay
+                self.retries += 1
+                await asyncio.sleep(delay)
+        return False
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retrying after this error, or None if retrying won't help."""
+        backoff = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+        if isinstance(error, discord.RateLimited):
+            return error.retry_after
+        if isinstance(error, discord.HTTPException):
+            if error.status == 429:
+                retry_after = getattr(error, 'retry_after', None)
+                if retry_after is None and getattr(error, 'response', None) is not None:
+                    retry_after = error.response.headers.get('Retry-After')
+                return float(retry_after) if retry_after else backoff
+            if error.status >= 500:
+                return backoff
+            return None  # Forbidden, NotFound, bad request: the same call would fail again
+        if isinstance(error, (asyncio.TimeoutError, OSError)):
+            return backoff
+        return None
+
+    def stats(self):
+        """Return reply counters and latency for reports."""
+        latency = self.latency.snapshot()
+        return {
+            'depth': self.pending,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'retries': self.retries,
+            'latency_p50': latency['p50'],
+            'latency_p99': latency['p99']
+        }
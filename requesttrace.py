@@ -0,0 +1,150 @@
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from errorlogger import error_logger
+from latencyhistogram import CumulativeHistogram, LatencyHistogram
+
+
+# Stages of a request, in order. All stamps are time.monotonic():
+#   admission   task_sort received it -> routed (rate limit, cache/store lookups, RAM check)
+#   queue_wait  routed -> written to a worker pipe (admission queue, held for warm-up)
+#   pipe_in     written -> the worker started translating it (pipe transfer, earlier batches)
+#   translate   worker started -> worker finished
+#   pipe_out    worker finished -> read from the pipe by the bot
+#   completion  read -> reply queued (event loop, reassembly)
+#   reply       queued -> delivered by the reply dispatcher (pacing, retries, Discord)
+TRACE_STAGES = ('admission', 'queue_wait', 'pipe_in', 'translate', 'pipe_out', 'completion', 'reply')
+
+# Layout of one breakdown in the shared reports array
+TRACE_FIELDS = ('job_id', 'timestamp', 'tasks') + TRACE_STAGES + ('total',)
+
+# Layout of the per-stage summary in the shared reports array
+TRACE_STAT_NAMES = ('p50', 'p90', 'p99', 'max')
+
+
+def stage_breakdown(stamps):
+    """
+    Turn a job's stage timestamps into per-stage durations.
+
+    Args:
+        stamps (dict): received, routed, piped, started, finished, read,
+            reply_started and replied, from the job's last task to finish
+
+    Returns:
+        dict: Seconds per stage in TRACE_STAGES, plus 'total'
+    """
+    order = ('received', 'routed', 'piped', 'started', 'finished', 'read', 'reply_started', 'replied')
+    breakdown = {}
+    for stage, (start, end) in zip(TRACE_STAGES, zip(order, order[1:])):
+        if stamps.get(start) is not None and stamps.get(end) is not None:
+            breakdown[stage] = max(0.0, stamps[end] - stamps[start])
+        else:
+            breakdown[stage] = 0.0
+    breakdown['total'] = max(0.0, stamps['replied'] - stamps['received'])
+    return breakdown
+
+
+class RequestTracer:
+    """
+    Per-stage latency of translated requests.
+
+    Keeps a rolling histogram per stage, the last `recent` breakdowns for
+    /api/trace/recent, and optionally appends requests slower than
+    slow_threshold seconds to a log file. The appends run on a thread of
+    their own, so a slow disk never holds up the event loop.
+    """
+
+    def __init__(self, recent=50, slow_threshold=0, slow_log=None, window=60.0):
+        self.histograms = {stage: LatencyHistogram(window=window) for stage in TRACE_STAGES + ('total',)}
+        self.totals = {stage: CumulativeHistogram() for stage in TRACE_STAGES + ('total',)}  # For /metrics
+        self.recent = deque(maxlen=recent)
+        self.recent_size = recent
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        self.log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-log') if slow_log else None
+        self.traced = 0
+        self.slow = 0
+
+    def record(self, job_id, tasks, stamps):
+        """Add a finished request's breakdown."""
+        try:
+            breakdown = stage_breakdown(stamps)
+            for stage, duration in breakdown.items():
+                self.histograms[stage].record(duration)
+                self.totals[stage].record(duration)
+
+            entry = {'job_id': job_id, 'timestamp': time.time(), 'tasks': tasks}
+            entry.update(breakdown)
+            self.recent.append(entry)
+            self.traced += 1
+
+            if self.slow_threshold and breakdown['total'] >= self.slow_threshold:
+                self.slow += 1
+                self.log_slow(entry)
+
+        except Exception as e:
+            error_logger(e, f"Failed to record trace for job {job_id}")
+
+    def log_slow(self, entry):
+        slowest = max(TRACE_STAGES, key=lambda stage: entry[stage])
+        print(f"🐢 Slow request {entry['job_id']}: {entry['total'] * 1000:.0f} ms, "
+              f"mostly {slowest} ({entry[slowest] * 1000:.0f} ms)")
+        if self.log_executor:
+            self.log_executor.submit(self.append_slow_log, json.dumps(entry) + "\n")
+
+    def append_slow_log(self, line):
+        """Write one slow request to the log; runs on the log thread."""
+        try:
+            with open(self.slow_log, 'a') as file:
+                file.write(line)
+        except Exception as e:
+            error_logger(e, "Failed to write slow request log")
+
+    def close(self):
+        """Wait for queued slow log writes to finish."""
+        executor, self.log_executor = self.log_executor, None  # Later slow requests are only printed
+        if executor:
+            executor.shutdown(wait=True)
+
+    def stage_stats(self):
+        """Rolling p50/p90/p99/max per stage, in seconds."""
+        return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+    def pack_recent(self):
+        """Recent breakdowns as a flat, zero-padded list for the shared reports array."""
+        values = []
+        for entry in self.recent:
+            values.extend(float(entry[field]) for field in TRACE_FIELDS)
+        values.extend([0.0] * (self.recent_size * len(TRACE_FIELDS) - len(values)))
+        return values
+
+    def pack_stage_stats(self):
+        """Per-stage summary as a flat list for the shared reports array."""
+        stats = self.stage_stats()
+        return [float(stats[stage][name]) for stage in TRACE_STAGES + ('total',) for name in TRACE_STAT_NAMES]
+
+    def pack_stage_totals(self):
+        """Lifetime per-stage histograms, one CumulativeHistogram.pack() after another."""
+        return [value for stage in TRACE_STAGES + ('total',) for value in self.totals[stage].pack()]
+
+
+def unpack_recent(values, count):
+    """Read breakdowns back out of the shared array, newest first."""
+    width = len(TRACE_FIELDS)
+    entries = []
+    for index in range(count):
+        row = values[index * width:(index + 1) * width]
+        entry = dict(zip(TRACE_FIELDS, row))
+        entry['job_id'] = int(entry['job_id'])
+        entry['tasks'] = int(entry['tasks'])
+        entries.append(entry)
+    return entries[::-1]
+
+
+def unpack_stage_stats(values):
+    """Read the per-stage summary back out of the shared array."""
+    width = len(TRACE_STAT_NAMES)
+    return {stage: dict(zip(TRACE_STAT_NAMES, values[index * width:(index + 1) * width]))
+            for index, stage in enumerate(TRACE_STAGES + ('total',))}
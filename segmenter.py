@@ -0,0 +1,104 @@
+import re
+
+
+# A sentence ends at . ! ? … (plus closing quotes/brackets) followed by whitespace,
+# and every line break is a boundary of its own
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])["\'»“)\]]*\s+|\n+')
+
+# Abbreviations that end in a period without ending the sentence
+ABBREVIATIONS = (
+    'abs', 'bd', 'bspw', 'bzw', 'ca', 'dipl', 'dr', 'etc', 'evtl', 'fr', 'geb', 'gest', 'ggf',
+    'hr', 'hrsg', 'inkl', 'ing', 'insb', 'jh', 'kap', 'mio', 'mr', 'mrd', 'mrs', 'nr', 'prof',
+    'sog', 'st', 'str', 'tel', 'usw', 'vgl', 'zzgl',
+)
+
+# Segment endings that are usually not a sentence end: ordinals ("am 3. Oktober"),
+# single letters and initials ("z. B.", "J. Müller"), dotted abbreviations
+# ("z.B.", "d.h.") and the ones listed above ("Dr.", "bzw.")
+NOT_A_SENTENCE_END = re.compile(
+    r'(?:\b\d+|\b\w|\b(?:\w\.)+\w|\b(?i:' + '|'.join(ABBREVIATIONS) + r'))\.$')
+
+
+def split_segments(text):
+    """
+    Split a message into sentence segments that can be translated independently.
+
+    Args:
+        text (str): Message to split
+
+    Returns:
+        tuple: (segments, separators) where separators[i] is the whitespace
+            that followed segments[i] in the original text
+    """
+    segments = []
+    separators = []
+    position = 0
+
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        # Keep closing quotes/brackets with their sentence, not the separator
+        separator_start = match.start() + len(match.group()) - len(match.group().lstrip('"\'»“)]'))
+        _append_segment(segments, separators, text[position:separator_start], text[separator_start:match.end()])
+        position = match.end()
+
+    _append_segment(segments, separators, text[position:], '')
+
+    if not segments:
+        return [text], ['']
+    return segments, separators
+
+
+def _append_segment(segments, separators, segment, separator):
+    """Add a segment, gluing it to the previous one if that wasn't a real sentence end."""
+    if not segment.strip():
+        if separators:
+            separators[-1] += segment + separator
+        return
+
+    if segments and '\n' not in separators[-1] and NOT_A_SENTENCE_END.search(segments[-1]):
+        segments[-1] += separators[-1] + segment
+        separators[-1] = separator
+        return
+
+    segments.append(segment)
+    separators.append(separator)
+
+
+def group_segments(lengths, max_groups):
+    """
+    Split a run of segments into at most max_groups contiguous groups of similar length.
+
+    Args:
+        lengths (list): Length of each segment, in order
+        max_groups (int): Number of groups to produce at most
+
+    Returns:
+        list: Groups as lists of positions into lengths
+    """
+    if max_groups <= 1 or len(lengths) <= 1:
+        return [list(range(len(lengths)))] if lengths else []
+
+    groups = []
+    current = []
+    current_length = 0
+    remaining_length = sum(lengths)  # Of the current group and everything after it
+    for position, length in enumerate(lengths):
+        groups_left = max_groups - len(groups)
+        # Each group aims for an equal share of what is left, so one long
+        # segment at the end can't pull the earlier groups into its own
+        target_length = remaining_length / groups_left
+        if current and groups_left > 1 and \
+                abs(current_length + length - target_length) > abs(current_length - target_length):
+            groups.append(current)
+            remaining_length -= current_length
+            current = []
+            current_length = 0
+        current.append(position)
+        current_length += length
+
+    groups.append(current)
+    return groups
+
+
+def join_segments(segments, separators):
+    """Rebuild a message from translated segments and the original separators."""
+    return ''.join(segment + separator for segment, separator in zip(segments, separators)).strip()
@@ -0,0 +1,86 @@
+import sys
+import unicodedata
+from collections import OrderedDict
+
+from errorlogger import error_logger
+
+
+def normalize_text(text):
+    """Normalize a segment for cache lookups: NFC, trimmed, single spaces."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+class TranslationCache:
+    """
+    Bounded in-memory LRU cache of segment translations.
+
+    Keyed on the normalized segment text and language pair. Evicts the least
+    recently used entries once either the entry limit or the approximate
+    memory limit is exceeded.
+    """
+
+    def __init__(self, max_entries=5000, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # {(text, from_code, to_code): (translation, size)}
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text, from_code='de', to_code='en'):
+        """
+        Look up a segment translation.
+
+        Returns:
+            str: Cached translation, or None on a miss
+        """
+        try:
+            key = (normalize_text(text), from_code, to_code)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        except Exception as e:
+            error_logger(e, "Translation cache lookup failed")
+            return None
+
+    def put(self, text, translation, from_code='de', to_code='en'):
+        """Store a segment translation and evict old entries past the limits."""
+        try:
+            if not translation:
+                return
+
+            key = (normalize_text(text), from_code, to_code)
+            size = sys.getsizeof(key[0]) + sys.getsizeof(translation)
+
+            old_entry = self.entries.pop(key, None)
+            if old_entry is not None:
+                self.size_bytes -= old_entry[1]
+
+            self.entries[key] = (translation, size)
+            self.size_bytes += size
+
+            while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+        except Exception as e:
+            error_logger(e, "Translation cache store failed")
+
+    def stats(self):
+        """Return cache counters for reports."""
+        return {
+            'entries': len(self.entries),
+            'size_bytes': self.size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from errorlogger import error_logger
+from translationcache import normalize_text
+
+
+def content_hash(text, from_code='de', to_code='en'):
+    """Stable key for a segment: SHA-1 of the language pair and normalized text."""
+    key = f"{from_code}\x00{to_code}\x00{normalize_text(text)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class TranslationStore:
+    """
+    Persistent SQLite store of segment translations that survives restarts.
+
+    Every database call runs on one dedicated thread that owns the connection,
+    so the event loop never blocks on disk. New translations and hit counts
+    are buffered and written in batches by run_flusher(). Rows beyond max_rows
+    are evicted least recently used first.
+    """
+
+    def __init__(self, path, max_rows=200000, flush_interval=2.0, flush_batch=500):
+        self.path = str(path)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='translation-store')
+        self.connection = None  # Only touched on the executor thread
+        self.row_count = 0  # Kept up to date by _flush, so the size cap needs no COUNT(*) scan
+
+        self.pending_writes = {}  # {hash: (from_code, to_code, source, translation, timestamp)}
+        self.pending_hits = {}  # {hash: (hit_count, timestamp)}
+        self.flush_event = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def run(self, func, *args):
+        """Run a database call on the store thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def open(self):
+        """Open (and create if needed) the database."""
+        await self.run(self._open)
+        self.flush_event = asyncio.Event()
+
+    def _open(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                hash TEXT PRIMARY KEY,
+                from_code TEXT NOT NULL,
+                to_code TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_translations_hits ON translations (hits)")
+        self.connection.commit()
+        self.row_count = self.connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    async def lookup_many(self, texts, from_code='de', to_code='en'):
+        """
+        Look up several segments in one round trip to the store thread.
+
+        Returns:
+            list: Translation or None for each text
+        """
+        try:
+            hashes = [content_hash(text, from_code, to_code) for text in texts]
+            results = [None] * len(texts)
+
+            # Writes that haven't been flushed yet are lookups too
+            to_query = []
+            for index, key in enumerate(hashes):
+                pending = self.pending_writes.get(key)
+                if pending:
+                    results[index] = pending[3]
+                else:
+                    to_query.append(index)
+
+            if to_query:
+                found = await self.run(self._lookup, [hashes[index] for index in to_query])
+                for index in to_query:
+                    results[index] = found.get(hashes[index])
+
+            now = time.time()
+            for key, result in zip(hashes, results):
+                if result is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    hit_count, _ = self.pending_hits.get(key, (0, now))
+                    self.pending_hits[key] = (hit_count + 1, now)
+
+            return results
+
+        except Exception as e:
+            error_logger(e, "Translation store lookup failed")
+            return [None] * len(texts)
+
+    def _lookup(self, hashes):
+        placeholders = ','.join('?' * len(hashes))
+        rows = self.connection.execute(
+            f"SELECT hash, translation FROM translations WHERE hash IN ({placeholders})", hashes
+        ).fetchall()
+        return dict(rows)
+
+    def put(self, text, translation, from_code='de', to_code='en'):
+        """Buffer a translation for the next batched write."""
+        if not translation:
+            return
+        key = content_hash(text, from_code, to_code)
+        self.pending_writes[key] = (from_code, to_code, text, translation, time.time())
+        if len(self.pending_writes) >= self.flush_batch and self.flush_event:
+            self.flush_event.set()
+
+    async def flush(self):
+        """Write buffered translations and hit counts, then enforce the size cap."""
+        if not self.pending_writes and not self.pending_hits:
+            return
+        writes, self.pending_writes = self.pending_writes, {}
+        hits, self.pending_hits = self.pending_hits, {}
+        try:
+            self.evictions += await self.run(self._flush, writes, hits)
+        except Exception as e:
+            error_logger(e, f"Translation store flush failed ({len(writes)} writes dropped)")
+
+    def _flush(self, writes, hits):
+        with self.connection:
+            # New rows are counted by the insert; rows that were already there are updated
+            inserted = self.connection.executemany(
+                "INSERT OR IGNORE INTO translations (hash, from_code, to_code, source, translation, hits, last_used) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                [(key, *row) for key, row in writes.items()]
+            ).rowcount
+            if inserted < len(writes):
+                self.connection.executemany(
+                    "UPDATE translations SET translation = ?, last_used = ? WHERE hash = ?",
+                    [(row[3], row[4], key) for key, row in writes.items()]
+                )
+            self.connection.executemany(
+                "UPDATE translations SET hits = hits + ?, last_used = MAX(last_used, ?) WHERE hash = ?",
+                [(hit_count, timestamp, key) for key, (hit_count, timestamp) in hits.items()]
+            )
+
+            # Size cap: drop the least recently used rows
+            row_count = self.row_count + inserted
+            excess = row_count - self.max_rows
+            evicted = 0
+            if excess > 0:
+                evicted = self.connection.execute(
+                    "DELETE FROM translations WHERE hash IN "
+                    "(SELECT hash FROM translations ORDER BY last_used ASC LIMIT ?)", (excess,)
+                ).rowcount
+        self.row_count = row_count - evicted  # Only once the transaction has committed
+        return evicted
+
+    async def run_flusher(self):
+        """Flush on a fixed interval, or early once enough writes are buffered."""
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self.flush_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.flush_event.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                await self.flush()
+                raise
+            except Exception as e:
+                error_logger(e, "Translation store flusher error")
+
+    async def hottest(self, limit):
+        """
+        Most used entries, for warming the in-memory cache on boot.
+
+        Returns:
+            list: (source, translation, from_code, to_code) tuples, hottest first
+        """
+        try:
+            return await self.run(self._hottest, limit)
+        except Exception as e:
+            error_logger(e, "Failed to read hottest translations")
+            return []
+
+    def _hottest(self, limit):
+        return self.connection.execute(
+            "SELECT source, translation, from_code, to_code FROM translations "
+            "ORDER BY hits DESC, last_used DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+    async def close(self):
+        """Flush what's buffered and close the database."""
+        await self.flush()
+        await self.run(self._close)
+        self.executor.shutdown(wait=False)
+
+    def _close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def stats(self):
+        """Return store counters for reports."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'pending_writes': len(self.pending_writes)
+        }
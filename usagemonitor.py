@@ -1,5 +1,111 @@
+import threading
+import time
+
 import psutil
 
+from config import SAMPLER_INTERVAL
+from errorlogger import error_logger
+
+
+class SystemSampler:
+    """
+    Samples per-core CPU, RAM and worker RSS on a fixed cadence in a background
+    thread and publishes the latest snapshot.
+
+    Readers call latest() and get the most recent snapshot without blocking,
+    so admission checks and stats endpoints never sleep waiting for psutil.
+    """
+
+    def __init__(self, interval=SAMPLER_INTERVAL):
+        self.interval = interval
+        self.processes = {}  # {pid: psutil.Process} of workers to track RSS for
+        self.lock = threading.Lock()  # Guards processes only
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.snapshot = {
+            'per_core': [0.0] * (psutil.cpu_count() or 1),
+            'cpu_percent': 0.0,
+            'ram_percent': 0.0,
+            'ram_used': 0,
+            'ram_available': 0,
+            'ram_total': 0,
+            'worker_rss': {},
+            'timestamp': 0.0
+        }
+
+    def start(self):
+        """Start the sampling thread (no-op if it's already running)."""
+        if self.thread and self.thread.is_alive():
+            return
+        psutil.cpu_percent(percpu=True)  # Baseline for the first interval
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='system-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def watch_pid(self, pid):
+        """Include a worker's RSS in the snapshot."""
+        try:
+            with self.lock:
+                self.processes[pid] = psutil.Process(pid)
+        except psutil.Error as e:
+            error_logger(e, f"Sampler can't watch pid {pid}")
+
+    def unwatch_pid(self, pid):
+        with self.lock:
+            self.processes.pop(pid, None)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                error_logger(e, "System sampler error")
+
+    def sample(self):
+        """Take one sample and publish it as the new snapshot."""
+        per_core = psutil.cpu_percent(interval=None, percpu=True)
+        memory = psutil.virtual_memory()
+
+        with self.lock:
+            processes = list(self.processes.items())
+        worker_rss = {}
+        for pid, process in processes:
+            try:
+                worker_rss[pid] = process.memory_info().rss
+            except psutil.Error:
+                self.unwatch_pid(pid)  # Worker exited
+
+        # Swapping the reference is atomic; readers never see a half-built snapshot
+        self.snapshot = {
+            'per_core': per_core,
+            'cpu_percent': sum(per_core) / len(per_core) if per_core else 0.0,
+            'ram_percent': memory.percent,
+            'ram_used': memory.used,
+            'ram_available': memory.available,
+            'ram_total': memory.total,
+            'worker_rss': worker_rss,
+            'timestamp': time.time()
+        }
+
+    def latest(self):
+        """Return the most recent snapshot without blocking."""
+        return self.snapshot
+
+
+_sampler = None
+
+
+def get_sampler():
+    """Get this process's sampler, starting it on first use."""
+    global _sampler
+    if _sampler is None:
+        _sampler = SystemSampler()
+        _sampler.start()
+    return _sampler
+
 
 def get_ram_usage():
     """
@@ -8,13 +114,13 @@ def get_ram_usage():
     Returns:
         dict: RAM usage with total, used, available (in GB) and percentage
     """
-    memory = psutil.virtual_memory()
+    snapshot = get_sampler().latest()
     
     return {
-        'total': f"{memory.total / (1024**3):.2f} GB",
-        'used': f"{memory.used / (1024**3):.2f} GB", 
-        'available': f"{memory.available / (1024**3):.2f} GB",
-        'percentage': f"{memory.percent}%"
+        'total': f"{snapshot['ram_total'] / (1024**3):.2f} GB",
+        'used': f"{snapshot['ram_used'] / (1024**3):.2f} GB", 
+        'available': f"{snapshot['ram_available'] / (1024**3):.2f} GB",
+        'percentage': f"{snapshot['ram_percent']}%"
     }
 
 
@@ -25,51 +131,20 @@ def get_cpu_info():
     Returns:
         dict: CPU information including core counts and usage percentages
     """
-    # Get core counts
-    physical_cores = psutil.cpu_count(logical=False)
-    logical_cores = psutil.cpu_count(logical=True)
-    
-    # Get per-core usage (need a brief interval for accurate reading)
-    per_core_usage = psutil.cpu_percent(interval=1, percpu=True)
-    
-    # Overall CPU usage
-    overall_usage = psutil.cpu_percent(interval=1)
+    snapshot = get_sampler().latest()
     
     return {
-        'physical_cores': physical_cores,
-        'logical_cores': logical_cores,
-        'per_core_usage': per_core_usage,
-        'overall_usage': overall_usage
+        'physical_cores': psutil.cpu_count(logical=False),
+        'logical_cores': psutil.cpu_count(logical=True),
+        'per_core_usage': snapshot['per_core'],
+        'overall_usage': snapshot['cpu_percent']
     }
 
 
 def get_core_usage(core_id):
-    """Debug version to see what's happening with CPU measurements"""
-    import time
-    
-    print(f"🔧 Measuring CPU for core {core_id}")
-    
-    # Try multiple measurement approaches
-    print("Method 1 - Single measurement with 0.1s interval:")
-    per_core_1 = psutil.cpu_percent(interval=0.1, percpu=True)
-    print(f"  Core {core_id}: {per_core_1[core_id]}%")
-    
-    print("Method 2 - Non-blocking after brief pause:")
-    psutil.cpu_percent(percpu=True)  # Reset baseline
-    time.sleep(0.2)
-    per_core_2 = psutil.cpu_percent(interval=None, percpu=True)
-    print(f"  Core {core_id}: {per_core_2[core_id]}%")
-    
-    print("Method 3 - Overall system CPU:")
-    overall = psutil.cpu_percent(interval=0.1)
-    print(f"  Overall system: {overall}%")
-    
-    print("Method 4 - All cores at once:")
-    all_cores = psutil.cpu_percent(interval=0.1, percpu=True)
-    for i, usage in enumerate(all_cores):
-        print(f"  Core {i}: {usage}%")
-    
-    return per_core_1[core_id]
+    """Latest sampled usage of one core, in percent."""
+    per_core = get_sampler().latest()['per_core']
+    return per_core[core_id] if core_id < len(per_core) else 0
 
 
 def get_total_cores():
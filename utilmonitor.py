@@ -1,10 +1,265 @@
-from flask import Flask, jsonify, render_template
+from flask import Flask, Response, jsonify, render_template, request
 import psutil
 import time
 from errorlogger import error_logger
+from usagemonitor import get_sampler
+from requesttrace import unpack_recent, unpack_stage_stats
+from latencyhistogram import EXPORT_BOUNDS, summarize_packed
+from metricsblock import HISTOGRAM_SLOTS, WORKER_FIELDS
+from metricshistory import parse_duration
+from metricsstream import MetricsStream
+from prometheusexport import PrometheusExporter
+from config import STREAM_INTERVAL, STREAM_KEEPALIVE, PROMETHEUS_CACHE_SECONDS, WEB_HOST, WEB_PORT, WEB_THREADS
 
+try:
+    import waitress
+except ImportError:
+    waitress = None
 
-def create_app(reports):
+
+# /api/stats names for reports that are stored under a different name
+STATS_REPORT_KEYS = {
+    'cpu_percent': 'cpu',
+    'ram_percent': 'ram',
+    'queue_count': 'queues',
+    'active_jobs': 'jobs',
+    'avg_response_time': 'response_time',
+    'server_count': 'connected_servers'
+}
+
+
+def build_stats(reports):
+    """Current /api/stats values from one snapshot of the reports block, validated and bounded."""
+    # Safely extract values with defaults
+    stats_data = {}
+    snapshot = reports.read()
+
+    for key, default_value in [
+        ('cpu_percent', 0),
+        ('ram_percent', 0), 
+        ('queue_count', 0),
+        ('active_jobs', 0),
+        ('avg_response_time', 0),
+        ('server_count', 0),
+        ('cold_response_p50', 0),
+        ('cold_response_p90', 0),
+        ('cold_response_p99', 0),
+        ('warm_response_p50', 0),
+        ('warm_response_p90', 0),
+        ('warm_response_p99', 0),
+        ('warmup_p50', 0),
+        ('warmup_p90', 0),
+        ('warmup_p99', 0),
+        ('cache_hits', 0),
+        ('cache_misses', 0),
+        ('cache_evictions', 0),
+        ('coalesced', 0),
+        ('queue_wait_p50', 0),
+        ('queue_wait_p90', 0),
+        ('queue_wait_p99', 0),
+        ('admission_depth', 0),
+        ('admission_rejected', 0),
+        ('rate_limited', 0),
+        ('rate_limit_buckets', 0),
+        ('worker_spawns', 0),
+        ('worker_teardowns', 0),
+        ('worker_recycles', 0),
+        ('response_p50', 0),
+        ('response_p90', 0),
+        ('response_p99', 0),
+        ('response_max', 0),
+        ('reply_queue_depth', 0),
+        ('reply_latency_p50', 0),
+        ('reply_latency_p99', 0),
+        ('reply_failures', 0)
+    ]:
+        try:
+            raw_value = snapshot.get(STATS_REPORT_KEYS.get(key, key))
+
+            # Validate and sanitize the value
+            if raw_value is None:
+                stats_data[key] = default_value
+            elif isinstance(raw_value, (int, float)):
+                # Ensure reasonable bounds
+                if key in ['cpu_percent', 'ram_percent']:
+                    stats_data[key] = max(0, min(100, raw_value))
+                elif key in ['queue_count', 'active_jobs', 'server_count',
+                             'cache_hits', 'cache_misses', 'cache_evictions', 'coalesced',
+                             'admission_depth', 'admission_rejected',
+                             'rate_limited', 'rate_limit_buckets',
+                             'worker_spawns', 'worker_teardowns', 'worker_recycles',
+                             'reply_queue_depth', 'reply_failures']:
+                    stats_data[key] = max(0, int(raw_value))
+                elif key in ['avg_response_time',
+                             'cold_response_p50', 'cold_response_p90', 'cold_response_p99',
+                             'warm_response_p50', 'warm_response_p90', 'warm_response_p99',
+                             'warmup_p50', 'warmup_p90', 'warmup_p99',
+                             'queue_wait_p50', 'queue_wait_p90', 'queue_wait_p99',
+                             'response_p50', 'response_p90',
+                             'response_p99', 'response_max',
+                             'reply_latency_p50', 'reply_latency_p99']:
+                    stats_data[key] = max(0, raw_value)
+                else:
+                    stats_data[key] = raw_value
+            else:
+                error_logger(TypeError(f"Invalid data type for {key}: {type(raw_value)}"), f"Stats API value validation")
+                stats_data[key] = default_value
+
+        except AttributeError as attr_error:
+            error_logger(attr_error, f"Missing attribute for {key}")
+            stats_data[key] = default_value
+        except Exception as value_error:
+            error_logger(value_error, f"Error getting {key} value")
+            stats_data[key] = default_value
+
+    # Add timestamp
+    stats_data['timestamp'] = time.time()
+    
+    return stats_data
+
+
+def build_debug(reports, sampler, stream=None):
+    """Raw report values plus system and server internals for /api/debug."""
+    debug_data = {}
+    snapshot = reports.read()
+    
+    # Raw values with error handling
+    for key, report_key in [
+        ('cpu_raw', 'cpu'),
+        ('ram_raw', 'ram'),
+        ('queues_raw', 'queues'),
+        ('jobs_raw', 'jobs'),
+        ('response_time_raw', 'response_time'),
+        ('servers_raw', 'connected_servers')
+    ]:
+        try:
+            if report_key in snapshot:
+                debug_data[key] = snapshot[report_key]
+            else:
+                debug_data[key] = 'N/A'
+        except Exception as debug_error:
+            error_logger(debug_error, f"Error getting debug value for {key}")
+            debug_data[key] = 'ERROR'
+    
+    # Add system info for debugging
+    try:
+        system = sampler.latest()
+        debug_data['system_cpu'] = system['cpu_percent']
+        debug_data['system_ram'] = system['ram_percent']
+        debug_data['system_cores'] = psutil.cpu_count()
+    except Exception as system_error:
+        error_logger(system_error, "Error getting system debug info")
+        debug_data['system_info'] = 'ERROR'
+    
+    debug_data['timestamp'] = time.time()
+    debug_data['reports_available'] = bool(reports)
+    debug_data['report_keys'] = list(reports.keys()) if reports else []
+    debug_data['report_sequence'] = reports.sequence
+    debug_data['stream_subscribers'] = stream.subscribers if stream else 0
+    return debug_data
+
+
+def build_workers(reports):
+    """
+    /api/workers payload: one entry per worker, by core.
+
+    tasks, busy and cpu (seconds) are lifetime totals, rss is in bytes and
+    utilization is busy time over uptime. traced (bytes) and rss_growth
+    (bytes per 1000 tasks) stay 0 unless memory tracking is on. latency summarises the worker's
+    own translation time per task; its buckets line up with 'bounds', the
+    last one holding everything slower.
+    """
+    snapshot = reports.read()
+    workers = []
+    for slot, queue_id in enumerate(snapshot['worker_ids']):
+        if not queue_id:
+            continue
+        worker = {field: snapshot[report_key][slot] for field, report_key in WORKER_FIELDS}
+        worker['ready'] = bool(worker['ready'])
+        worker['utilization'] = min(1.0, worker['busy'] / worker['uptime']) if worker['uptime'] > 0 else 0.0
+
+        buckets = snapshot['worker_latency_buckets'][slot * HISTOGRAM_SLOTS:(slot + 1) * HISTOGRAM_SLOTS]
+        worker['latency'] = summarize_packed(buckets)
+        worker['latency']['buckets'] = [int(count) for count in buckets[:-1]]
+        workers.append(worker)
+
+    workers.sort(key=lambda worker: (worker['core'], worker['queue_id']))
+    return {'workers': workers, 'bounds': list(EXPORT_BOUNDS), 'timestamp': time.time()}
+
+
+def build_trace(reports, limit=None):
+    """/api/trace/recent payload and status: the newest `limit` breakdowns and per-stage percentiles."""
+    if 'trace_recent' not in reports:
+        return {'error': 'Tracing not available', 'timestamp': time.time()}, 404
+
+    snapshot = reports.read()
+    traces = unpack_recent(snapshot['trace_recent'], snapshot['trace_count'])
+    if limit is not None:
+        traces = traces[:max(0, limit)]
+
+    stages = unpack_stage_stats(snapshot['trace_stages'])
+    return {'traces': traces, 'stages': stages, 'timestamp': time.time()}, 200
+
+
+def build_history(history, args):
+    """
+    /api/history payload and status.
+
+    ?metric=cpu,ram&range=1h&step=30s gives, per metric, one value per step
+    (null where nothing was recorded), starting at 'start'. Without a
+    metric, lists what is kept.
+
+    Args:
+        history (MetricsHistory): Or None when history isn't kept
+        args: The query string, anything with .get()
+    """
+    if history is None:
+        return {'error': 'History not available', 'timestamp': time.time()}, 404
+
+    metrics = [name for name in (args.get('metric') or '').split(',') if name]
+    if not metrics:
+        return dict(history.describe(), timestamp=time.time()), 200
+
+    try:
+        range_seconds = parse_duration(args.get('range'), default=3600)
+        step = parse_duration(args.get('step'))
+    except ValueError:
+        return {'error': 'range and step must be durations like 90, 15m or 1h', 'timestamp': time.time()}, 400
+
+    unknown = [name for name in metrics if name not in history.metrics]
+    if unknown:
+        return {'error': f"Unknown metric: {', '.join(unknown)}", 'timestamp': time.time()}, 400
+
+    now = time.time()
+    series = {}
+    for name in metrics:
+        start, point_step, series[name] = history.series(name, range_seconds, step, now)
+    return {'start': start, 'step': point_step, 'series': series, 'timestamp': now}, 200
+
+
+def build_health(reports):
+    """Basic health indicators for /health."""
+    health_status = {
+        'status': 'healthy',
+        'timestamp': time.time(),
+        'reports_connected': bool(reports)
+    }
+    
+    # Check if we can access reports
+    if reports:
+        try:
+            reports.read()['cpu']
+            health_status['reports_accessible'] = True
+        except Exception:
+            health_status['reports_accessible'] = False
+            health_status['status'] = 'degraded'
+    else:
+        health_status['reports_accessible'] = False
+        health_status['status'] = 'degraded'
+    return health_status
+
+
+def create_app(reports, history=None, max_subscribers=None):
     """Create Flask app with error handling for monitoring endpoints."""
     try:
         if not reports:
@@ -18,6 +273,15 @@ def create_app(reports):
             
         app = Flask(__name__)
         
+        # The web process samples on its own thread; endpoints only read the snapshot
+        sampler = get_sampler()
+
+        # One producer builds the stats for every /api/stream subscriber
+        stream = MetricsStream(lambda: build_stats(reports), STREAM_INTERVAL, STREAM_KEEPALIVE, max_subscribers)
+
+        # Prometheus exposition, rendered at most once per scrape interval
+        exporter = PrometheusExporter(reports, PROMETHEUS_CACHE_SECONDS)
+        
         # Configure Flask error handling
         app.config['PROPAGATE_EXCEPTIONS'] = True
         
@@ -50,57 +314,7 @@ def create_app(reports):
         @app.route('/api/stats')
         def stats():
             try:
-                # Safely extract values with defaults
-                stats_data = {}
-                
-                for key, default_value in [
-                    ('cpu_percent', 0),
-                    ('ram_percent', 0), 
-                    ('queue_count', 0),
-                    ('active_jobs', 0),
-                    ('avg_response_time', 0),
-                    ('server_count', 0)
-                ]:
-                    try:
-                        if key == 'cpu_percent':
-                            raw_value = reports['cpu'].value
-                        elif key == 'ram_percent':
-                            raw_value = reports['ram'].value
-                        elif key == 'queue_count':
-                            raw_value = reports['queues'].value
-                        elif key == 'active_jobs':
-                            raw_value = reports['jobs'].value
-                        elif key == 'avg_response_time':
-                            raw_value = reports['response_time'].value
-                        elif key == 'server_count':
-                            raw_value = reports['connected_servers'].value
-                        
-                        # Validate and sanitize the value
-                        if raw_value is None:
-                            stats_data[key] = default_value
-                        elif isinstance(raw_value, (int, float)):
-                            # Ensure reasonable bounds
-                            if key in ['cpu_percent', 'ram_percent']:
-                                stats_data[key] = max(0, min(100, raw_value))
-                            elif key in ['queue_count', 'active_jobs', 'server_count']:
-                                stats_data[key] = max(0, int(raw_value))
-                            elif key == 'avg_response_time':
-                                stats_data[key] = max(0, raw_value)
-                            else:
-                                stats_data[key] = raw_value
-                        else:
-                            error_logger(TypeError(f"Invalid data type for {key}: {type(raw_value)}"), f"Stats API value validation")
-                            stats_data[key] = default_value
-                            
-                    except AttributeError as attr_error:
-                        error_logger(attr_error, f"Missing attribute for {key}")
-                        stats_data[key] = default_value
-                    except Exception as value_error:
-                        error_logger(value_error, f"Error getting {key} value")
-                        stats_data[key] = default_value
-                
-                # Add timestamp
-                stats_data['timestamp'] = time.time()
+                stats_data = build_stats(reports)
                 
                 response = jsonify(stats_data)
                 response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -117,43 +331,41 @@ def create_app(reports):
                     'timestamp': time.time()
                 }), 500
         
+        @app.route('/api/stream')
+        def stats_stream():
+            """Server-Sent Events: a 'snapshot' of /api/stats, then 'delta' events with what changed."""
+            try:
+                if stream.full():
+                    # Each stream holds a server thread; the dashboard falls back to polling
+                    return jsonify({'error': 'Too many streams', 'timestamp': time.time()}), 503
+
+                response = Response(stream.subscribe(), mimetype='text/event-stream')
+                response.headers['Cache-Control'] = 'no-cache'
+                response.headers['X-Accel-Buffering'] = 'no'  # Don't let a reverse proxy hold frames back
+                response.headers['Access-Control-Allow-Origin'] = '*'
+                return response
+
+            except Exception as e:
+                error_logger(e, "Error opening stats stream")
+                return jsonify({
+                    'error': 'Stream unavailable',
+                    'timestamp': time.time()
+                }), 500
+        
+        @app.route('/metrics')
+        def prometheus_metrics():
+            """Counters, gauges and latency histograms in the Prometheus text format."""
+            try:
+                return Response(exporter.render(), content_type=exporter.CONTENT_TYPE)
+
+            except Exception as e:
+                error_logger(e, "Error rendering Prometheus metrics")
+                return Response("# metrics unavailable\n", status=500, content_type=exporter.CONTENT_TYPE)
+        
         @app.route('/api/debug')
         def debug():
             try:
-                debug_data = {}
-                
-                # Raw values with error handling
-                for key, report_key in [
-                    ('cpu_raw', 'cpu'),
-                    ('ram_raw', 'ram'),
-                    ('queues_raw', 'queues'),
-                    ('jobs_raw', 'jobs'),
-                    ('response_time_raw', 'response_time'),
-                    ('servers_raw', 'connected_servers')
-                ]:
-                    try:
-                        if report_key in reports:
-                            debug_data[key] = reports[report_key].value
-                        else:
-                            debug_data[key] = 'N/A'
-                    except Exception as debug_error:
-                        error_logger(debug_error, f"Error getting debug value for {key}")
-                        debug_data[key] = 'ERROR'
-                
-                # Add system info for debugging
-                try:
-                    debug_data['system_cpu'] = psutil.cpu_percent(interval=0.1)
-                    debug_data['system_ram'] = psutil.virtual_memory().percent
-                    debug_data['system_cores'] = psutil.cpu_count()
-                except Exception as system_error:
-                    error_logger(system_error, "Error getting system debug info")
-                    debug_data['system_info'] = 'ERROR'
-                
-                debug_data['timestamp'] = time.time()
-                debug_data['reports_available'] = bool(reports)
-                debug_data['report_keys'] = list(reports.keys()) if reports else []
-                
-                response = jsonify(debug_data)
+                response = jsonify(build_debug(reports, sampler, stream))
                 response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
                 response.headers['Access-Control-Allow-Origin'] = '*'
                 
@@ -166,30 +378,64 @@ def create_app(reports):
                     'timestamp': time.time()
                 }), 500
         
+        @app.route('/api/workers')
+        def workers():
+            """Per-worker tasks, busy and CPU time, RSS, uptime and translation latency."""
+            try:
+                response = jsonify(build_workers(reports))
+                response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+                response.headers['Access-Control-Allow-Origin'] = '*'
+                return response
+
+            except Exception as e:
+                error_logger(e, "Error in workers endpoint")
+                return jsonify({
+                    'error': 'Worker stats unavailable',
+                    'timestamp': time.time()
+                }), 500
+        
+        @app.route('/api/trace/recent')
+        def trace_recent():
+            """Per-stage breakdowns of the most recent requests, plus rolling per-stage percentiles."""
+            try:
+                payload, status = build_trace(reports, request.args.get('n', default=None, type=int))
+                response = jsonify(payload)
+                response.status_code = status
+                response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+                response.headers['Access-Control-Allow-Origin'] = '*'
+                return response
+
+            except Exception as e:
+                error_logger(e, "Error in trace endpoint")
+                return jsonify({
+                    'error': 'Trace info unavailable',
+                    'timestamp': time.time()
+                }), 500
+        
+        @app.route('/api/history')
+        def metric_history():
+            """Downsampled history of one or more metrics, see build_history."""
+            try:
+                payload, status = build_history(history, request.args)
+                response = jsonify(payload)
+                response.status_code = status
+                response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+                response.headers['Access-Control-Allow-Origin'] = '*'
+                return response
+
+            except Exception as e:
+                error_logger(e, "Error in history endpoint")
+                return jsonify({
+                    'error': 'History unavailable',
+                    'timestamp': time.time()
+                }), 500
+        
         @app.route('/health')
         def health_check():
             """Simple health check endpoint."""
             try:
-                # Basic health indicators
-                health_status = {
-                    'status': 'healthy',
-                    'timestamp': time.time(),
-                    'reports_connected': bool(reports),
-                    'flask_running': True
-                }
-                
-                # Check if we can access reports
-                if reports:
-                    try:
-                        test_value = reports['cpu'].value
-                        health_status['reports_accessible'] = True
-                    except Exception:
-                        health_status['reports_accessible'] = False
-                        health_status['status'] = 'degraded'
-                else:
-                    health_status['reports_accessible'] = False
-                    health_status['status'] = 'degraded'
-                
+                health_status = build_health(reports)
+                health_status['flask_running'] = True
                 return jsonify(health_status)
                 
             except Exception as e:
@@ -207,42 +453,56 @@ def create_app(reports):
         raise
 
 
-def start_webserver(reports):
-    """Start the Flask web server with error handling."""
+def pick_port(host, port):
+    """port, or the one after it if something is already listening there."""
+    try:
+        # Check if port is available
+        import socket
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        result = sock.connect_ex((host, port))
+        sock.close()
+        
+        if result == 0:
+            error_logger(RuntimeError(f"Port {port} already in use"), "Webserver startup")
+            # Try alternative port
+            return port + 1
+            
+    except Exception as port_check_error:
+        error_logger(port_check_error, "Port availability check failed")
+    return port
+
+
+def start_webserver(reports, history=None):
+    """
+    Start the monitoring web server in this process, with error handling.
+
+    Served by waitress with WEB_THREADS threads when it is installed, and by
+    Flask's development server otherwise. Under waitress every open
+    /api/stream holds a thread, so streams are capped to leave threads for
+    the other endpoints.
+    """
     try:
         if not reports:
             raise ValueError("Reports parameter is required")
             
-        app = create_app(reports)
-        
-        # Validate port and host
-        host = '0.0.0.0'
-        port = 5000
-        
-        try:
-            # Check if port is available
-            import socket
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            result = sock.connect_ex((host, port))
-            sock.close()
-            
-            if result == 0:
-                error_logger(RuntimeError(f"Port {port} already in use"), "Webserver startup")
-                # Try alternative port
-                port = 5001
-                
-        except Exception as port_check_error:
-            error_logger(port_check_error, "Port availability check failed")
+        host = WEB_HOST
+        port = pick_port(host, WEB_PORT)
         
         try:
-            app.run(host=host, port=port, debug=False, threaded=True)
+            if waitress is not None:
+                app = create_app(reports, history, max_subscribers=max(1, WEB_THREADS - 4))
+                waitress.serve(app, host=host, port=port, threads=WEB_THREADS, ident=None)
+            else:
+                error_logger(ImportError("waitress is not installed"), "Falling back to Flask's development server")
+                app = create_app(reports, history)
+                app.run(host=host, port=port, debug=False, threaded=True)
         except OSError as os_error:
             error_logger(os_error, f"Failed to bind to {host}:{port}")
             raise
         except Exception as run_error:
-            error_logger(run_error, "Flask app run failed")
+            error_logger(run_error, "Web server run failed")
             raise
             
     except Exception as e:
         error_logger(e, "Failed to start web server")
-        raise 
\ No newline at end of file
+        raise